@@ -0,0 +1,113 @@
+"""
+Compare the pandas and stdlib (csv module) ingest engines of csv_converter.
+
+For each engine this measures, after checking both produce identical items:
+  - cold start: a fresh interpreter importing the handler module and converting a small file
+  - peak traced memory while streaming the statement in STREAM_CHUNK_ROWS chunks
+  - parse + normalize throughput in rows/sec
+
+    python benchmarks/bench_csv_engines.py --rows 100000
+"""
+import argparse
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+CSV_CONVERTER_DIR = os.path.join(os.path.dirname(__file__), '..', 'lambda', 'csv_converter')
+SHARED_LAYER_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'lambda', 'shared'))
+sys.path.insert(0, CSV_CONVERTER_DIR)
+sys.path.insert(0, SHARED_LAYER_DIR)
+sys.path.insert(0, os.path.dirname(__file__))
+
+import csv_rows  # noqa: E402
+from bench_normalize import DATE_CSV_ADDED, synthetic_csv  # noqa: E402
+from mapping_configurations import mapping_configs  # noqa: E402
+
+CHUNK_ROWS = 5000
+
+# Run in a fresh interpreter so imports are not already cached
+COLD_START_SCRIPT = '''
+import io, json, sys, time
+start = time.perf_counter()
+import csv_rows, lambda_function
+data = sys.stdin.buffer.read()
+header, read_options = lambda_function.csv_read_options(csv_rows.read_header(data.split(b'\\n', 1)[0]))
+mapping_config = lambda_function.find_mapping_config(header)
+frames, normalize = lambda_function.read_frames(io.BytesIO(data), read_options)
+if normalize is None:
+    from normalize import normalize_dataframe as normalize
+items = [item for frame in frames for item in normalize(frame, mapping_config, 'user1', '2024-10-01')]
+print(json.dumps({'ms': (time.perf_counter() - start) * 1000, 'items': len(items)}))
+'''
+
+
+def pandas_items(data, mapping_config):
+    import pandas as pd
+    from normalize import normalize_dataframe
+    for df in pd.read_csv(io.BytesIO(data), dtype=str, chunksize=CHUNK_ROWS):
+        yield from normalize_dataframe(df, mapping_config, 'benchmark-user', DATE_CSV_ADDED)
+
+
+def stdlib_items(data, mapping_config):
+    for rows in csv_rows.read_row_chunks(io.BytesIO(data), {}, CHUNK_ROWS):
+        yield from csv_rows.normalize_rows(rows, mapping_config, 'benchmark-user', DATE_CSV_ADDED)
+
+
+ENGINES = {'pandas': pandas_items, 'stdlib': stdlib_items}
+
+
+def cold_start(engine, data, repeat):
+    samples = []
+    for _ in range(repeat):
+        result = subprocess.run([sys.executable, '-c', COLD_START_SCRIPT], input=data, capture_output=True,
+                                cwd=CSV_CONVERTER_DIR, check=True,
+                                env=dict(os.environ, CSV_ENGINE=engine, AWS_DEFAULT_REGION='us-east-1',
+                                         PYTHONPATH=SHARED_LAYER_DIR))
+        samples.append(json.loads(result.stdout.decode().strip().splitlines()[-1])['ms'])
+    return statistics.median(samples)
+
+
+def run(config_name, rows, repeat):
+    data = synthetic_csv(config_name, rows).encode()
+    mapping_config = mapping_configs[config_name]
+
+    # Load pandas before measuring so its import is not counted as ingest time or memory
+    import pandas  # noqa: F401
+
+    if list(stdlib_items(data, mapping_config)) != list(pandas_items(data, mapping_config)):
+        raise AssertionError(f'stdlib engine output differs from pandas for {config_name}')
+
+    print(f'{config_name}: {rows} rows, {len(data) / 1024 / 1024:.1f} MB')
+    small = synthetic_csv(config_name, 100).encode()
+    for engine, items in ENGINES.items():
+        cold_ms = cold_start(engine, small, repeat)
+
+        start = time.perf_counter()
+        count = sum(1 for _ in items(data, mapping_config))
+        seconds = time.perf_counter() - start
+
+        # Tracing slows allocation down a lot, so memory gets its own pass
+        tracemalloc.start()
+        sum(1 for _ in items(data, mapping_config))
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        print(f'  {engine:7}: cold start {cold_ms:7.1f} ms | peak {peak / 1024 / 1024:6.1f} MB | '
+              f'{count / seconds:9.0f} rows/s')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=3, help='cold start runs per engine')
+    parser.add_argument('--config', choices=['chase_credit', 'discover_checking'], nargs='*',
+                        default=['chase_credit', 'discover_checking'])
+    args = parser.parse_args()
+
+    for name in args.config:
+        run(name, args.rows, args.repeat)
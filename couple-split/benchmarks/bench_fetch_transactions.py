@@ -0,0 +1,145 @@
+"""
+Latency of the old full-table Scan against the userid_status GSI Query in fetch_transactions.
+
+Runs against an in-process moto table by default, or DynamoDB Local with --endpoint-url.
+Loading a million rows into moto takes a while; DynamoDB Local is faster for the full size.
+
+    python benchmarks/bench_fetch_transactions.py --rows 1000000 --users 200
+    python benchmarks/bench_fetch_transactions.py --rows 1000000 --endpoint-url http://localhost:8000
+"""
+import argparse
+import contextlib
+import importlib.util
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+
+import boto3  # noqa: E402
+from boto3.dynamodb.conditions import Attr  # noqa: E402
+
+LAMBDA_DIR = os.path.join(os.path.dirname(__file__), '..', 'lambda')
+# The Lambdas import the shared layer, which SAM mounts under /opt/python
+sys.path.insert(0, os.path.join(LAMBDA_DIR, 'shared'))
+TABLE_NAME = 'TransactionSplitTable'
+INDEX_NAME = 'userid_status-transaction_date-index'
+
+
+def load_lambda(name):
+    # Every Lambda is a lambda_function.py module, so load each one under its own name
+    spec = importlib.util.spec_from_file_location(name, os.path.join(LAMBDA_DIR, name, 'lambda_function.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def create_table(dynamodb):
+    return dynamodb.create_table(
+        TableName=TABLE_NAME,
+        KeySchema=[{'AttributeName': 'hash', 'KeyType': 'HASH'}],
+        AttributeDefinitions=[
+            {'AttributeName': 'hash', 'AttributeType': 'S'},
+            {'AttributeName': 'userid_status', 'AttributeType': 'S'},
+            {'AttributeName': 'transaction_date', 'AttributeType': 'S'},
+        ],
+        GlobalSecondaryIndexes=[{
+            'IndexName': INDEX_NAME,
+            'KeySchema': [
+                {'AttributeName': 'userid_status', 'KeyType': 'HASH'},
+                {'AttributeName': 'transaction_date', 'KeyType': 'RANGE'},
+            ],
+            'Projection': {'ProjectionType': 'ALL'},
+        }],
+        BillingMode='PAY_PER_REQUEST',
+    )
+
+
+def load_rows(table, rows, users, seed=11):
+    rng = random.Random(seed)
+    start = date(2023, 1, 1)
+    with table.batch_writer() as batch:
+        for i in range(rows):
+            userid = f'user{i % users}'
+            status = 'pending' if rng.random() < 0.3 else 'reviewed'
+            batch.put_item(Item={
+                'hash': f'{i:016x}',
+                'userid': userid,
+                'status': status,
+                'userid_status': f'{userid}#{status}',
+                'transaction_date': (start + timedelta(days=rng.randint(0, 700))).isoformat(),
+                'date_csv_added': '2024-10-01',
+                'amount': Decimal(rng.randint(-50000, 5000)) / 100,
+                'description': f'VENDOR {rng.randint(0, 999)}',
+            })
+
+
+def legacy_scan(table, userid, status, start_date, end_date):
+    # The handler before the GSI: Scan everything and filter server-side
+    filter_expression = (Attr('userid').eq(userid) & Attr('status').eq(status) & Attr('amount').lte(0)
+                         & Attr('transaction_date').gte(start_date) & Attr('transaction_date').lte(end_date))
+    scan_params = {'FilterExpression': filter_expression}
+    items = []
+    while True:
+        response = table.scan(**scan_params)
+        items.extend(response['Items'])
+        if 'LastEvaluatedKey' not in response:
+            return items
+        scan_params['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def timed(function, repeat):
+    samples = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples), result
+
+
+def run(args):
+    dynamodb = boto3.resource('dynamodb', endpoint_url=args.endpoint_url)
+    table = create_table(dynamodb)
+    table.wait_until_exists()
+
+    start = time.perf_counter()
+    load_rows(table, args.rows, args.users)
+    print(f'Loaded {args.rows} rows for {args.users} users in {time.perf_counter() - start:.1f}s')
+
+    fetch_transactions = load_lambda('fetch_transactions')
+    params = {'userid': 'user1', 'status': 'pending',
+              'transactionStartDate': '2023-06-01', 'transactionEndDate': '2023-12-31'}
+    event = {'httpMethod': 'GET', 'queryStringParameters': params}
+
+    scan_seconds, scanned = timed(lambda: legacy_scan(table, 'user1', 'pending', '2023-06-01', '2023-12-31'), args.repeat)
+    query_seconds, response = timed(lambda: fetch_transactions.lambda_handler(event, None), args.repeat)
+    assert response['statusCode'] == 200, response
+
+    print(f'Scan  (legacy)  : {scan_seconds * 1000:10.1f} ms median, {len(scanned)} items')
+    print(f'Query (GSI)     : {query_seconds * 1000:10.1f} ms median, handler response included')
+    print(f'Speedup         : {scan_seconds / query_seconds:10.1f}x')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--endpoint-url', help='DynamoDB Local endpoint; defaults to an in-process moto table')
+    args = parser.parse_args()
+
+    if args.endpoint_url:
+        # The handler builds its own resource at import time, point it at the same endpoint
+        os.environ['AWS_ENDPOINT_URL_DYNAMODB'] = args.endpoint_url
+        context = contextlib.nullcontext()
+    else:
+        from moto import mock_aws
+        context = mock_aws()
+
+    with context:
+        run(args)
@@ -0,0 +1,167 @@
+"""
+Before/after benchmark for CSV row normalization.
+
+Compares the original df.iterrows() conversion loop with normalize.normalize_dataframe on a
+synthetic statement, after checking both produce the same items.
+
+    python benchmarks/bench_normalize.py --rows 100000
+"""
+import argparse
+import hashlib
+import io
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'lambda', 'csv_converter'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'lambda', 'shared'))
+
+from mapping_configurations import mapping_configs  # noqa: E402
+from normalize import normalize_dataframe  # noqa: E402
+
+DATE_CSV_ADDED = '2024-10-01'
+
+# Attributes added after the hash for indexes; the legacy loop never produced them
+DERIVED_ATTRIBUTES = ['userid_status', 'vendor']
+# The hash became a row fingerprint without date_csv_added, so it no longer matches the legacy one
+CHANGED_ATTRIBUTES = ['hash']
+
+
+def legacy_normalize(df, mapping_config, user_id):
+    """ The row-by-row conversion from update_dynamodb_from_csv before it was vectorized """
+    date_threshold = datetime.strptime('2024-09-01', '%Y-%m-%d')
+    date_format = mapping_config.get('date_format', None)
+
+    def convert_date_format(date_string, input_format):
+        try:
+            return datetime.strptime(date_string, input_format).strftime('%Y-%m-%d')
+        except ValueError:
+            return date_string
+
+    items = []
+    for _, row in df.iterrows():
+        item = {}
+        item['userid'] = user_id
+
+        for key, value in mapping_config.items():
+            if value in df.columns and key != 'name':
+                if key == 'debit' and row[value] != "0":
+                    debit_value = str(row['Debit']).replace('$', '').replace(',', '')
+                    item['amount'] = Decimal(debit_value).quantize(Decimal('0.01')) * Decimal('-1')
+                elif key == 'credit' and row[value] != "0":
+                    credit_value = str(row['Credit']).replace('$', '').replace(',', '')
+                    item['amount'] = Decimal(credit_value).quantize(Decimal('0.01'))
+                elif key == 'payee':
+                    item['description'] = str(row[value])
+                elif key == 'transaction_date' or key == 'post_date':
+                    if date_format:
+                        item[key] = convert_date_format(str(row[value]), date_format)
+                    else:
+                        item[key] = str(row[value])
+                elif mapping_config.get('name') in ['amex_credit', 'discover_credit', 'sams_credit'] and key == 'amount':
+                    item['amount'] = Decimal(row[value]).quantize(Decimal('0.01')) * Decimal('-1')
+                elif key not in ['name', 'debit', 'credit', 'reference_number', 'payee']:
+                    item[key] = str(row[value]) if row[value] is not None else None
+
+        item['mapping_config_name'] = mapping_config['name']
+        item['date_csv_added'] = DATE_CSV_ADDED
+
+        if 'amount' in item:
+            item['amount'] = Decimal(str(item['amount']).replace(',', '')).quantize(Decimal('0.01'))
+
+        if 'balance' in item:
+            balance_value = str(item['balance']).replace('$', '').replace(',', '')
+            item['balance'] = Decimal(balance_value).quantize(Decimal('0.01'))
+
+        item_string = ''.join(str(item.get(field, '')) for field in sorted(item.keys()))
+        item['hash'] = hashlib.sha256(item_string.encode()).hexdigest()
+
+        item['split'] = None
+        item['status'] = "pending"
+
+        if item['amount'] <= 0:
+            if 'transaction_date' in item:
+                try:
+                    transaction_date = datetime.strptime(item['transaction_date'], '%Y-%m-%d')
+                except ValueError:
+                    transaction_date = None
+                if transaction_date and transaction_date < date_threshold:
+                    item['split'] = False
+                    item['status'] = "reviewed"
+        else:
+            item['split'] = False
+            item['status'] = "reviewed"
+
+        items.append(item)
+
+    return items
+
+
+def synthetic_csv(config_name, rows, seed=7):
+    """ CSV text for a statement in the given bank format with random purchases and refunds """
+    rng = random.Random(seed)
+    start = date(2024, 6, 1)
+    lines = []
+
+    if config_name == 'discover_checking':
+        lines.append('Transaction Date,Transaction Description,Transaction Type,Debit,Credit,Balance')
+        for i in range(rows):
+            day = (start + timedelta(days=i % 200)).strftime('%m/%d/%Y')
+            amount = rng.randint(100, 500000) / 100
+            if rng.random() < 0.8:
+                lines.append(f'{day},"VENDOR {i % 997}",Debit,"${amount:,.2f}",0,"${rng.randint(0, 10 ** 7) / 100:,.2f}"')
+            else:
+                lines.append(f'{day},"DEPOSIT {i % 37}",Credit,0,"${amount:,.2f}","${rng.randint(0, 10 ** 7) / 100:,.2f}"')
+    else:
+        lines.append('Transaction Date,Post Date,Description,Category,Type,Amount,Memo')
+        for i in range(rows):
+            day = (start + timedelta(days=i % 200)).strftime('%m/%d/%Y')
+            amount = rng.randint(100, 50000) / 100 * (1 if rng.random() < 0.1 else -1)
+            lines.append(f'{day},{day},VENDOR {i % 997},Shopping,Sale,{amount:.2f},')
+
+    return '\n'.join(lines) + '\n'
+
+
+def synthetic_statement(config_name, rows, seed=7):
+    """ The synthetic_csv statement parsed into a DataFrame """
+    return pd.read_csv(io.StringIO(synthetic_csv(config_name, rows, seed)))
+
+
+def run(rows, config_name):
+    df = synthetic_statement(config_name, rows)
+    mapping_config = mapping_configs[config_name]
+
+    start = time.perf_counter()
+    before = legacy_normalize(df, mapping_config, 'benchmark-user')
+    legacy_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    after = normalize_dataframe(df, mapping_config, 'benchmark-user', date_csv_added=DATE_CSV_ADDED)
+    vectorized_seconds = time.perf_counter() - start
+
+    ignored = DERIVED_ATTRIBUTES + CHANGED_ATTRIBUTES
+    before = [{key: value for key, value in item.items() if key not in ignored} for item in before]
+    comparable = [{key: value for key, value in item.items() if key not in ignored} for item in after]
+    if before != comparable:
+        raise AssertionError(f'normalize_dataframe output differs from the legacy loop for {config_name}')
+
+    print(f'{config_name}: {rows} rows')
+    print(f'  iterrows loop : {legacy_seconds:8.2f}s  ({rows / legacy_seconds:10.0f} rows/s)')
+    print(f'  vectorized    : {vectorized_seconds:8.2f}s  ({rows / vectorized_seconds:10.0f} rows/s)')
+    print(f'  speedup       : {legacy_seconds / vectorized_seconds:8.1f}x')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--config', choices=['chase_credit', 'discover_checking'], nargs='*',
+                        default=['chase_credit', 'discover_checking'])
+    args = parser.parse_args()
+
+    for name in args.config:
+        run(args.rows, name)
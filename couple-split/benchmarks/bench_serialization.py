@@ -0,0 +1,109 @@
+"""
+Response serialization: the per-Lambda DecimalEncoder classes against serialization.to_json.
+
+Builds result sets shaped like TransactionSplitTable and SplitTable items and times json.dumps
+with each of the old encoders next to the shared layer serializer.
+
+    python benchmarks/bench_serialization.py --items 10000
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from decimal import Decimal
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'lambda', 'shared'))
+
+from serialization import to_json  # noqa: E402
+
+
+class FloatDecimalEncoder(json.JSONEncoder):
+    """ fetch_transactions and fetch_categories before the shared layer """
+    def default(self, obj):
+        if isinstance(obj, Decimal):
+            return float(obj)
+        return super(FloatDecimalEncoder, self).default(obj)
+
+
+class IntOrFloatDecimalEncoder(json.JSONEncoder):
+    """ fetch_split_table before the shared layer """
+    def default(self, obj):
+        if isinstance(obj, Decimal):
+            if obj % 1:
+                return float(obj)
+            else:
+                return int(obj)
+        return super(IntOrFloatDecimalEncoder, self).default(obj)
+
+
+def transactions(count, seed=3):
+    rng = random.Random(seed)
+    items = []
+    for i in range(count):
+        amount = Decimal(-rng.randint(100, 500000)) / 100
+        items.append({
+            'hash': f'{i:064x}',
+            'userid': 'user1',
+            'status': 'reviewed',
+            'userid_status': 'user1#reviewed',
+            'transaction_date': '2024-10-01',
+            'post_date': '2024-10-02',
+            'date_csv_added': '2024-10-05',
+            'description': f'VENDOR {rng.randint(0, 999)}',
+            'mapping_config_name': 'chase_credit',
+            'category': 'Groceries',
+            'amount': amount,
+            'balance': Decimal(rng.randint(0, 10 ** 7)) / 100,
+            'split': True,
+            'need': True,
+            'split_percent': Decimal(50),
+            'after_split_amount': amount / 2,
+            'partner_split_amount': amount / 2,
+        })
+    return items
+
+
+def categories(count):
+    return [{'userid': 'user1', 'category': f'Category {i}', 'need': i % 2 == 0, 'split_percent': Decimal(i % 101)}
+            for i in range(count)]
+
+
+def timed(function, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def run(name, items, repeat):
+    encoders = [
+        ('DecimalEncoder (float)', lambda: json.dumps(items, cls=FloatDecimalEncoder)),
+        ('DecimalEncoder (int/float)', lambda: json.dumps(items, cls=IntOrFloatDecimalEncoder)),
+        ('serialization.to_json', lambda: to_json(items)),
+    ]
+
+    # The new body must decode to the same numbers as the stored Decimals
+    if json.loads(to_json(items), parse_float=Decimal) != items:
+        raise AssertionError(f'to_json changed the values of the {name} items')
+
+    print(f'{name}: {len(items)} items, {len(to_json(items)) / 1024:.0f} KB body')
+    baseline = None
+    for label, function in encoders:
+        seconds = timed(function, repeat)
+        baseline = baseline or seconds
+        print(f'  {label:28}: {seconds * 1000:8.1f} ms  ({baseline / seconds:4.2f}x)')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--items', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=7)
+    args = parser.parse_args()
+
+    run('transactions', transactions(args.items), args.repeat)
+    run('categories', categories(args.items), args.repeat)
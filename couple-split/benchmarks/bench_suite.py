@@ -0,0 +1,251 @@
+"""
+Offline benchmark suite for the ingest and API paths, saved as JSON for regression checks.
+
+Everything runs against in-process moto S3 and DynamoDB, so the numbers include moto's own
+overhead and are only comparable between runs on the same machine:
+  - ingest: csv_converter on a synthetic statement of every mapping config, rows/sec and peak
+    traced memory (measured on a second upload, tracemalloc slows the run it watches)
+  - fetch_transactions: handler latency (median and p95) at each --table-sizes row count
+  - update_transactions: reviewed updates/sec, sent in --update-batch sized requests
+
+    python benchmarks/bench_suite.py --output results/before.json
+    python benchmarks/bench_suite.py --output results/after.json --compare results/before.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from decimal import Decimal
+
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+os.environ.setdefault('CURSOR_SECRET', 'benchmark-cursor-secret')
+
+CSV_CONVERTER_DIR = os.path.join(os.path.dirname(__file__), '..', 'lambda', 'csv_converter')
+SHARED_LAYER_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'lambda', 'shared'))
+sys.path.insert(0, CSV_CONVERTER_DIR)
+sys.path.insert(0, SHARED_LAYER_DIR)
+sys.path.insert(0, os.path.dirname(__file__))
+
+import boto3  # noqa: E402
+from moto import mock_aws  # noqa: E402
+
+from bench_fetch_transactions import TABLE_NAME, create_table, load_lambda, load_rows  # noqa: E402
+from statements import STATEMENT_FORMATS, synthetic_statement  # noqa: E402
+
+BUCKET = 'couple-split-bench'
+USERID = 'benchuser'
+SPLIT_RULES = {'Groceries': (True, 50), 'Shopping': (False, 100), 'Gas': (True, 0)}
+
+# Metrics compared by --compare, and whether a larger value is an improvement
+HIGHER_IS_BETTER = {'rows_per_second': True, 'updates_per_second': True, 'peak_memory_mb': False,
+                    'median_ms': False, 'p95_ms': False}
+
+
+def create_tables(dynamodb):
+    create_table(dynamodb)
+    dynamodb.create_table(TableName='HashTable', KeySchema=[{'AttributeName': 'hash', 'KeyType': 'HASH'}],
+                          AttributeDefinitions=[{'AttributeName': 'hash', 'AttributeType': 'S'}],
+                          BillingMode='PAY_PER_REQUEST')
+    for name, sort_key in (('SplitTable', 'category'), ('TransactionRollupTable', 'month_category'),
+                           ('VendorRollupTable', 'category_month_vendor'), ('SettlementLedgerTable', 'node')):
+        dynamodb.create_table(TableName=name,
+                              KeySchema=[{'AttributeName': 'userid', 'KeyType': 'HASH'},
+                                         {'AttributeName': sort_key, 'KeyType': 'RANGE'}],
+                              AttributeDefinitions=[{'AttributeName': 'userid', 'AttributeType': 'S'},
+                                                    {'AttributeName': sort_key, 'AttributeType': 'S'}],
+                              BillingMode='PAY_PER_REQUEST')
+    split_table = dynamodb.Table('SplitTable')
+    for category, (need, split_percent) in SPLIT_RULES.items():
+        split_table.put_item(Item={'userid': USERID, 'category': category, 'need': need,
+                                   'split_percent': Decimal(split_percent)})
+
+
+def clear_transactions(dynamodb):
+    # Each benchmark starts from an empty transactions table
+    dynamodb.Table(TABLE_NAME).delete()
+    return create_table(dynamodb)
+
+
+def quietly(handler, event):
+    # Handlers print a line of embedded metrics per invocation, keep the report readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        return handler(event, None)
+
+
+def ingest_file(s3, csv_converter, config_name, rows, seed):
+    data = synthetic_statement(config_name, rows, seed)
+    key = f'input_csv/{USERID}_{config_name}-{seed}.csv'
+    s3.put_object(Bucket=BUCKET, Key=key, Body=data)
+    event = {'Records': [{'s3': {'bucket': {'name': BUCKET}, 'object': {'key': key, 'size': len(data)}}}]}
+    response = quietly(csv_converter.lambda_handler, event)
+    result, = json.loads(response['body'])['results']
+    if result['status'] != 'processed':
+        raise AssertionError(f'{config_name} statement was not ingested: {result}')
+
+
+def bench_ingest(s3, csv_converter, rows):
+    results = {}
+    for config_name in STATEMENT_FORMATS:
+        start = time.perf_counter()
+        ingest_file(s3, csv_converter, config_name, rows, seed=1)
+        seconds = time.perf_counter() - start
+
+        tracemalloc.start()
+        try:
+            ingest_file(s3, csv_converter, config_name, rows, seed=2)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+        results[config_name] = {'rows': rows, 'seconds': round(seconds, 3),
+                                'rows_per_second': round(rows / seconds, 1),
+                                'peak_memory_mb': round(peak / 2 ** 20, 2)}
+        print(f'ingest {config_name:18}: {rows / seconds:10.0f} rows/s, {peak / 2 ** 20:8.1f} MB peak')
+    return results
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def bench_fetch_transactions(dynamodb, table_sizes, repeat):
+    results = {}
+    for size in table_sizes:
+        table = clear_transactions(dynamodb)
+        load_rows(table, size, users=20)
+        fetch_transactions = load_lambda('fetch_transactions')
+        event = {'httpMethod': 'GET', 'queryStringParameters': {
+            'userid': 'user1', 'status': 'pending',
+            'transactionStartDate': '2023-06-01', 'transactionEndDate': '2023-12-31'}}
+
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            response = quietly(fetch_transactions.lambda_handler, event)
+            samples.append((time.perf_counter() - start) * 1000)
+            assert response['statusCode'] == 200, response
+
+        results[str(size)] = {'rows': size, 'items': len(json.loads(response['body'])),
+                              'median_ms': round(statistics.median(samples), 2),
+                              'p95_ms': round(percentile(samples, 0.95), 2)}
+        print(f'fetch_transactions {size:>8} rows: {statistics.median(samples):8.1f} ms median, '
+              f'{percentile(samples, 0.95):8.1f} ms p95')
+    return results
+
+
+def bench_update_transactions(dynamodb, updates, batch_size):
+    table = clear_transactions(dynamodb)
+    with table.batch_writer() as batch:
+        for i in range(updates):
+            batch.put_item(Item={
+                'hash': f'u{i:015x}', 'userid': USERID, 'status': 'pending', 'userid_status': f'{USERID}#pending',
+                'transaction_date': f'2024-{i % 12 + 1:02d}-{i % 28 + 1:02d}', 'amount': Decimal(-(i % 5000 + 1)) / 100,
+                'description': f'VENDOR {i % 97}',
+            })
+    update_transactions = load_lambda('update_transactions')
+    categories = list(SPLIT_RULES)
+
+    start = time.perf_counter()
+    for offset in range(0, updates, batch_size):
+        body = [{'hash': f'u{i:015x}', 'userid': USERID, 'status': 'reviewed', 'split': 'yes' if i % 2 else 'no',
+                 'category': categories[i % len(categories)], 'amount': -((i % 5000 + 1) / 100)}
+                for i in range(offset, min(offset + batch_size, updates))]
+        response = quietly(update_transactions.lambda_handler, {'httpMethod': 'POST', 'body': json.dumps(body)})
+        assert response['statusCode'] == 200, response
+    seconds = time.perf_counter() - start
+
+    print(f'update_transactions      : {updates / seconds:10.0f} updates/s in batches of {batch_size}')
+    return {'updates': updates, 'batch_size': batch_size, 'seconds': round(seconds, 3),
+            'updates_per_second': round(updates / seconds, 1)}
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    results = {'meta': {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'csv_engine': os.environ.get('CSV_ENGINE', 'pandas'),
+        'args': vars(args),
+    }}
+    with mock_aws():
+        dynamodb = boto3.resource('dynamodb')
+        s3 = boto3.client('s3')
+        s3.create_bucket(Bucket=BUCKET)
+        create_tables(dynamodb)
+
+        # Imported inside the mock so its cached clients talk to moto
+        import lambda_function as csv_converter
+        results['ingest'] = bench_ingest(s3, csv_converter, args.rows)
+        results['fetch_transactions'] = bench_fetch_transactions(dynamodb, args.table_sizes, args.repeat)
+        results['update_transactions'] = bench_update_transactions(dynamodb, args.updates, args.update_batch)
+    return results
+
+
+def metrics(results, prefix=''):
+    # Flatten to {'ingest.chase_credit.rows_per_second': value} for the metrics --compare knows
+    for name, value in results.items():
+        if isinstance(value, dict):
+            yield from metrics(value, f'{prefix}{name}.')
+        elif name in HIGHER_IS_BETTER:
+            yield f'{prefix}{name}', name, value
+
+
+def compare(results, baseline, tolerance):
+    """Print every metric against the baseline and return the ones that got worse than tolerance."""
+    before = {path: value for path, _, value in metrics(baseline)}
+    regressions = []
+    for path, name, value in metrics(results):
+        if path not in before or not before[path]:
+            continue
+        change = (value - before[path]) / before[path]
+        worse = -change if HIGHER_IS_BETTER[name] else change
+        flag = ''
+        if worse > tolerance:
+            regressions.append(path)
+            flag = '  REGRESSION'
+        print(f'{path:55} {before[path]:12.2f} -> {value:12.2f} ({change:+7.1%}){flag}')
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=5000, help='Rows per synthetic statement')
+    parser.add_argument('--table-sizes', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--repeat', type=int, default=20, help='fetch_transactions calls per table size')
+    parser.add_argument('--updates', type=int, default=1000)
+    parser.add_argument('--update-batch', type=int, default=100)
+    parser.add_argument('--output', default='benchmark-results.json')
+    parser.add_argument('--compare', help='Earlier results file to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed slowdown before a metric regresses')
+    args = parser.parse_args()
+
+    results = run(args)
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f'Saved results to {args.output}')
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f'{len(regressions)} metrics regressed by more than {args.tolerance:.0%}')
+            sys.exit(1)
@@ -0,0 +1,153 @@
+"""
+Synthetic bank statements for every format in csv_converter/mapping_configurations.py.
+
+Each generator writes the header and cell conventions of the real export: quoted descriptions
+with commas, thousands separators, $ amounts, empty cells and the summary block Bank of America
+puts in front of checking statements. Purchases, refunds and payments are mixed in roughly the
+proportions real statements have, and a seed makes every statement reproducible.
+
+    from statements import STATEMENT_FORMATS, synthetic_statement
+    data = synthetic_statement('bofa_checking', rows=1000)
+"""
+import random
+from datetime import date, timedelta
+
+START_DATE = date(2024, 1, 1)
+
+VENDORS = ['AMZN Mktp US*2K3L', 'SQ *BLUE BOTTLE 0042', 'WHOLEFDS SEA 10234', 'SHELL OIL 57442',
+           'NETFLIX.COM', 'TRADER JOE\'S #131', 'UBER   *TRIP', 'COSTCO WHSE #0001', 'TST* LOCAL CAFE',
+           'PAYPAL *STEAM GAMES', 'CITY OF SEATTLE, PARKING', 'HOME DEPOT #4702']
+CATEGORIES = ['Groceries', 'Shopping', 'Food & Drink', 'Gas', 'Travel', 'Entertainment', 'Bills & Utilities']
+
+
+def quoted(text):
+    return '"' + text.replace('"', '""') + '"'
+
+
+def money(amount):
+    return f'{amount:.2f}'
+
+
+def grouped(amount):
+    # Thousands separators need quoting, like the exports that use them
+    return quoted(f'{amount:,.2f}')
+
+
+class Statement:
+    """Random transactions shared by the format writers."""
+
+    def __init__(self, rows, seed):
+        self.rng = random.Random(seed)
+        self.rows = rows
+
+    def transactions(self):
+        for i in range(self.rows):
+            day = START_DATE + timedelta(days=i * 300 // max(self.rows, 1))
+            kind = self.rng.random()
+            if kind < 0.85:
+                description, amount = self.rng.choice(VENDORS), self.rng.randint(100, 50000) / 100
+                yield day, f'{description} {i % 97}', 'purchase', amount
+            elif kind < 0.95:
+                yield day, f'REFUND {self.rng.choice(VENDORS)}', 'refund', self.rng.randint(100, 5000) / 100
+            else:
+                yield day, 'ONLINE PAYMENT - THANK YOU', 'payment', self.rng.randint(10000, 300000) / 100
+
+    def category(self):
+        return self.rng.choice(CATEGORIES)
+
+
+def chase_credit(statement):
+    # Purchases are negative, payments and refunds positive
+    yield 'Transaction Date,Post Date,Description,Category,Type,Amount,Memo'
+    for day, description, kind, amount in statement.transactions():
+        posted = day + timedelta(days=1)
+        signed = -amount if kind == 'purchase' else amount
+        category = statement.category() if kind == 'purchase' else ''
+        kind_name = {'purchase': 'Sale', 'refund': 'Return', 'payment': 'Payment'}[kind]
+        yield (f'{day:%m/%d/%Y},{posted:%m/%d/%Y},{quoted(description)},{category},{kind_name},'
+               f'{money(signed)},')
+
+
+def amex_credit(statement):
+    # Amex exports charges as positive amounts
+    yield 'Date,Description,Amount'
+    for day, description, kind, amount in statement.transactions():
+        signed = amount if kind == 'purchase' else -amount
+        yield f'{day:%m/%d/%Y},{quoted(description)},{money(signed)}'
+
+
+def sams_credit(statement):
+    yield 'Date,Reference,Description,Amount'
+    for i, (day, description, kind, amount) in enumerate(statement.transactions()):
+        signed = amount if kind == 'purchase' else -amount
+        yield f'{day:%m/%d/%Y},R{i:09d},{quoted(description)},{grouped(signed)}'
+
+
+def discover_credit(statement):
+    yield 'Trans. Date,Post Date,Description,Amount,Category'
+    for day, description, kind, amount in statement.transactions():
+        posted = day + timedelta(days=1)
+        signed = amount if kind == 'purchase' else -amount
+        category = statement.category() if kind == 'purchase' else 'Payments and Credits'
+        yield f'{day:%m/%d/%Y},{posted:%m/%d/%Y},{quoted(description)},{money(signed)},{category}'
+
+
+def discover_checking(statement):
+    # Debits and credits are separate $ columns, the other one holds 0
+    yield 'Transaction Date,Transaction Description,Transaction Type,Debit,Credit,Balance'
+    balance = 5000.0
+    for day, description, kind, amount in statement.transactions():
+        if kind == 'purchase':
+            balance -= amount
+            yield f'{day:%m/%d/%Y},{quoted(description)},Debit,{quoted(f"${amount:,.2f}")},0,{quoted(f"${balance:,.2f}")}'
+        else:
+            balance += amount
+            yield f'{day:%m/%d/%Y},{quoted(description)},Credit,0,{quoted(f"${amount:,.2f}")},{quoted(f"${balance:,.2f}")}'
+
+
+def bofa_checking(statement):
+    # The summary block and the beginning balance row are the 8 lines csv_converter skips
+    transactions = list(statement.transactions())
+    opening = 5000.0
+    credits = sum(amount for _, _, kind, amount in transactions if kind != 'purchase')
+    debits = sum(amount for _, _, kind, amount in transactions if kind == 'purchase')
+    first = transactions[0][0] if transactions else START_DATE
+    last = transactions[-1][0] if transactions else START_DATE
+    yield 'Description,,Summary Amt.'
+    yield f'Beginning balance as of {first:%m/%d/%Y},,{grouped(opening)}'
+    yield f'Total credits,,{grouped(credits)}'
+    yield f'Total debits,,{grouped(-debits)}'
+    yield f'Ending balance as of {last:%m/%d/%Y},,{grouped(opening + credits - debits)}'
+    yield ''
+    yield 'Date,Description,Amount,Running Bal.'
+    yield f'{first:%m/%d/%Y},Beginning balance as of {first:%m/%d/%Y},,{grouped(opening)}'
+    balance = opening
+    for day, description, kind, amount in transactions:
+        signed = -amount if kind == 'purchase' else amount
+        balance += signed
+        yield f'{day:%m/%d/%Y},{quoted(description)},{grouped(signed)},{grouped(balance)}'
+
+
+def bofa_credit(statement):
+    yield 'Posted Date,Reference Number,Payee,Address,Amount'
+    for i, (day, description, kind, amount) in enumerate(statement.transactions()):
+        signed = -amount if kind == 'purchase' else amount
+        address = 'SEATTLE WA' if kind == 'purchase' else ''
+        yield f'{day:%m/%d/%Y},{24000000 + i},{quoted(description)},{address},{money(signed)}'
+
+
+STATEMENT_FORMATS = {
+    'chase_credit': chase_credit,
+    'amex_credit': amex_credit,
+    'sams_credit': sams_credit,
+    'discover_credit': discover_credit,
+    'discover_checking': discover_checking,
+    'bofa_checking': bofa_checking,
+    'bofa_credit': bofa_credit,
+}
+
+
+def synthetic_statement(config_name, rows, seed=7):
+    """CSV bytes of a statement in the given format with rows transactions."""
+    lines = STATEMENT_FORMATS[config_name](Statement(rows, seed))
+    return ('\n'.join(lines) + '\n').encode('utf-8')
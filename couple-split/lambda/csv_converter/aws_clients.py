@@ -0,0 +1,63 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import boto3
+from botocore.config import Config
+from instrumentation import instrument
+
+# One tuned connection pool per container, shared by every invocation and every helper module
+BOTO_CONFIG = Config(
+    max_pool_connections=int(os.environ.get('BOTO_MAX_POOL_CONNECTIONS', 32)),
+    tcp_keepalive=True,
+    connect_timeout=5,
+    retries={'mode': 'adaptive', 'max_attempts': 10}
+)
+
+# Milliseconds spent on imports and client creation in this container, reported once
+init_timings = {}
+
+_clients = {}
+_cold_start_reported = False
+
+@contextmanager
+def timed(label):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        init_timings[label] = round((time.perf_counter() - start) * 1000, 1)
+
+def record_since(label, start):
+    # For spans that began before this module could be imported, like the handler's own imports
+    init_timings[label] = round((time.perf_counter() - start) * 1000, 1)
+
+def _get(kind, service):
+    # Clients are thread-safe and shared, resources are not and get one per thread
+    cache_key = (kind, service, threading.get_ident() if kind == 'resource' else None)
+    if cache_key not in _clients:
+        with timed(f'{service}_{kind}_ms'):
+            factory = boto3.resource if kind == 'resource' else boto3.client
+            _clients[cache_key] = factory(service, config=BOTO_CONFIG)
+        if service == 'dynamodb':
+            # Every DynamoDB call reports its consumed capacity into the invocation's metrics
+            instrument(_clients[cache_key].meta.client)
+    return _clients[cache_key]
+
+def dynamodb():
+    """DynamoDB resource created on first use in each thread and reused for the life of the container."""
+    return _get('resource', 'dynamodb')
+
+def s3():
+    """S3 client created on first use and reused for the life of the container."""
+    return _get('client', 's3')
+
+def report_cold_start():
+    # Printed after the first invocation so client creation and lazy pandas import are included
+    global _cold_start_reported
+    if _cold_start_reported:
+        return
+    _cold_start_reported = True
+    print(json.dumps({'cold_start': init_timings}))
@@ -0,0 +1,200 @@
+"""Pandas-free CSV reading and normalization, used when CSV_ENGINE=stdlib.
+
+Rows are read with the csv module into dicts of column name -> text and normalized one row at
+a time. Cell text follows what pd.read_csv(dtype=str) would hand normalize_dataframe, so both
+engines produce the same items and hashes.
+"""
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from functools import lru_cache
+import csv
+import hashlib
+import io
+import itertools
+import re
+
+from vendors import vendor_key
+
+CENT = Decimal('0.01')
+NEGATIVE_ONE = Decimal('-1')
+
+# This is for transactions before spliting purchases with partner
+# hard coded for my case as this shouldn't change
+SPLIT_START = date(2024, 9, 1)
+
+# These banks export purchases as positive amounts, flip them so purchases are negative
+NEGATED_AMOUNT_CONFIGS = ['amex_credit', 'discover_credit', 'sams_credit']
+
+# Config keys that are not copied onto the item as-is
+SKIPPED_KEYS = ['name', 'date_format', 'debit', 'credit', 'reference_number', 'payee']
+DATE_KEYS = ['transaction_date', 'post_date']
+
+# Attributes left out of the row fingerprint (the hash key) because they vary between uploads
+FINGERPRINT_EXCLUDED = ['date_csv_added']
+
+# Cells pandas reads as missing by default; they reach the items as the text 'nan'
+NA_VALUES = frozenset(['', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND',
+                       '1.#QNAN', '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null'])
+MISSING = 'nan'
+
+# Plain decimal or scientific numbers, the strings pd.to_numeric turns into finite values
+NUMBER = re.compile(r'[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?')
+
+
+def header_names(row):
+    # Name columns the way pandas does: blanks become 'Unnamed: i', repeats get '.1', '.2', ...
+    names = []
+    seen = {}
+    for i, name in enumerate(row):
+        name = name or f'Unnamed: {i}'
+        if name in seen:
+            seen[name] += 1
+            name = f'{name}.{seen[name]}'
+        seen.setdefault(name, 0)
+        names.append(name)
+    return names
+
+def read_header(first_line):
+    """Column names from the raw first line of a file."""
+    text = first_line.decode('utf-8-sig') if isinstance(first_line, bytes) else first_line
+    return header_names(next(csv.reader([text]), []))
+
+def _is_blank(row):
+    return not row or (len(row) == 1 and not row[0].strip())
+
+def _row_dict(names, row):
+    # Short rows are padded with missing values, extra trailing fields are ignored
+    if len(row) < len(names):
+        row = row + [''] * (len(names) - len(row))
+    return {name: (MISSING if value in NA_VALUES else value) for name, value in zip(names, row)}
+
+def read_row_chunks(stream, read_options, chunk_rows):
+    """Yield lists of up to chunk_rows row dicts from a binary stream, like read_csv's chunksize.
+
+    read_options are the same keyword arguments csv_read_options builds for pd.read_csv:
+    skiprows drops raw lines first, and names with header=None supplies the column names.
+    """
+    lines = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    lines = itertools.islice(lines, read_options.get('skiprows', 0), None)
+    rows = (row for row in csv.reader(lines) if not _is_blank(row))
+
+    if read_options.get('header', 0) is None:
+        names = list(read_options['names'])
+    else:
+        names = header_names(next(rows, []))
+
+    while True:
+        chunk = [_row_dict(names, row) for row in itertools.islice(rows, chunk_rows)]
+        if not chunk:
+            return
+        yield chunk
+
+def _strip_money(text):
+    return text.replace('$', '').replace(',', '').strip()
+
+def _number(text):
+    # Decimal for a cleaned amount string, or None where pandas would see NaN
+    return Decimal(text) if NUMBER.fullmatch(text) else None
+
+# A statement only spans a few hundred distinct dates, so strptime results are cached
+@lru_cache(maxsize=4096)
+def _convert_date(text, date_format):
+    if not date_format:
+        return text
+    try:
+        return datetime.strptime(text, date_format).strftime('%Y-%m-%d')
+    except ValueError:
+        return text
+
+@lru_cache(maxsize=4096)
+def _before_split_start(transaction_date):
+    try:
+        return datetime.strptime(transaction_date, '%Y-%m-%d').date() < SPLIT_START
+    except ValueError:
+        return False
+
+def _is_reviewed(amount, transaction_date):
+    if amount > 0:
+        return True
+    return transaction_date is not None and _before_split_start(transaction_date)
+
+def _amount(row, mapping_config):
+    """Return (cleaned amount text, negate) for a row."""
+    debit_col = mapping_config.get('debit')
+    credit_col = mapping_config.get('credit')
+    if debit_col in row or credit_col in row:
+        # Merge debit and credit columns: credits are kept as-is, debits become negative
+        credit = _strip_money(row.get(credit_col, MISSING))
+        credit_value = _number(credit)
+        if credit_value is not None and credit_value != 0:
+            return credit, False
+        return _strip_money(row.get(debit_col, MISSING)), True
+
+    return _strip_money(row[mapping_config['amount']]), mapping_config.get('name') in NEGATED_AMOUNT_CONFIGS
+
+def normalize_rows(rows, mapping_config, user_id, date_csv_added=None):
+    """Normalize row dicts from read_row_chunks into the items normalize_dataframe would build."""
+    if date_csv_added is None:
+        date_csv_added = datetime.now(timezone.utc).strftime('%Y-%m-%d')
+    if not rows:
+        return []
+
+    columns = set(rows[0])
+    text_keys = [(key, value) for key, value in mapping_config.items()
+                 if key not in SKIPPED_KEYS and key != 'amount' and value in columns]
+    payee_col = mapping_config.get('payee')
+    has_amount = (mapping_config.get('debit') in columns or mapping_config.get('credit') in columns
+                  or mapping_config.get('amount') in columns)
+    if not has_amount:
+        print(f"No amount column for mapping {mapping_config['name']}, nothing to normalize")
+        return []
+
+    date_format = mapping_config.get('date_format')
+    items = []
+    skipped = 0
+    for row in rows:
+        amount_text, negate = _amount(row, mapping_config)
+        amount_value = _number(amount_text)
+        if amount_value is None:
+            skipped += 1
+            continue
+
+        item = {}
+        for key, column in text_keys:
+            item[key] = _convert_date(row[column], date_format) if key in DATE_KEYS else row[column]
+        if payee_col in columns:
+            item['description'] = row[payee_col]
+
+        amount = amount_value.quantize(CENT)
+        item['amount'] = amount * NEGATIVE_ONE if negate else amount
+
+        balance = None
+        if 'balance' in item:
+            balance_value = _number(_strip_money(item['balance']))
+            balance = balance_value.quantize(CENT) if balance_value is not None else None
+            item['balance'] = balance
+
+        item['userid'] = user_id
+        item['mapping_config_name'] = mapping_config['name']
+        item['date_csv_added'] = date_csv_added
+
+        # Row fingerprint over the attribute values in sorted key order, same as normalize_dataframe
+        item_string = ''.join('' if item[field] is None else str(item[field]) for field in sorted(item)
+                              if field not in FINGERPRINT_EXCLUDED)
+        if balance is None:
+            item.pop('balance', None)
+        item['hash'] = hashlib.sha256(item_string.encode()).hexdigest()
+        # Grouping key for category drill-downs, added after the hash so row keys do not change
+        item['vendor'] = vendor_key(item.get('description'))
+
+        # Threshold rule: refunds/payments and anything before the split start date is already reviewed
+        reviewed = _is_reviewed(-amount_value if negate else amount_value, item.get('transaction_date'))
+        item['split'] = False if reviewed else None
+        item['status'] = "reviewed" if reviewed else "pending"
+        # Partition key of the userid_status-transaction_date-index GSI, kept out of the hash
+        item['userid_status'] = f"{user_id}#{item['status']}"
+        items.append(item)
+
+    if skipped:
+        print(f"Skipping {skipped} rows without a usable amount")
+    return items
@@ -1,105 +1,170 @@
 from datetime import datetime, timezone
-import boto3
-from decimal import Decimal
-from split import split_percent, get_split_data
-import hashlib
+import aws_clients
+from split import get_split_data
+from rollups import RollupDeltas, apply_deltas
+from instrumentation import METRICS
+import itertools
+import random
+import time
 
 TABLE_NAME = 'TransactionSplitTable'
 
-# Helper function to convert a date string to YYYY-MM-DD format
-def convert_date_format(date_string, input_format):
-    try:
-        # Parse the date from the input format and convert to YYYY-MM-DD
-        return datetime.strptime(date_string, input_format).strftime('%Y-%m-%d')
-    except ValueError:
-        # Handle any invalid date format by returning the original value
-        return date_string
+# BatchWriteItem accepts at most 25 put/delete requests per call
+BATCH_WRITE_SIZE = 25
+BATCH_WRITE_MAX_ATTEMPTS = 8
+BATCH_WRITE_BASE_DELAY = 0.05
+BATCH_WRITE_MAX_DELAY = 5.0
+
+def _backoff_delay(attempt):
+    # Full jitter: sleep a random amount up to the capped exponential delay
+    return random.uniform(0, min(BATCH_WRITE_MAX_DELAY, BATCH_WRITE_BASE_DELAY * (2 ** attempt)))
+
+def existing_keys(table_name, keys, key_names, dynamodb):
+    """Return the subset of key tuples that already have an item, using one BatchGetItem.
+
+    UnprocessedKeys are retried with the same backoff as writes; RuntimeError once they run out.
+    """
+    names = {f'#k{i}': key for i, key in enumerate(key_names)}
+    request = {table_name: {
+        'Keys': [dict(zip(key_names, key)) for key in keys],
+        'ProjectionExpression': ', '.join(names),
+        'ExpressionAttributeNames': names
+    }}
+
+    found = set()
+    attempt = 0
+    while request:
+        response = dynamodb.batch_get_item(RequestItems=request)
+        for item in response['Responses'].get(table_name, []):
+            found.add(tuple(item[key] for key in key_names))
+        request = response.get('UnprocessedKeys')
+        if request:
+            attempt += 1
+            if attempt >= BATCH_WRITE_MAX_ATTEMPTS:
+                # Writing without knowing which rows exist would overwrite reviewed ones
+                raise RuntimeError(f"Could not look up {len(request[table_name]['Keys'])} keys in table "
+                                   f"'{table_name}' after {attempt} attempts")
+            time.sleep(_backoff_delay(attempt))
+    return found
+
+def batch_write_items(table_name, items, key_names=('hash',), dynamodb=None, skip_existing=False, on_written=None):
+    """Write items in 25-item BatchWriteItem groups and return a summary of the work done.
+
+    Items may be any iterable, including a generator; only one group is held at a time.
+    UnprocessedItems are resubmitted with jittered exponential backoff. Items sharing a key
+    within a group are collapsed to the last one, matching what put_item calls would leave.
+    With skip_existing, each group's keys are looked up first and items already in the table
+    are left untouched. Collapsed and existing items are counted as skipped. on_written, when
+    given, is called with the items of every response that DynamoDB accepted.
+    """
+    if dynamodb is None:
+        dynamodb = aws_clients.dynamodb()
+
+    summary = {'written': 0, 'skipped': 0, 'retried': 0, 'failed': 0, 'batches': 0}
+
+    items = iter(items)
+    while True:
+        group = list(itertools.islice(items, BATCH_WRITE_SIZE))
+        if not group:
+            break
+
+        # BatchWriteItem rejects a request that contains the same key twice
+        unique_items = {}
+        for item in group:
+            unique_items[tuple(item[key] for key in key_names)] = item
+        summary['skipped'] += len(group) - len(unique_items)
+
+        if skip_existing:
+            # Rows from an overlapping export keep their reviewed status and split
+            for key in existing_keys(table_name, list(unique_items), key_names, dynamodb):
+                del unique_items[key]
+                summary['skipped'] += 1
+            if not unique_items:
+                continue
+
+        requests = [{'PutRequest': {'Item': item}} for item in unique_items.values()]
+        summary['batches'] += 1
+
+        attempt = 0
+        while requests:
+            response = dynamodb.batch_write_item(RequestItems={table_name: requests})
+            unprocessed = response.get('UnprocessedItems', {}).get(table_name, [])
+            summary['written'] += len(requests) - len(unprocessed)
+            if on_written is not None:
+                pending = {tuple(request['PutRequest']['Item'][key] for key in key_names) for request in unprocessed}
+                on_written([request['PutRequest']['Item'] for request in requests
+                            if tuple(request['PutRequest']['Item'][key] for key in key_names) not in pending])
+
+            if not unprocessed:
+                break
+
+            attempt += 1
+            if attempt >= BATCH_WRITE_MAX_ATTEMPTS:
+                summary['failed'] += len(unprocessed)
+                print(f"Giving up on {len(unprocessed)} unprocessed items for table '{table_name}' after {attempt} attempts")
+                break
+
+            summary['retried'] += len(unprocessed)
+            time.sleep(_backoff_delay(attempt))
+            requests = unprocessed
+
+    return summary
 
 def update_dynamodb_from_csv(df, mapping_config, file_name):
-    # This is for transactions before spliting purchases with partner
-    # hard coded for my case as this shouldn't change
-    date_threshold = datetime.strptime('2024-09-01', '%Y-%m-%d')
-    
-    dynamodb = boto3.resource('dynamodb')
-    table = dynamodb.Table(TABLE_NAME)
-
-    # Get the date format for the current bank from the mapping config
-    date_format = mapping_config.get('date_format', None)
+    return update_dynamodb_from_frames([df], mapping_config, file_name)
+
+def iter_items(frames, mapping_config, user_id, split_index, normalize=None):
+    if normalize is None:
+        # normalize pulls in pandas, so it is only imported once there are rows to convert
+        from normalize import normalize_dataframe as normalize
+
+    # Normalize and split one DataFrame at a time so only a single chunk of items is alive
+    date_csv_added = datetime.now(timezone.utc).strftime('%Y-%m-%d')
+    for df in frames:
+        with METRICS.stage('normalize'):
+            items = normalize(df, mapping_config, user_id, date_csv_added)
+        with METRICS.stage('split'):
+            items = split_index.resolve(items)
+        yield from items
+
+def update_dynamodb_from_frames(frames, mapping_config, file_name, normalize=None):
+    """Write every row from an iterable of DataFrames (the whole file or streamed chunks) to DynamoDB.
+
+    normalize turns one frame into items; it defaults to normalize_dataframe, the stdlib engine
+    passes csv_rows.normalize_rows with lists of row dicts as the frames.
+    """
+    dynamodb = aws_clients.dynamodb()
 
     # Userid is the last part of the file name
     file_parts = file_name.split('/')[-1].split('_')
     user_id = file_parts[0]
 
-    split_percent_data = get_split_data("SplitTable", user_id)
-
-    for _, row in df.iterrows():
-        item = {}
-        item['userid'] = user_id
-
-        for key, value in mapping_config.items():
-            if value in df.columns and key != 'name':
-                if key == 'debit' and row[value] != "0":
-                    debit_value = str(row['Debit']).replace('$', '').replace(',', '')
-                    item['amount'] = Decimal(debit_value).quantize(Decimal('0.01')) * Decimal('-1')
-                elif key == 'credit' and row[value] != "0":
-                    credit_value = str(row['Credit']).replace('$', '').replace(',', '')
-                    item['amount'] = Decimal(credit_value).quantize(Decimal('0.01'))
-                elif key == 'payee':
-                    item['description'] = str(row[value])
-                elif key == 'transaction_date' or key == 'post_date':
-                    # Convert the date to YYYY-MM-DD using the bank's specific date format
-                    if date_format:
-                        item[key] = convert_date_format(str(row[value]), date_format)
-                    else:
-                        item[key] = str(row[value])
-                elif mapping_config.get('name') in ['amex_credit', 'discover_credit', 'sams_credit'] and key == 'amount':
-                    item['amount'] = Decimal(row[value]).quantize(Decimal('0.01')) * Decimal('-1')
-                elif key not in ['name', 'debit', 'credit', 'reference_number', 'payee']:
-                    item[key] = str(row[value]) if row[value] is not None else None
-
-        item['mapping_config_name'] = mapping_config['name']
-        
-        item['date_csv_added'] = datetime.now(timezone.utc).strftime('%Y-%m-%d')
-
-        if 'amount' in item:
-            item['amount'] = Decimal(str(item['amount']).replace(',', '')).quantize(Decimal('0.01'))
-            
-        if 'balance' in item:
-            balance_value = str(item['balance']).replace('$', '').replace(',', '')
-            item['balance'] = Decimal(balance_value).quantize(Decimal('0.01'))
-
-        item_string = ''.join(str(item.get(field, '')) for field in sorted(item.keys()))
-        item['hash'] = hashlib.sha256(item_string.encode()).hexdigest()
-
-        item = split_percent(item, split_percent_data)
-        
-        item['split'] = None
-        item['status'] = "pending"
-        
-        if item['amount'] <= 0:
-            # Convert the transaction date to a datetime object
-            if 'transaction_date' in item:
-                try:
-                    transaction_date = datetime.strptime(item['transaction_date'], '%Y-%m-%d')
-                except ValueError:
-                    transaction_date = None  # Handle invalid date format if needed
-
-                # Check if the transaction is before the threshold date
-                if transaction_date and transaction_date < date_threshold:
-                    item['split'] = False
-                    item['status'] = "reviewed"
-        else:
-            item['split'] = False
-            item['status'] = "reviewed"
-
-        table.put_item(Item=item)
-
-    print(f'Successfully updated DynamoDB table with data from CSV with mapping: {mapping_config}')
-
-
-def store_hash_in_dynamodb(table_name, hash, file_name, mapping_config):
-    dynamodb = boto3.resource('dynamodb')
-    table = dynamodb.Table(table_name)
+    split_index = get_split_data("SplitTable", user_id)
+
+    items = iter_items(frames, mapping_config, user_id, split_index, normalize)
+    # Already-reviewed rows, like refunds and pre-split history, count towards the monthly rollups
+    rollup_deltas = RollupDeltas()
+    # Pulling items runs parse, normalize and split, which are timed as their own stages
+    with METRICS.stage('write'):
+        try:
+            summary = batch_write_items(TABLE_NAME, items, dynamodb=dynamodb, skip_existing=True,
+                                        on_written=rollup_deltas.add_all)
+        finally:
+            # Rows that made it in are counted even when the upload fails and is retried
+            apply_deltas(dynamodb.meta.client, rollup_deltas)
+    print(f"Batch write summary for {file_name}: {summary}")
+    print(f"{summary['written']} new rows, {summary['skipped']} skipped as duplicates")
+
+    if summary['failed']:
+        # Fail the invocation so the file hash is not stored and the upload can be retried
+        raise RuntimeError(f"{summary['failed']} rows from {file_name} could not be written to {TABLE_NAME}")
+
+    print(f"Successfully updated DynamoDB table with data from CSV with mapping: {mapping_config['name']}")
+    return summary
+
+
+def store_hash_in_dynamodb(table_name, hash, file_name, mapping_config, s3_key=None):
+    table = aws_clients.dynamodb().Table(table_name)
 
     # Get the current datetime
     current_datetime = datetime.now().isoformat()
@@ -107,19 +172,28 @@ def store_hash_in_dynamodb(table_name, hash, file_name, mapping_config):
     file_parts = file_name.split('/')[-1].split('_')
     user_id = file_parts[0]
 
-    # Put the item in the DynamoDB table
-    table.put_item(Item={
-        'hash': hash,
-        'date_added': current_datetime,
-        'user_id': user_id,
-        'mapping_config': mapping_config
-    })
+    # Put the item in the DynamoDB table, unless another upload of the same file got there first
+    try:
+        table.put_item(
+            Item={
+                'hash': hash,
+                'date_added': current_datetime,
+                'user_id': user_id,
+                'mapping_config': mapping_config,
+                's3_key': s3_key  # Archived location under old_csv/, listed by fetch_old_csvs
+            },
+            ConditionExpression='attribute_not_exists(#h)',
+            ExpressionAttributeNames={'#h': 'hash'}
+        )
+    except table.meta.client.exceptions.ConditionalCheckFailedException:
+        print(f"hash '{hash}' was already stored in DynamoDB table '{table_name}'.")
+        return False
 
     print(f"hash '{hash}' stored in DynamoDB table '{table_name}' with date '{current_datetime}'.")
+    return True
 
 def check_duplicate_hash(table_name, hash_value):
-    dynamodb = boto3.resource('dynamodb')
-    table = dynamodb.Table(table_name)
+    table = aws_clients.dynamodb().Table(table_name)
     
     try:
         response = table.get_item(
@@ -0,0 +1,50 @@
+from collections import defaultdict
+from mapping_configurations import mapping_configs
+
+# Config keys that describe the format rather than name a column
+NON_COLUMN_KEYS = ['name', 'date_format']
+
+class FormatIndex:
+    """Required column sets of every mapping config, compiled once for fast header matching.
+
+    match() returns the same config as checking every config in turn: the one with the most
+    required columns that are all present in the header, the earliest config winning ties.
+    """
+
+    def __init__(self, configs):
+        self.exact = {}
+        self.by_column = defaultdict(list)
+        self.required_counts = []
+        self.configs = []
+
+        for position, config in enumerate(configs.values()):
+            required_cols = frozenset(col for key, col in config.items() if key not in NON_COLUMN_KEYS)
+            self.configs.append(config)
+            self.required_counts.append(len(required_cols))
+            self.exact.setdefault(required_cols, position)
+            for col in required_cols:
+                self.by_column[col].append(position)
+
+    def match(self, header):
+        header = frozenset(header)
+
+        # Most exports carry exactly the columns a config needs, one dict lookup finds those.
+        # Any other matching config needs a subset of these columns, so it cannot need more.
+        position = self.exact.get(header)
+        if position is not None:
+            return self.configs[position]
+
+        # Otherwise count, per config, how many of its required columns the header has
+        found = defaultdict(int)
+        for col in header:
+            for position in self.by_column.get(col, ()):
+                found[position] += 1
+
+        best = None
+        for position, count in found.items():
+            if count == self.required_counts[position] and (
+                    best is None or (count, -position) > (self.required_counts[best], -best)):
+                best = position
+        return self.configs[best] if best is not None else None
+
+FORMAT_INDEX = FormatIndex(mapping_configs)
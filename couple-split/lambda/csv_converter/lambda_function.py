@@ -1,71 +1,219 @@
-import boto3
-import pandas as pd
-import io
+import time
+INIT_STARTED = time.perf_counter()
+
+import json
+import os
 import hashlib
-from dynamodb_utils import store_hash_in_dynamodb, check_duplicate_hash, update_dynamodb_from_csv
-from utils import rename_file, get_csv_file_from_s3
-from mapping_configurations import mapping_configs
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import aws_clients
+import csv_rows
+from aws_clients import record_since, report_cold_start, timed
+from dynamodb_utils import store_hash_in_dynamodb, check_duplicate_hash, update_dynamodb_from_csv, update_dynamodb_from_frames
+from utils import rename_file, get_csv_file_from_s3, iter_s3_chunks, open_csv_stream, read_first_line
+from format_index import FORMAT_INDEX
+from instrumentation import METRICS, emits_metrics
 
-def calculate_hash(data):
-    # Calculate MD5 hash
-    hash = hashlib.md5(data).hexdigest()
-    return hash
+record_since('module_imports_ms', INIT_STARTED)
 
-def lambda_handler(event, context):
-    s3 = boto3.client("s3")
+# pandas is imported on first use, duplicate uploads are rejected without ever loading it
+pd = None
+
+# Files larger than this are streamed in chunks instead of being read into memory at once
+STREAMING_THRESHOLD_BYTES = int(os.environ.get('STREAMING_THRESHOLD_BYTES', 5 * 1024 * 1024))
+# Rows parsed, normalized and written per chunk in streaming mode
+STREAM_CHUNK_ROWS = int(os.environ.get('STREAM_CHUNK_ROWS', 5000))
+
+# 'pandas' parses with pd.read_csv, 'stdlib' with the csv module and needs no pandas layer
+CSV_ENGINE = os.environ.get('CSV_ENGINE', 'pandas')
+if CSV_ENGINE not in ('pandas', 'stdlib'):
+    raise ValueError(f"CSV_ENGINE must be 'pandas' or 'stdlib', got '{CSV_ENGINE}'")
+
+# S3 records of one event processed at the same time, each buffered file is held in memory
+RECORD_WORKERS = int(os.environ.get('RECORD_WORKERS', 4))
+
+# Bank of America checking exports start with a summary block before the transactions
+BOFA_SUMMARY_HEADER = ['Description', 'Unnamed: 1', 'Summary Amt.']
+BOFA_CHECKING_HEADER = ['Date', 'Description', 'Amount', 'Running Bal.']
+
+def load_pandas():
+    global pd
+    if pd is None:
+        with timed('pandas_import_ms'):
+            import pandas
+        pd = pandas
+    return pd
+
+def csv_read_options(header):
+    # Work out the real header and the read_csv arguments from the first parsed row
+    if header == BOFA_SUMMARY_HEADER:
+        return BOFA_CHECKING_HEADER, {'skiprows': 8, 'header': None, 'names': BOFA_CHECKING_HEADER}
+    return header, {}
+
+def find_mapping_config(header):
+    # The config with the most required columns present in the header, from the compiled index
+    return FORMAT_INDEX.match(header)
+
+def read_csv_frames(stream, read_options, chunk_rows=STREAM_CHUNK_ROWS):
+    # Parse the stream incrementally; every column is read as text so types match across chunks
+    return load_pandas().read_csv(stream, dtype=str, chunksize=chunk_rows, **read_options)
+
+def read_buffered(file_content, read_options):
+    # Text columns like the streaming and stdlib paths, so a row fingerprints the same on every path
+    return load_pandas().read_csv(file_content, dtype=str, **read_options)
+
+def read_frames(stream, read_options):
+    """Return (chunks, normalize) for streaming a file through the configured engine."""
+    if CSV_ENGINE == 'stdlib':
+        frames, normalize = csv_rows.read_row_chunks(stream, read_options, STREAM_CHUNK_ROWS), csv_rows.normalize_rows
+    else:
+        frames, normalize = read_csv_frames(stream, read_options), None
+    return METRICS.timed_iter('parse', frames), normalize
+
+def detect_format(s3, bucket, key):
+    """Match the file's header from a ranged read of its first line.
+
+    Returns (mapping_config, read_options, etag_md5); etag_md5 is the file hash when the
+    object's ETag is its MD5, which saves hashing the body at all.
+    """
+    first_line, md5 = read_first_line(s3, bucket, key)
+    # csv_rows names the columns exactly like pd.read_csv, so this works for both engines
+    header, read_options = csv_read_options(csv_rows.read_header(first_line))
+    return find_mapping_config(header), read_options, md5
+
+class HashClaims:
+    """File hashes being ingested by the records of one event.
+
+    Two uploads of the same file in one event would both miss HashTable while the first is
+    still being ingested. The first record to reach a hash claims it for its thread; any other
+    record with that hash waits for it to finish and then checks HashTable again.
+    """
 
-    for record in event['Records']:
-        bucket = record['s3']['bucket']['name']
-        key = record['s3']['object']['key']
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = {}
 
-        file_content = get_csv_file_from_s3(s3, bucket, key)
+    def is_duplicate(self, hash):
+        # Returns False once the calling thread owns the hash, release_owned() must follow
+        while True:
+            with self.lock:
+                owner, done = self.pending.get(hash, (None, None))
+                if done is None:
+                    self.pending[hash] = (threading.get_ident(), threading.Event())
+            if done is not None:
+                done.wait()
+                continue
+            if check_duplicate_hash('HashTable', hash):
+                self.release_owned()
+                return True
+            return False
 
-        # Calculate hash
-        hash = calculate_hash(file_content)
+    def release_owned(self):
+        # Called once a record is stored, rejected or failed, wakes any record waiting on its hash
+        me = threading.get_ident()
+        with self.lock:
+            owned = [hash for hash, (owner, _) in self.pending.items() if owner == me]
+            released = [self.pending.pop(hash)[1] for hash in owned]
+        for done in released:
+            done.set()
 
+def process_buffered(s3, bucket, key, mapping_config, read_options, claims, hash=None):
+    # The MD5 is updated while the body downloads into the single buffer that gets parsed
+    md5 = hashlib.md5() if hash is None else None
+    file_content = get_csv_file_from_s3(s3, bucket, key, hasher=md5)
+
+    if md5 is not None:
+        hash = md5.hexdigest()
         # Check if hash already exists in DynamoDB
-        if not check_duplicate_hash('HashTable', hash):
-            df_headers = pd.read_csv(io.BytesIO(file_content), nrows=1)
-            header = df_headers.columns.tolist()
-            
-            if header == ['Description', 'Unnamed: 1', 'Summary Amt.']:
-                header = ['Date', 'Description', 'Amount', 'Running Bal.']
-                df = pd.read_csv(io.BytesIO(file_content), skiprows=8, header=None, names=header)
-            else:
-                df = pd.read_csv(io.BytesIO(file_content))
-                header = df.columns.tolist()  # Update header after reading the CSV
-
-            # Initialize variables to keep track of the best match
-            best_match = None
-            max_matched_columns = 0
-
-            for format_name, config in mapping_configs.items():
-                # Get the required columns for this configuration
-                required_cols = set(col for key, col in config.items() if key not in ['name', 'date_format'])
-                # Check if all required columns are present in the header
-                if required_cols.issubset(header):
-                    matched_columns = len(required_cols)
-                    # Prioritize configurations with more matched columns
-                    if matched_columns > max_matched_columns:
-                        best_match = config
-                        max_matched_columns = matched_columns
-
-            # Assign the best matching configuration
-            if best_match:
-                mapping_config = best_match
-                update_dynamodb_from_csv(df, mapping_config, key)
-                new_key = rename_file(key, mapping_config, hash)
-                s3.copy_object(Bucket=bucket, Key=f'old_csv/{new_key}', CopySource=f'{bucket}/{key}')
-                s3.delete_object(Bucket=bucket, Key=key)
-                # Store the hash and date in DynamoDB
-                store_hash_in_dynamodb('HashTable', hash, key, mapping_config['name'])
-            else:
-                print(f'No matching mapping configuration found for CSV file: {key}')
+        if claims.is_duplicate(hash):
+            return 'duplicate', hash
+
+    if CSV_ENGINE == 'stdlib':
+        frames, normalize = read_frames(file_content, read_options)
+        update_dynamodb_from_frames(frames, mapping_config, key, normalize=normalize)
+    else:
+        with METRICS.stage('parse'):
+            df = read_buffered(file_content, read_options)
+        update_dynamodb_from_csv(df, mapping_config, key)
+    return 'processed', hash
+
+def process_streaming(s3, bucket, key, mapping_config, read_options, claims, hash=None):
+    if hash is None:
+        # Without a usable ETag the file is hashed in a download-only pass first, so a duplicate
+        # is rejected before a single row is parsed, looked up or written
+        md5 = hashlib.md5()
+        for _ in iter_s3_chunks(s3, bucket, key, hasher=md5):
+            pass
+        hash = md5.hexdigest()
+        if claims.is_duplicate(hash):
+            return 'duplicate', hash
+
+    _, stream = open_csv_stream(s3, bucket, key)
+    frames, normalize = read_frames(stream, read_options)
+    update_dynamodb_from_frames(frames, mapping_config, key, normalize=normalize)
+    return 'processed', hash
+
+def process_record(s3, record, claims):
+    """Ingest one uploaded file and return its result for the handler's summary."""
+    bucket = record['s3']['bucket']['name']
+    key = record['s3']['object']['key']
+    size = record['s3']['object'].get('size', 0)
+
+    # Unknown formats are rejected before the body is downloaded or parsed
+    mapping_config, read_options, hash = detect_format(s3, bucket, key)
+    if not mapping_config:
+        print(f'No matching mapping configuration found for CSV file: {key}')
+        return {'key': key, 'status': 'unmatched'}
+
+    try:
+        if hash and claims.is_duplicate(hash):
+            # The ETag already is the file MD5, a duplicate never gets downloaded
+            status = 'duplicate'
+        elif size > STREAMING_THRESHOLD_BYTES:
+            print(f"Streaming {key} ({size} bytes) in chunks of {STREAM_CHUNK_ROWS} rows")
+            status, hash = process_streaming(s3, bucket, key, mapping_config, read_options, claims, hash)
         else:
+            status, hash = process_buffered(s3, bucket, key, mapping_config, read_options, claims, hash)
+
+        if status == 'processed':
+            new_key = f"old_csv/{rename_file(key, mapping_config, hash)}"
+            s3.copy_object(Bucket=bucket, Key=new_key, CopySource=f'{bucket}/{key}')
+            # Store the hash, date and archived key in DynamoDB; a concurrent invocation may have won
+            if not store_hash_in_dynamodb('HashTable', hash, key, mapping_config['name'], new_key):
+                status = 'duplicate'
+        if status == 'duplicate':
             print(f"File with hash '{hash}' has already been processed. Skipping further processing.")
-            s3.delete_object(Bucket=bucket, Key=key)
-            
+        s3.delete_object(Bucket=bucket, Key=key)
+    finally:
+        claims.release_owned()
+
+    return {'key': key, 'status': status, 'hash': hash}
+
+def _safe_process_record(s3, record, claims):
+    # A failing file is reported and left in input_csv/, the other records carry on
+    try:
+        return process_record(s3, record, claims)
+    except Exception as e:
+        key = record.get('s3', {}).get('object', {}).get('key')
+        print(f"Error processing {key}: {e}")
+        return {'key': key, 'status': 'error', 'error': str(e)}
+
+@emits_metrics
+def lambda_handler(event, context):
+    s3 = aws_clients.s3()
+    records = event['Records']
+    claims = HashClaims()
+
+    if len(records) > 1 and RECORD_WORKERS > 1:
+        with ThreadPoolExecutor(max_workers=min(RECORD_WORKERS, len(records))) as pool:
+            results = list(pool.map(lambda record: _safe_process_record(s3, record, claims), records))
+    else:
+        results = [_safe_process_record(s3, record, claims) for record in records]
+
+    report_cold_start()
+
+    failed = any(result['status'] == 'error' for result in results)
     return {
-        'statusCode': 200,
-        'body': 'Successfully processed the S3 event'
+        'statusCode': 207 if failed else 200,
+        'body': json.dumps({'results': results})
     }
@@ -0,0 +1,133 @@
+from datetime import datetime, timezone
+from decimal import Decimal
+import hashlib
+import pandas as pd
+from vendors import vendor_key
+# The rules are shared with the pandas-free engine so both always agree
+from csv_rows import CENT, DATE_KEYS, FINGERPRINT_EXCLUDED, NEGATED_AMOUNT_CONFIGS, NEGATIVE_ONE, SKIPPED_KEYS, SPLIT_START
+
+SPLIT_START_DATE = pd.Timestamp(SPLIT_START)
+
+
+def _strip_money(series):
+    # Remove currency symbols and thousands separators from a whole column at once
+    return (series.astype(str)
+            .str.replace('$', '', regex=False)
+            .str.replace(',', '', regex=False)
+            .str.strip())
+
+def _convert_dates(series, date_format):
+    # Convert a column to YYYY-MM-DD, keeping the original text for values that do not parse
+    text = series.astype(str)
+    if not date_format:
+        return text
+    parsed = pd.to_datetime(text, format=date_format, errors='coerce')
+    return parsed.dt.strftime('%Y-%m-%d').where(parsed.notna(), text)
+
+def _amount_columns(df, mapping_config):
+    """Return the cleaned amount text and its sign (1 or -1) for every row."""
+    sign = pd.Series(1, index=df.index)
+
+    debit_col = mapping_config.get('debit')
+    credit_col = mapping_config.get('credit')
+    if debit_col in df.columns or credit_col in df.columns:
+        # Merge debit and credit columns: credits are kept as-is, debits become negative
+        debit = _strip_money(df[debit_col]) if debit_col in df.columns else pd.Series('nan', index=df.index)
+        credit = _strip_money(df[credit_col]) if credit_col in df.columns else pd.Series('nan', index=df.index)
+        credit_value = pd.to_numeric(credit, errors='coerce')
+        use_credit = credit_value.notna() & (credit_value != 0)
+        return credit.where(use_credit, debit), sign.where(use_credit, -1)
+
+    amount_col = mapping_config.get('amount')
+    if amount_col not in df.columns:
+        return None, sign
+
+    if mapping_config.get('name') in NEGATED_AMOUNT_CONFIGS:
+        sign = -sign
+    return _strip_money(df[amount_col]), sign
+
+def _to_decimals(text, sign=None):
+    # Decimal construction is the only per-cell step left, done once per value
+    if sign is None:
+        return [Decimal(value).quantize(CENT) for value in text]
+    return [Decimal(value).quantize(CENT) * NEGATIVE_ONE if negate else Decimal(value).quantize(CENT)
+            for value, negate in zip(text, sign < 0)]
+
+def normalize_dataframe(df, mapping_config, user_id, date_csv_added=None):
+    """Normalize a whole statement DataFrame column-at-a-time into ready-to-write items.
+
+    Items carry the same attributes as the previous row-by-row conversion; the hash is a row
+    fingerprint that leaves out date_csv_added. Rows whose amount cannot be parsed are dropped.
+    Split amounts are not filled in here, see split.py.
+    """
+    if date_csv_added is None:
+        date_csv_added = datetime.now(timezone.utc).strftime('%Y-%m-%d')
+
+    columns = {}
+    for key, value in mapping_config.items():
+        if key in SKIPPED_KEYS or key == 'amount' or value not in df.columns:
+            continue
+        if key in DATE_KEYS:
+            columns[key] = _convert_dates(df[value], mapping_config.get('date_format'))
+        else:
+            columns[key] = df[value].astype(str)
+
+    payee_col = mapping_config.get('payee')
+    if payee_col in df.columns:
+        columns['description'] = df[payee_col].astype(str)
+
+    amount_text, amount_sign = _amount_columns(df, mapping_config)
+    if amount_text is None:
+        print(f"No amount column for mapping {mapping_config['name']}, nothing to normalize")
+        return []
+
+    amount_value = pd.to_numeric(amount_text, errors='coerce') * amount_sign
+    valid = amount_value.notna()
+    if not valid.all():
+        print(f"Skipping {int((~valid).sum())} rows without a usable amount")
+        columns = {key: column[valid] for key, column in columns.items()}
+        amount_text, amount_sign, amount_value = amount_text[valid], amount_sign[valid], amount_value[valid]
+
+    columns['amount'] = _to_decimals(amount_text, amount_sign)
+
+    if 'balance' in columns:
+        balance_text = _strip_money(columns['balance'])
+        has_balance = pd.to_numeric(balance_text, errors='coerce').notna()
+        columns['balance'] = [Decimal(value).quantize(CENT) if present else None
+                              for value, present in zip(balance_text, has_balance)]
+
+    row_count = len(amount_value)
+    columns['userid'] = [user_id] * row_count
+    columns['mapping_config_name'] = [mapping_config['name']] * row_count
+    columns['date_csv_added'] = [date_csv_added] * row_count
+
+    # Row fingerprint: hash over the attribute values in sorted key order, leaving out the
+    # upload date so the same row from an overlapping re-export gets the same key
+    fields = sorted(columns.keys())
+    text_columns = [columns[field] if isinstance(columns[field], pd.Series)
+                    else [('' if value is None else str(value)) for value in columns[field]]
+                    for field in fields if field not in FINGERPRINT_EXCLUDED]
+    hashes = [hashlib.sha256(''.join(parts).encode()).hexdigest() for parts in zip(*text_columns)]
+
+    # Threshold rule: refunds/payments and anything before the split start date is already reviewed
+    reviewed = amount_value > 0
+    if 'transaction_date' in columns:
+        transaction_date = pd.to_datetime(columns['transaction_date'], format='%Y-%m-%d', errors='coerce')
+        reviewed = reviewed | (transaction_date < SPLIT_START_DATE)
+    reviewed = reviewed.tolist()
+
+    values = [column.tolist() if isinstance(column, pd.Series) else column for column in
+              (columns[field] for field in fields)]
+    items = []
+    for row_values, row_hash, row_reviewed in zip(zip(*values), hashes, reviewed):
+        item = {field: value for field, value in zip(fields, row_values) if value is not None}
+        item['hash'] = row_hash
+        # Grouping key for category drill-downs, added after the hash so row keys do not change
+        item['vendor'] = vendor_key(item.get('description'))
+        item['split'] = False if row_reviewed else None
+        item['status'] = "reviewed" if row_reviewed else "pending"
+        # Partition key of the userid_status-transaction_date-index GSI, kept out of the hash
+        item['userid_status'] = f"{user_id}#{item['status']}"
+        items.append(item)
+
+    return items
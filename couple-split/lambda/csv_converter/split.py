@@ -1,40 +1,84 @@
-import boto3
+import aws_clients
+from collections import namedtuple
+from decimal import Decimal
+
+# Split settings for one (userid, category) with the amount multipliers worked out once
+SplitRule = namedtuple('SplitRule', ['need', 'split_percent', 'after_split_multiplier', 'partner_split_multiplier'])
+
+class SplitIndex:
+    """SplitTable rows indexed by (userid, category) for resolving many transactions at once."""
+
+    def __init__(self, rows):
+        self.rules = {}
+        for row in rows:
+            percent = Decimal(str(row['split_percent']))
+            self.rules[(row['userid'], row['category'])] = SplitRule(
+                need=row['need'],
+                split_percent=row['split_percent'],
+                after_split_multiplier=percent / 100,
+                partner_split_multiplier=(100 - percent) / 100,
+            )
+
+    def __len__(self):
+        return len(self.rules)
+
+    def apply(self, item):
+        if 'category' not in item:
+            # Dont store the other values in the item to save space in table
+            item['split_percent'] = 0
+            return item
+
+        rule = self.rules.get((item['userid'], item['category']))
+        if rule is None:
+            return item
+
+        item['need'] = rule.need
+
+        # only do this for items that cost money not once that were refunds or payments
+        if item['amount'] < 0:
+            item['split_percent'] = rule.split_percent
+
+            # Calculate amount after a split
+            if rule.split_percent == 0:
+                item['after_split_amount'] = item['amount']
+                item['partner_split_amount'] = 0
+            elif rule.split_percent == 100:
+                item['after_split_amount'] = 0
+                item['partner_split_amount'] = item['amount']
+            else:
+                item['after_split_amount'] = item['amount'] * rule.after_split_multiplier
+                item['partner_split_amount'] = item['amount'] * rule.partner_split_multiplier
+
+        return item
+
+    def resolve(self, items):
+        # Fill in need/split_percent/split amounts for a whole batch of transactions
+        return [self.apply(item) for item in items]
+
 
 def get_split_data(table_name, user_id):
-    dynamodb = boto3.resource('dynamodb')
-    table = dynamodb.Table(table_name)
-    response = table.query(
-        KeyConditionExpression='userid = :userid',
-        ExpressionAttributeValues={
-            ':userid': user_id  
+    table = aws_clients.dynamodb().Table(table_name)
+
+    query_params = {
+        'KeyConditionExpression': 'userid = :userid',
+        'ExpressionAttributeValues': {
+            ':userid': user_id
         }
-    )
-    return response['Items']
+    }
+
+    rows = []
+    while True:
+        response = table.query(**query_params)
+        rows.extend(response['Items'])
+        if 'LastEvaluatedKey' not in response:
+            break
+        query_params['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    return SplitIndex(rows)
 
 
 def split_percent(item, table_data):
-    if 'category' in item:
-        for row in table_data:
-            if row['userid'] == item['userid'] and row['category'] == item['category']:
-                item['need'] = row['need']
-                
-                # only do this for items that cost money not once that were refunds or payments
-                if(item['amount'] < 0):
-                    item['split_percent'] = row['split_percent']
-                    
-                    # Calculate amount after a split
-                    if item['split_percent'] == 0:
-                        item['after_split_amount'] = item['amount']
-                        item['partner_split_amount'] = 0
-                    elif item['split_percent'] == 100:
-                        item['after_split_amount'] = 0
-                        item['partner_split_amount'] = item['amount']
-                    else:
-                        item['after_split_amount'] = item['amount'] * (item['split_percent'] / 100)
-                        item['partner_split_amount'] = item['amount'] * ((100 - item['split_percent']) / 100)
-
-    else:
-        # Dont store the other values in the item to save space in table
-        item['split_percent'] = 0
-    
-    return item
+    # table_data is a SplitIndex, or raw SplitTable rows for older callers
+    if not isinstance(table_data, SplitIndex):
+        table_data = SplitIndex(table_data)
+    return table_data.apply(item)
@@ -1,10 +1,104 @@
 from datetime import datetime
+import io
+import itertools
+import re
+from botocore.exceptions import ClientError
+from instrumentation import METRICS
 
-def get_csv_file_from_s3(s3, bucket, key):
-    response = s3.get_object(Bucket=bucket, Key=key)
-    return response['Body'].read()
+# Size of each read from the S3 body in streaming mode
+STREAM_READ_BYTES = 256 * 1024
+
+# Bytes fetched to find the header line, doubled up to the max when the line is longer
+HEADER_SNIFF_BYTES = 4 * 1024
+HEADER_SNIFF_MAX_BYTES = 64 * 1024
+
+MD5_HEX = re.compile(r'[0-9a-f]{32}')
+
+def get_csv_file_from_s3(s3, bucket, key, hasher=None):
+    """Download an object into one BytesIO, feeding hasher as the chunks arrive."""
+    buffer = io.BytesIO()
+    for chunk in iter_s3_chunks(s3, bucket, key, hasher=hasher):
+        buffer.write(chunk)
+    buffer.seek(0)
+    return buffer
+
+def etag_md5(response):
+    """The object's MD5 taken from its ETag, or None when the ETag is not the content MD5."""
+    # Multipart uploads get '<hash>-<parts>' ETags, and KMS or customer-key encryption opaque ones
+    etag = response.get('ETag', '').strip('"')
+    if response.get('ServerSideEncryption') == 'aws:kms' or response.get('SSECustomerAlgorithm'):
+        return None
+    return etag if MD5_HEX.fullmatch(etag) else None
+
+def read_first_line(s3, bucket, key, sniff_bytes=HEADER_SNIFF_BYTES, max_bytes=HEADER_SNIFF_MAX_BYTES):
+    """Return (first line, ETag MD5 or None) using a ranged GET of only the first few KB."""
+    size = sniff_bytes
+    while True:
+        try:
+            response = s3.get_object(Bucket=bucket, Key=key, Range=f'bytes=0-{size - 1}')
+        except ClientError as e:
+            # S3 refuses any range on an empty object
+            if e.response['Error']['Code'] == 'InvalidRange':
+                return b'', None
+            raise
+
+        head = response['Body'].read()
+        if b'\n' in head or len(head) < size or size >= max_bytes:
+            return head.split(b'\n', 1)[0], etag_md5(response)
+        size *= 2
+
+def iter_s3_chunks(s3, bucket, key, chunk_bytes=STREAM_READ_BYTES, hasher=None):
+    # Yield the object body in fixed-size pieces without ever holding the whole file,
+    # updating hasher (e.g. hashlib.md5()) in the same pass
+    # Stages are timed per read, a stage must not stay open across a yield
+    with METRICS.stage('download'):
+        body = s3.get_object(Bucket=bucket, Key=key)['Body']
+    while True:
+        with METRICS.stage('download'):
+            chunk = body.read(chunk_bytes)
+        if not chunk:
+            break
+        if hasher is not None:
+            with METRICS.stage('hash'):
+                hasher.update(chunk)
+        yield chunk
+
+class ChunkStream(io.RawIOBase):
+    """Read-only file object over an iterator of byte chunks, so pandas can parse a stream."""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._pending = b''
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._pending:
+            self._pending = next(self._chunks, None)
+            if self._pending is None:
+                self._pending = b''
+                return 0
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+def open_csv_stream(s3, bucket, key, chunk_bytes=STREAM_READ_BYTES, hasher=None):
+    """Start streaming an S3 object and return (first_line_bytes, stream over the whole body)."""
+    chunks = iter_s3_chunks(s3, bucket, key, chunk_bytes, hasher)
+
+    # Buffer only until the first line is complete so the header can be inspected
+    prefix = b''
+    for chunk in chunks:
+        prefix += chunk
+        if b'\n' in prefix:
+            break
+
+    first_line = prefix.split(b'\n', 1)[0]
+    return first_line, io.BufferedReader(ChunkStream(itertools.chain([prefix], chunks)), chunk_bytes)
 
 def rename_file(key, mapping_config, hash):
     date_uploaded = datetime.now().strftime('%m-%d-%Y')
     new_file_name = f"{mapping_config['name']}-{date_uploaded}-{hash}.csv"
-    return new_file_name
\ No newline at end of file
+    return new_file_name
@@ -0,0 +1,147 @@
+import json
+import random
+import time
+from collections import OrderedDict
+import boto3
+from botocore.exceptions import ClientError
+
+# Initialize S3 and DynamoDB clients
+s3 = boto3.client('s3')
+dynamodb = boto3.resource('dynamodb')
+
+TABLE_NAME = 'HashTable'  # Change this to your actual table name
+
+# S3 bucket
+BUCKET_NAME = 'couple-split-app-project'  # Change this to your actual bucket name
+
+URL_EXPIRES_IN = 3600  # Signed URLs expire in 1 hour
+# Stop handing out a cached URL this long before it expires so the user has time to use it
+URL_REFRESH_MARGIN = 300
+# Largest number of files signed in one request
+MAX_FILES_PER_REQUEST = 25
+# Signed URLs kept per warm container, the least recently used are dropped first
+URL_CACHE_MAX_ENTRIES = 1000
+# BatchGetItem calls before throttled keys are given up on, with jittered exponential backoff
+BATCH_GET_MAX_ATTEMPTS = 5
+BATCH_GET_BASE_DELAY = 0.05
+BATCH_GET_MAX_DELAY = 1.0
+
+# (user_id, hash) -> (download_url, file_name, expires_at), reused while the container stays warm
+url_cache = OrderedDict()
+
+def lambda_handler(event, context):
+    # Handle preflight CORS (OPTIONS request)
+    if event['httpMethod'] == 'OPTIONS':
+        return generate_response(200, 'CORS preflight response', cors=True)
+
+    query_params = event.get('queryStringParameters') or {}
+    user_id = query_params.get('user_id')
+    hashes = [h for h in (query_params.get('hash') or '').split(',') if h]
+
+    if not user_id or not hashes:
+        return generate_response(400, 'user_id and hash are required', cors=True)
+    if len(hashes) > MAX_FILES_PER_REQUEST:
+        return generate_response(400, f'At most {MAX_FILES_PER_REQUEST} files can be signed at once', cors=True)
+
+    try:
+        return generate_response(200, sign_files(user_id, list(dict.fromkeys(hashes))), cors=True)
+    except TimeoutError as e:
+        print(str(e))
+        return generate_response(503, 'The file list is busy, please try again', cors=True)
+    except ClientError as e:
+        print(f"Error interacting with S3 or DynamoDB: {str(e)}")
+        return generate_response(500, f"Error signing download URLs: {str(e)}", cors=True)
+
+
+def sign_files(user_id, hashes):
+    now = time.time()
+    downloads = {}
+
+    # Cached URLs were only stored after checking the file belongs to this user
+    missing = []
+    for hash_value in hashes:
+        cached = cached_url((user_id, hash_value), now)
+        if cached:
+            downloads[hash_value] = {'file_name': cached[1], 'download_url': cached[0]}
+        else:
+            missing.append(hash_value)
+
+    for item in get_hash_items(missing):
+        # Only sign files that were uploaded by the requesting user
+        if item.get('user_id') != user_id or not item.get('s3_key'):
+            continue
+
+        download_url = s3.generate_presigned_url(
+            'get_object',
+            Params={'Bucket': BUCKET_NAME, 'Key': item['s3_key']},
+            ExpiresIn=URL_EXPIRES_IN
+        )
+        file_name = item['s3_key'].split('/')[-1]
+        cache_url((user_id, item['hash']), (download_url, file_name, now + URL_EXPIRES_IN))
+        downloads[item['hash']] = {'file_name': file_name, 'download_url': download_url}
+
+    # Keep the order the files were asked for; unknown or foreign hashes are left out
+    return [dict(hash=hash_value, **downloads[hash_value]) for hash_value in hashes if hash_value in downloads]
+
+
+def cached_url(key, now):
+    cached = url_cache.get(key)
+    if cached is None:
+        return None
+    if cached[2] - now <= URL_REFRESH_MARGIN:
+        # Too close to expiring to hand out, it is signed again and stored afresh
+        del url_cache[key]
+        return None
+    url_cache.move_to_end(key)
+    return cached
+
+
+def cache_url(key, entry):
+    url_cache[key] = entry
+    url_cache.move_to_end(key)
+    while len(url_cache) > URL_CACHE_MAX_ENTRIES:
+        url_cache.popitem(last=False)
+
+
+def get_hash_items(hashes):
+    if not hashes:
+        return []
+
+    request = {TABLE_NAME: {
+        'Keys': [{'hash': hash_value} for hash_value in hashes],
+        'ProjectionExpression': '#hash, user_id, s3_key',
+        'ExpressionAttributeNames': {'#hash': 'hash'}
+    }}
+
+    items = []
+    attempt = 0
+    while request:
+        response = dynamodb.batch_get_item(RequestItems=request)
+        items.extend(response['Responses'].get(TABLE_NAME, []))
+        request = response.get('UnprocessedKeys')
+        if request:
+            attempt += 1
+            if attempt >= BATCH_GET_MAX_ATTEMPTS:
+                raise TimeoutError(f"{len(request[TABLE_NAME]['Keys'])} hashes still unprocessed after {attempt} attempts")
+            # Full jitter, so throttled requests from several users do not retry in step
+            time.sleep(random.uniform(0, min(BATCH_GET_MAX_DELAY, BATCH_GET_BASE_DELAY * (2 ** attempt))))
+
+    return items
+
+
+def generate_response(status_code, body, cors=False):
+    headers = {
+        'Content-Type': 'application/json',
+    }
+    if cors:
+        headers.update({
+            'Access-Control-Allow-Origin': '*',
+            'Access-Control-Allow-Headers': 'Content-Type',
+            'Access-Control-Allow-Methods': 'GET, OPTIONS'
+        })
+
+    return {
+        'statusCode': status_code,
+        'headers': headers,
+        'body': json.dumps(body)
+    }
@@ -0,0 +1,311 @@
+import csv
+import io
+import json
+import re
+import uuid
+import boto3
+import logging
+from decimal import Decimal, ROUND_HALF_EVEN
+from boto3.dynamodb.conditions import Key
+from botocore.exceptions import ClientError
+from instrumentation import LOG_LEVEL, log_payload
+from serialization import json_response
+
+logger = logging.getLogger()
+logger.setLevel(LOG_LEVEL)
+
+s3 = boto3.client('s3')
+lambda_client = boto3.client('lambda')
+dynamodb = boto3.resource('dynamodb')
+table = dynamodb.Table('TransactionSplitTable')
+
+BUCKET_NAME = 'couple-split-app-project'
+# Export state and files live under exports/<userid>/<export_id>, expired by the bucket lifecycle rule
+EXPORT_PREFIX = 'exports/'
+
+# GSI with userid#status as the partition key and transaction_date as the sort key
+USER_STATUS_INDEX = 'userid_status-transaction_date-index'
+
+EXPORT_COLUMNS = ['transaction_date', 'description', 'vendor', 'category', 'amount', 'split',
+                  'after_split_amount', 'partner_split_amount', 'need', 'hash']
+AMOUNT_COLUMNS = {'amount', 'after_split_amount', 'partner_split_amount'}
+BOOLEAN_COLUMNS = {'split', 'need'}
+CONTENT_TYPES = {'csv': 'text/csv', 'parquet': 'application/vnd.apache.parquet'}
+
+# Transactions read per query page
+QUERY_PAGE_SIZE = 1000
+# Every part but the last must be at least 5 MB; memory holds about one part plus one page
+PART_SIZE = 8 * 1024 * 1024
+# Rows per Parquet file; each file is one row group, written and checkpointed on its own
+PARQUET_ROW_GROUP_ROWS = 50000
+# Amounts are exported as decimal(38, 9), enough for any split of a cent amount
+PARQUET_AMOUNT_SCALE = Decimal('1e-9')
+# Hand over to a fresh invocation before the timeout instead of being cut off mid-part or mid-file
+MIN_REMAINING_MS = 60000
+URL_EXPIRES_IN = 3600  # Signed URLs expire in 1 hour
+
+DATE = re.compile(r'\d{4}-\d{2}-\d{2}')
+
+class CsvRows:
+    """Encode transactions as CSV into the buffer for the next multipart part."""
+
+    def __init__(self, header):
+        # A resumed export already uploaded the header with its first part
+        self.header = header
+        self.buffer = bytearray()
+
+    def add(self, items):
+        out = io.StringIO()
+        writer = csv.writer(out)
+        if self.header:
+            writer.writerow(EXPORT_COLUMNS)
+            self.header = False
+        writer.writerows([item.get(column) for column in EXPORT_COLUMNS] for item in items)
+        self.buffer += out.getvalue().encode('utf-8')
+
+    def pending(self):
+        return bool(self.buffer)
+
+    def full(self):
+        return len(self.buffer) >= PART_SIZE
+
+    def take(self):
+        data = bytes(self.buffer)
+        self.buffer.clear()
+        return data
+
+class ParquetFiles:
+    """Encode transactions as standalone Parquet files, one row group each."""
+
+    def __init__(self):
+        # pyarrow comes with the AWSSDKPandas layer and is only needed for Parquet exports
+        import pyarrow
+        import pyarrow.parquet
+        self.pa = pyarrow
+        self.pq = pyarrow.parquet
+        fields = []
+        for column in EXPORT_COLUMNS:
+            if column in AMOUNT_COLUMNS:
+                fields.append((column, pyarrow.decimal128(38, 9)))
+            elif column in BOOLEAN_COLUMNS:
+                fields.append((column, pyarrow.bool_()))
+            else:
+                fields.append((column, pyarrow.string()))
+        self.schema = pyarrow.schema(fields)
+        self.rows = []
+
+    def add(self, items):
+        self.rows.extend(items)
+
+    def pending(self):
+        return bool(self.rows)
+
+    def full(self):
+        return len(self.rows) >= PARQUET_ROW_GROUP_ROWS
+
+    def take(self):
+        columns = {column: [item.get(column) for item in self.rows] for column in EXPORT_COLUMNS}
+        self.rows = []
+        for column in AMOUNT_COLUMNS:
+            columns[column] = [None if value is None else Decimal(value).quantize(PARQUET_AMOUNT_SCALE, ROUND_HALF_EVEN)
+                               for value in columns[column]]
+        sink = self.pa.BufferOutputStream()
+        self.pq.write_table(self.pa.Table.from_pydict(columns, schema=self.schema), sink)
+        return sink.getvalue().to_pybytes()
+
+def state_key(userid, export_id):
+    return f"{EXPORT_PREFIX}{userid}/{export_id}.json"
+
+def load_state(userid, export_id):
+    try:
+        response = s3.get_object(Bucket=BUCKET_NAME, Key=state_key(userid, export_id))
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'NoSuchKey':
+            return None
+        raise
+    return json.loads(response['Body'].read())
+
+def save_state(state):
+    s3.put_object(Bucket=BUCKET_NAME, Key=state_key(state['userid'], state['export_id']),
+                  Body=json.dumps(state).encode('utf-8'), ContentType='application/json')
+
+def start_export(userid, export_format, start_date, end_date, context):
+    export_id = str(uuid.uuid4())
+    state = {
+        'userid': userid,
+        'export_id': export_id,
+        'format': export_format,
+        'start_date': start_date,
+        'end_date': end_date,
+        # CSV is one multipart upload, Parquet a folder of part-NNNNN.parquet files
+        'key': f"{EXPORT_PREFIX}{userid}/{export_id}" + ('.csv' if export_format == 'csv' else '/'),
+        'status': 'running',
+        'upload_id': None,
+        'parts': [],
+        'last_key': None,
+        'rows': 0
+    }
+    save_state(state)
+    continue_export(context, state)
+    return state
+
+def continue_export(context, state):
+    lambda_client.invoke(
+        FunctionName=context.function_name,
+        InvocationType='Event',
+        Payload=json.dumps({'userid': state['userid'], 'export_id': state['export_id']})
+    )
+
+def export_query(state):
+    key_condition = Key('userid_status').eq(f"{state['userid']}#reviewed")
+    if state['start_date'] and state['end_date']:
+        key_condition = key_condition & Key('transaction_date').between(state['start_date'], state['end_date'])
+    elif state['start_date']:
+        key_condition = key_condition & Key('transaction_date').gte(state['start_date'])
+    elif state['end_date']:
+        key_condition = key_condition & Key('transaction_date').lte(state['end_date'])
+    return {
+        'IndexName': USER_STATUS_INDEX,
+        'KeyConditionExpression': key_condition,
+        'ProjectionExpression': ', '.join(f"#{column}" for column in EXPORT_COLUMNS),
+        'ExpressionAttributeNames': {f"#{column}": column for column in EXPORT_COLUMNS},
+        'Limit': QUERY_PAGE_SIZE
+    }
+
+def upload_part(state, data):
+    part_number = len(state['parts']) + 1
+    if state['format'] == 'csv':
+        response = s3.upload_part(Bucket=BUCKET_NAME, Key=state['key'], UploadId=state['upload_id'],
+                                  PartNumber=part_number, Body=data)
+        state['parts'].append({'PartNumber': part_number, 'ETag': response['ETag']})
+    else:
+        # A rerun after a kill writes the same part number again, replacing the unrecorded file
+        key = f"{state['key']}part-{part_number:05d}.parquet"
+        s3.put_object(Bucket=BUCKET_NAME, Key=key, Body=data, ContentType=CONTENT_TYPES['parquet'])
+        state['parts'].append({'PartNumber': part_number, 'Key': key})
+
+def restart_upload(state):
+    if state['upload_id']:
+        s3.abort_multipart_upload(Bucket=BUCKET_NAME, Key=state['key'], UploadId=state['upload_id'])
+    response = s3.create_multipart_upload(Bucket=BUCKET_NAME, Key=state['key'],
+                                          ContentType=CONTENT_TYPES[state['format']])
+    state.update(upload_id=response['UploadId'], parts=[], last_key=None, rows=0)
+    save_state(state)
+
+def run_export(userid, export_id, context):
+    """Query the reviewed transactions page by page into parts or files, checkpointing after each one."""
+    state = load_state(userid, export_id)
+    if state is None or state['status'] != 'running':
+        return state
+
+    # Both formats resume after the last part or file recorded in the checkpoint
+    if state['format'] == 'csv':
+        if not state['upload_id']:
+            restart_upload(state)
+        rows = CsvRows(header=not state['parts'])
+    else:
+        rows = ParquetFiles()
+
+    query_kwargs = export_query(state)
+    last_key = state['last_key']
+    exported = state['rows']
+    while True:
+        if last_key:
+            query_kwargs['ExclusiveStartKey'] = last_key
+        response = table.query(**query_kwargs)
+        rows.add(response['Items'])
+        exported += len(response['Items'])
+        last_key = response.get('LastEvaluatedKey')
+
+        if last_key is None:
+            if rows.pending() or not state['parts']:
+                upload_part(state, rows.take())
+            if state['format'] == 'csv':
+                s3.complete_multipart_upload(Bucket=BUCKET_NAME, Key=state['key'], UploadId=state['upload_id'],
+                                             MultipartUpload={'Parts': state['parts']})
+            state.update(status='done', last_key=None, rows=exported)
+            save_state(state)
+            logger.info(f"Exported {exported} transactions for {userid} to {state['key']}")
+            return state
+
+        if rows.full():
+            upload_part(state, rows.take())
+            # The checkpoint only moves with uploaded parts, rows after it are read again on resume
+            state.update(last_key=last_key, rows=exported)
+            save_state(state)
+            if context.get_remaining_time_in_millis() < MIN_REMAINING_MS:
+                continue_export(context, state)
+                logger.info(f"Export {export_id} continues after {exported} transactions")
+                return state
+
+def export_status(state):
+    body = {key: state[key] for key in ('export_id', 'format', 'status', 'rows', 'start_date', 'end_date')}
+    if state['status'] == 'done':
+        # Signed on every poll, so the links are always fresh
+        if state['format'] == 'csv':
+            body['download_url'] = download_url(state['key'], f"transactions-{state['export_id']}.csv")
+        else:
+            # Parquet readers load the files of an export together as one dataset
+            body['download_urls'] = [
+                download_url(part['Key'], f"transactions-{state['export_id']}-{part['PartNumber']:05d}.parquet")
+                for part in state['parts']]
+    return body
+
+def download_url(key, file_name):
+    return s3.generate_presigned_url(
+        'get_object',
+        Params={'Bucket': BUCKET_NAME, 'Key': key, 'ResponseContentDisposition': f"attachment; filename={file_name}"},
+        ExpiresIn=URL_EXPIRES_IN
+    )
+
+def parse_date(value, name):
+    if value is not None and not DATE.fullmatch(value):
+        raise ValueError(f"{name} must be a date like 2024-09-30")
+    return value
+
+def lambda_handler(event, context):
+    if 'httpMethod' not in event:
+        # Asynchronous run started by a POST or handed over by an earlier run
+        state = run_export(event['userid'], event['export_id'], context)
+        return state and {'status': state['status'], 'rows': state['rows']}
+
+    log_payload(logger, "Received event", event)
+
+    # Handle preflight CORS (OPTIONS request)
+    if event['httpMethod'] == 'OPTIONS':
+        return json_response(200, 'Preflight response')
+
+    try:
+        if event['httpMethod'] == 'POST':
+            body = json.loads(event.get('body') or '{}')
+            userid = body.get('userid')
+            export_format = body.get('format', 'csv')
+            start_date = parse_date(body.get('startDate'), 'startDate')
+            end_date = parse_date(body.get('endDate'), 'endDate')
+            if not userid:
+                raise ValueError("userid is required to export transactions")
+            if export_format not in CONTENT_TYPES:
+                raise ValueError(f"format must be one of {', '.join(CONTENT_TYPES)}")
+
+            state = start_export(userid, export_format, start_date, end_date, context)
+            logger.info(f"Started {export_format} export {state['export_id']} for user: {userid}")
+            return json_response(202, export_status(state))
+
+        query_params = event.get('queryStringParameters', {}) or {}
+        userid = query_params.get('userid')
+        export_id = query_params.get('exportId')
+        if not userid or not export_id:
+            raise ValueError("userid and exportId are required to check an export")
+
+        # State is stored under the user's prefix, so another user's export id is not found
+        state = load_state(userid, export_id)
+        if state is None:
+            return json_response(404, {'error': f"No export {export_id}"})
+        return json_response(200, export_status(state))
+
+    except ValueError as ve:
+        logger.error(f"Validation error: {str(ve)}")
+        return json_response(400, {'error': str(ve)})
+    except Exception as e:
+        logger.error(f"Error occurred: {str(e)}", exc_info=True)
+        return json_response(500, {'error': str(e)})
@@ -1,81 +1,56 @@
-import json
 import boto3
-import decimal
 import logging
+from instrumentation import LOG_LEVEL, log_payload
+from pagination import parse_limit, query_page
+from serialization import json_response
 
 # Set up logging
 logger = logging.getLogger()
-logger.setLevel(logging.INFO)
+logger.setLevel(LOG_LEVEL)
 
 dynamodb = boto3.resource('dynamodb')
 split_table = dynamodb.Table('SplitTable')
 
-# Helper function to convert Decimal to a serializable format
-class DecimalEncoder(json.JSONEncoder):
-    def default(self, obj):
-        if isinstance(obj, decimal.Decimal):
-            return float(obj)  # Convert Decimal to float for JSON serialization
-        return super(DecimalEncoder, self).default(obj)
-
 def lambda_handler(event, context):
     try:
-        logger.info("Received event: %s", json.dumps(event))
+        log_payload(logger, "Received event", event)
 
         # Query to fetch categories, assume we are querying by userid if necessary
-        query_params = event.get('queryStringParameters', {})
+        query_params = event.get('queryStringParameters', {}) or {}
         userid = query_params.get('userid')
 
         if not userid:
             raise ValueError("UserID is required to fetch categories")
 
-        # Query the DynamoDB table to get categories for the specified userid
-        response = split_table.query(
-            KeyConditionExpression=boto3.dynamodb.conditions.Key('userid').eq(userid)
-        )
+        key_condition = boto3.dynamodb.conditions.Key('userid').eq(userid)
+
+        if 'limit' in query_params or 'cursor' in query_params:
+            # Paged mode: return one page and a cursor for the next one
+            categories, next_cursor = query_page(split_table, {'KeyConditionExpression': key_condition},
+                                                 parse_limit(query_params.get('limit')),
+                                                 query_params.get('cursor'), userid)
+            return json_response(200, {'items': categories, 'next_cursor': next_cursor})
+
+        # Query the DynamoDB table to get categories for the specified userid, following every page
+        categories = []
+        query_kwargs = {'KeyConditionExpression': key_condition}
+        while True:
+            response = split_table.query(**query_kwargs)
+            categories.extend(response.get('Items', []))
+            if 'LastEvaluatedKey' not in response:
+                break
+            query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
 
-        categories = response.get('Items', [])
         if not categories:
             logger.info(f"No categories found for userid: {userid}")
-            return {
-                'statusCode': 200,
-                'headers': {
-                    'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Headers': 'Content-Type',
-                    'Access-Control-Allow-Methods': 'GET, POST, OPTIONS'
-                },
-                'body': json.dumps([])  # Return empty list if no categories found
-            }
+            return json_response(200, [])  # Return empty list if no categories found
 
-        # Return the list of categories using DecimalEncoder for proper serialization
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',  # Allow cross-origin requests if needed
-                'Access-Control-Allow-Headers': 'Content-Type',
-                'Access-Control-Allow-Methods': 'GET, POST, OPTIONS'
-            },
-            'body': json.dumps(categories, cls=DecimalEncoder)  # Use DecimalEncoder for serialization
-        }
+        # Return the list of categories, split_percent keeps the exact stored value
+        return json_response(200, categories)
 
     except ValueError as ve:
         logger.error(f"Validation error: {str(ve)}")
-        return {
-            'statusCode': 400,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',  # Ensure CORS headers are included on error
-                'Access-Control-Allow-Headers': 'Content-Type',
-                'Access-Control-Allow-Methods': 'GET, POST, OPTIONS'
-            },
-            'body': json.dumps(f"Error: {str(ve)}")
-        }
+        return json_response(400, f"Error: {str(ve)}")
     except Exception as e:
         logger.error(f"Error fetching categories: {str(e)}", exc_info=True)
-        return {
-            'statusCode': 500,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Headers': 'Content-Type',
-                'Access-Control-Allow-Methods': 'GET, POST, OPTIONS'
-            },
-            'body': json.dumps(f"Error fetching categories: {str(e)}")
-        }
+        return json_response(500, f"Error fetching categories: {str(e)}")
@@ -0,0 +1,73 @@
+import re
+import boto3
+import logging
+from boto3.dynamodb.conditions import Key
+from instrumentation import LOG_LEVEL, log_payload
+from rollups import TOTAL_FIELDS, VENDOR_ROLLUP_TABLE, ZERO
+from serialization import json_response
+
+dynamodb = boto3.resource('dynamodb')
+table = dynamodb.Table(VENDOR_ROLLUP_TABLE)
+
+logger = logging.getLogger()
+logger.setLevel(LOG_LEVEL)
+
+MONTH = re.compile(r'\d{4}-\d{2}')
+
+def parse_month(value, name):
+    if value is not None and not MONTH.fullmatch(value):
+        raise ValueError(f"{name} must be a month like 2024-09")
+    return value
+
+def vendor_totals(rows):
+    """Per-vendor totals over the selected months, largest spend first."""
+    vendors = {}
+    for row in rows:
+        totals = vendors.setdefault(row['vendor'], dict.fromkeys(TOTAL_FIELDS, ZERO))
+        for field in TOTAL_FIELDS:
+            totals[field] += row.get(field, ZERO)
+    # Purchases are negative, so the most negative amount is the biggest vendor; rows whose
+    # transactions all moved to another category are left out
+    return [{'vendor': vendor, **totals} for vendor, totals in sorted(vendors.items(), key=lambda entry: entry[1]['amount'])
+            if totals['count']]
+
+def lambda_handler(event, context):
+    log_payload(logger, "Received event", event)
+
+    # Handle preflight CORS (OPTIONS request)
+    if event['httpMethod'] == 'OPTIONS':
+        return json_response(200, 'Preflight response', methods='GET, OPTIONS')
+
+    try:
+        query_params = event.get('queryStringParameters', {}) or {}
+        userid = query_params.get('userid')
+        category = query_params.get('category')
+        start_month = parse_month(query_params.get('startMonth'), 'startMonth')
+        end_month = parse_month(query_params.get('endMonth'), 'endMonth')
+
+        if not userid or not category:
+            raise ValueError("userid and category are required to fetch category details")
+
+        # Sort keys are category#month#vendor, so one category's month range is a single key range
+        key_condition = Key('userid').eq(userid) & Key('category_month_vendor').between(
+            f"{category}#{start_month or ''}", f"{category}#{end_month or '9999-99'}#\uffff")
+
+        rows = []
+        query_kwargs = {'KeyConditionExpression': key_condition}
+        while True:
+            response = table.query(**query_kwargs)
+            rows.extend(response['Items'])
+            if 'LastEvaluatedKey' not in response:
+                break
+            query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+        vendors = vendor_totals(rows)
+        logger.info(f"Category {category} has {len(vendors)} vendors in {len(rows)} rollup rows for user: {userid}")
+        return json_response(200, {'category': category, 'vendors': vendors}, methods='GET, OPTIONS')
+
+    except ValueError as ve:
+        logger.error(f"Validation error: {str(ve)}")
+        return json_response(400, {'error': str(ve)}, methods='GET, OPTIONS')
+    except Exception as e:
+        logger.error(f"Error occurred: {str(e)}", exc_info=True)
+        return json_response(500, {'error': str(e)}, methods='GET, OPTIONS')
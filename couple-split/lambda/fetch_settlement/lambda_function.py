@@ -0,0 +1,60 @@
+import boto3
+import logging
+from datetime import datetime
+from instrumentation import LOG_LEVEL, log_payload
+from ledger import ledger_totals
+from rollups import TOTAL_FIELDS
+from serialization import json_response
+
+dynamodb = boto3.resource('dynamodb')
+
+logger = logging.getLogger()
+logger.setLevel(LOG_LEVEL)
+
+def parse_date(value, name):
+    if value is None:
+        return None
+    try:
+        datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        raise ValueError(f"{name} must be a date like 2024-09-30")
+    return value
+
+def lambda_handler(event, context):
+    log_payload(logger, "Received event", event)
+
+    # Handle preflight CORS (OPTIONS request)
+    if event['httpMethod'] == 'OPTIONS':
+        return json_response(200, 'Preflight response', methods='GET, OPTIONS')
+
+    try:
+        query_params = event.get('queryStringParameters', {}) or {}
+        userid = query_params.get('userid')
+        # asOf is the balance up to and including that date, the same as an open-ended endDate
+        start_date = parse_date(query_params.get('startDate'), 'startDate')
+        end_date = parse_date(query_params.get('endDate') or query_params.get('asOf'), 'endDate')
+
+        if not userid:
+            raise ValueError("userid is required to fetch a settlement balance")
+        if start_date and end_date and start_date > end_date:
+            raise ValueError("startDate must not be after endDate")
+
+        # A fixed handful of ledger nodes, however many transactions fall in the range
+        totals = ledger_totals(dynamodb, userid, TOTAL_FIELDS, start_date, end_date)
+
+        # Split amounts are stored as negative purchases, the partner owes the opposite
+        body = {
+            'userid': userid,
+            'start_date': start_date,
+            'end_date': end_date,
+            'partner_owes': -totals['partner_split_amount'],
+            'totals': totals
+        }
+        return json_response(200, body, methods='GET, OPTIONS')
+
+    except ValueError as ve:
+        logger.error(f"Validation error: {str(ve)}")
+        return json_response(400, {'error': str(ve)}, methods='GET, OPTIONS')
+    except Exception as e:
+        logger.error(f"Error occurred: {str(e)}", exc_info=True)
+        return json_response(500, {'error': str(e)}, methods='GET, OPTIONS')
@@ -0,0 +1,79 @@
+import re
+import boto3
+import logging
+from boto3.dynamodb.conditions import Key
+from instrumentation import LOG_LEVEL, log_payload
+from rollups import ROLLUP_TABLE, TOTAL_FIELDS, ZERO
+from serialization import json_response
+
+dynamodb = boto3.resource('dynamodb')
+table = dynamodb.Table(ROLLUP_TABLE)
+
+logger = logging.getLogger()
+logger.setLevel(LOG_LEVEL)
+
+MONTH = re.compile(r'\d{4}-\d{2}')
+
+def parse_month(value, name):
+    if value is not None and not MONTH.fullmatch(value):
+        raise ValueError(f"{name} must be a month like 2024-09")
+    return value
+
+def summarize(rows):
+    """Fold rollup rows into per-category, per-month and overall totals for the dashboard."""
+    categories = {}
+    months = {}
+    totals = dict.fromkeys(TOTAL_FIELDS, ZERO)
+    for row in rows:
+        for group, name in ((categories, row['category']), (months, row['month'])):
+            group_totals = group.setdefault(name, dict.fromkeys(TOTAL_FIELDS, ZERO))
+            for field in TOTAL_FIELDS:
+                group_totals[field] += row.get(field, ZERO)
+        for field in TOTAL_FIELDS:
+            totals[field] += row.get(field, ZERO)
+    return {'categories': categories, 'months': months, 'totals': totals}
+
+def lambda_handler(event, context):
+    log_payload(logger, "Received event", event)
+
+    # Handle preflight CORS (OPTIONS request)
+    if event['httpMethod'] == 'OPTIONS':
+        return json_response(200, 'Preflight response', methods='GET, OPTIONS')
+
+    try:
+        query_params = event.get('queryStringParameters', {}) or {}
+        userid = query_params.get('userid')
+        start_month = parse_month(query_params.get('startMonth'), 'startMonth')
+        end_month = parse_month(query_params.get('endMonth'), 'endMonth')
+
+        if not userid:
+            raise ValueError("userid is required to fetch a summary")
+
+        # Sort keys are month#category, so a month range is a single key range
+        key_condition = Key('userid').eq(userid)
+        if start_month and end_month:
+            key_condition = key_condition & Key('month_category').between(f"{start_month}#", f"{end_month}#\uffff")
+        elif start_month:
+            key_condition = key_condition & Key('month_category').gte(f"{start_month}#")
+        elif end_month:
+            key_condition = key_condition & Key('month_category').lte(f"{end_month}#\uffff")
+
+        # One row per month and category, however many transactions they hold
+        rows = []
+        query_kwargs = {'KeyConditionExpression': key_condition}
+        while True:
+            response = table.query(**query_kwargs)
+            rows.extend(response['Items'])
+            if 'LastEvaluatedKey' not in response:
+                break
+            query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+        logger.info(f"Summarized {len(rows)} rollup rows for user: {userid}")
+        return json_response(200, summarize(rows), methods='GET, OPTIONS')
+
+    except ValueError as ve:
+        logger.error(f"Validation error: {str(ve)}")
+        return json_response(400, {'error': str(ve)}, methods='GET, OPTIONS')
+    except Exception as e:
+        logger.error(f"Error occurred: {str(e)}", exc_info=True)
+        return json_response(500, {'error': str(e)}, methods='GET, OPTIONS')
@@ -1,37 +1,29 @@
 import json
 import boto3
-import decimal
 import logging
-from boto3.dynamodb.conditions import Attr
+from boto3.dynamodb.conditions import Attr, Key
+from instrumentation import LOG_LEVEL, METRICS, emits_metrics, instrument, log_payload
+from pagination import parse_limit, query_page
+from serialization import json_response
 
 dynamodb = boto3.resource('dynamodb')
+instrument(dynamodb.meta.client)
 table = dynamodb.Table('TransactionSplitTable')
 
-# Helper function to convert Decimal to JSON serializable
-class DecimalEncoder(json.JSONEncoder):
-    def default(self, obj):
-        if isinstance(obj, decimal.Decimal):
-            return float(obj)
-        return super(DecimalEncoder, self).default(obj)
+# GSI with userid#status as the partition key and transaction_date as the sort key
+USER_STATUS_INDEX = 'userid_status-transaction_date-index'
 
 # Lambda handler
+@emits_metrics
 def lambda_handler(event, context):
     logger = logging.getLogger()
-    logger.setLevel(logging.INFO)
-    logger.info(f"Received event: {json.dumps(event)}")
+    logger.setLevel(LOG_LEVEL)
+    log_payload(logger, "Received event", event)
 
     # Handle preflight CORS (OPTIONS request)
     if event['httpMethod'] == 'OPTIONS':
         logger.info('Received OPTIONS request, returning CORS headers')
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Headers': 'Content-Type',
-                'Access-Control-Allow-Methods': 'GET, POST, OPTIONS'
-            },
-            'body': 'Preflight response'
-        }
+        return json_response(200, 'Preflight response')
 
     try:
         query_params = event.get('queryStringParameters', {}) or {}
@@ -44,14 +36,20 @@ def lambda_handler(event, context):
 
         logger.info(f"Fetching transactions for user: {userid}, status: {status}, transaction date range: {start_date} - {end_date}, CSV date range: {csv_start_date} - {csv_end_date}")
 
-        # Build the filter expression based on userid and status
-        filter_expression = Attr('userid').eq(userid) & Attr('status').eq(status) & Attr('amount').lte(0)
+        if not userid:
+            raise ValueError("userid is required to fetch transactions")
+
+        # userid and status select the index partition, transaction dates become a key range
+        key_condition = Key('userid_status').eq(f"{userid}#{status}")
+        if start_date and end_date:
+            key_condition = key_condition & Key('transaction_date').between(start_date, end_date)
+        elif start_date:
+            key_condition = key_condition & Key('transaction_date').gte(start_date)
+        elif end_date:
+            key_condition = key_condition & Key('transaction_date').lte(end_date)
 
-        # Add optional transaction_date filtering
-        if start_date:
-            filter_expression = filter_expression & Attr('transaction_date').gte(start_date)
-        if end_date:
-            filter_expression = filter_expression & Attr('transaction_date').lte(end_date)
+        # Only purchases are returned
+        filter_expression = Attr('amount').lte(0)
 
         # Add optional date_csv_added filtering
         if csv_start_date:
@@ -59,31 +57,39 @@ def lambda_handler(event, context):
         if csv_end_date:
             filter_expression = filter_expression & Attr('date_csv_added').lte(csv_end_date)
 
-        # Perform a scan operation with the filter expression
-        response = table.scan(
-            FilterExpression=filter_expression
-        )
+        index_query = {
+            'IndexName': USER_STATUS_INDEX,
+            'KeyConditionExpression': key_condition,
+            'FilterExpression': filter_expression
+        }
 
-        logger.info(f"Scan response: {response}")
+        if 'limit' in query_params or 'cursor' in query_params:
+            # Paged mode: one page per request, the cursor is only valid for the same filters
+            scope = json.dumps([userid, status, start_date, end_date, csv_start_date, csv_end_date])
+            with METRICS.stage('query'):
+                items, next_cursor = query_page(table, index_query, parse_limit(query_params.get('limit')),
+                                                query_params.get('cursor'), scope)
+            logger.info(f"Query returned a page of {len(items)} transactions, more: {next_cursor is not None}")
+            body = {'items': items, 'next_cursor': next_cursor}
+        else:
+            # Follow LastEvaluatedKey so results are not cut off at the first 1 MB page
+            items = []
+            with METRICS.stage('query'):
+                while True:
+                    response = table.query(**index_query)
+                    items.extend(response['Items'])
+                    if 'LastEvaluatedKey' not in response:
+                        break
+                    index_query['ExclusiveStartKey'] = response['LastEvaluatedKey']
+            logger.info(f"Query returned {len(items)} transactions")
+            body = items
 
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Headers': 'Content-Type',
-                'Access-Control-Allow-Methods': 'GET, POST, OPTIONS'
-            },
-            'body': json.dumps(response['Items'], cls=DecimalEncoder)
-        }
+        with METRICS.stage('serialize'):
+            return json_response(200, body)
 
+    except ValueError as ve:
+        logger.error(f"Validation error: {str(ve)}")
+        return json_response(400, {'error': str(ve)})
     except Exception as e:
         logger.error(f"Error occurred: {str(e)}", exc_info=True)
-        return {
-            'statusCode': 500,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Headers': 'Content-Type',
-                'Access-Control-Allow-Methods': 'GET, POST, OPTIONS'
-            },
-            'body': json.dumps({'error': str(e)})
-        }
+        return json_response(500, {'error': str(e)})
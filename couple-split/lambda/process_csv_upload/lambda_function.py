@@ -1,18 +1,21 @@
 import json
+import os
 import boto3
 import logging
 
 # Initialize logging
 logger = logging.getLogger()
-logger.setLevel(logging.INFO)
+# Follows the function's ApplicationLogLevel, DEBUG turns on event logging
+logger.setLevel(os.environ.get('AWS_LAMBDA_LOG_LEVEL', 'INFO'))
 
 # Initialize S3 client
 s3 = boto3.client('s3')
 
 def lambda_handler(event, context):
     try:
-        # Log the event
-        logger.info(f"Received event: {json.dumps(event)}")
+        # The event carries the whole uploaded file, only serialized for debugging
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Received event: {json.dumps(event)}")
 
         # Handle preflight CORS (OPTIONS request)
         if event['httpMethod'] == 'OPTIONS':
@@ -0,0 +1,192 @@
+import json
+import os
+import time
+import uuid
+import boto3
+import logging
+from decimal import Decimal
+from boto3.dynamodb.conditions import Key
+from botocore.exceptions import ClientError
+from instrumentation import LOG_LEVEL, log_payload
+from rollups import RollupDeltas, apply_deltas
+
+logger = logging.getLogger()
+logger.setLevel(LOG_LEVEL)
+
+dynamodb = boto3.resource('dynamodb')
+lambda_client = boto3.client('lambda')
+table = dynamodb.Table('TransactionSplitTable')
+split_table = dynamodb.Table('SplitTable')
+jobs_table = dynamodb.Table('ResplitJobTable')
+
+# Sparse index over transactions that have a category, keyed the same way as SplitTable rows
+CATEGORY_INDEX = 'userid-category-index'
+
+# Transactions recomputed per page; the checkpoint is saved after every page
+PAGE_SIZE = 25
+# Keep the job's writes well under the table's capacity so interactive edits are not throttled
+WRITES_PER_SECOND = float(os.environ.get('RESPLIT_WRITES_PER_SECOND', '5'))
+# Hand over to a fresh invocation before the timeout instead of being cut off mid-page
+MIN_REMAINING_MS = 60000
+
+class RateLimiter:
+    """Space calls at least 1/rate seconds apart."""
+
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate > 0 else 0
+        self.next_at = 0
+
+    def wait(self):
+        now = time.monotonic()
+        if now < self.next_at:
+            time.sleep(self.next_at - now)
+            now = self.next_at
+        self.next_at = now + self.interval
+
+def load_rule(userid, category):
+    response = split_table.get_item(Key={'userid': userid, 'category': category}, ConsistentRead=True)
+    return response.get('Item')
+
+def split_changes(item, rule):
+    """Attributes that differ from what ingest would store under the rule (see csv_converter/split.py)."""
+    changes = {'need': rule['need']}
+    amount = item.get('amount')
+    # Refunds and payments keep their amounts, only purchases are split
+    if amount is not None and amount < 0:
+        split_percent = rule['split_percent']
+        percent = Decimal(str(split_percent))
+        changes['split_percent'] = split_percent
+        if percent == 0:
+            changes['after_split_amount'] = amount
+            changes['partner_split_amount'] = 0
+        elif percent == 100:
+            changes['after_split_amount'] = 0
+            changes['partner_split_amount'] = amount
+        else:
+            changes['after_split_amount'] = amount * (percent / 100)
+            changes['partner_split_amount'] = amount * ((100 - percent) / 100)
+    return {name: value for name, value in changes.items() if item.get(name) != value}
+
+def resplit_item(item, changes, category):
+    """Write the new split values; returns the item before and after, or None if it left the category."""
+    try:
+        response = table.meta.client.update_item(
+            TableName=table.name,
+            Key={'hash': item['hash']},
+            UpdateExpression="SET " + ", ".join(f"#{name} = :{name}" for name in changes),
+            # The index lags behind the table, so only touch transactions still in this category
+            ConditionExpression='#category = :category',
+            ExpressionAttributeNames={'#category': 'category', **{f"#{name}": name for name in changes}},
+            ExpressionAttributeValues={':category': category, **{f":{name}": value for name, value in changes.items()}},
+            ReturnValues='ALL_OLD'
+        )
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+            return None
+        raise
+    old = response['Attributes']
+    return old, {**old, **changes}
+
+def resplit_page(items, rule, category, limiter):
+    """Recompute one page of transactions, returning (updated count, rollup deltas)."""
+    updated = 0
+    deltas = RollupDeltas()
+    for item in items:
+        changes = split_changes(item, rule)
+        if not changes:
+            continue
+        limiter.wait()
+        result = resplit_item(item, changes, category)
+        if result:
+            updated += 1
+            deltas.change(*result)
+    return updated, deltas
+
+def start_job(userid, category, rule, run_id):
+    """Load or create the checkpoint for (userid, category); None when there is nothing to do."""
+    job = jobs_table.get_item(Key={'userid': userid, 'category': category}, ConsistentRead=True).get('Item')
+    same_rule = job is not None and (job['split_percent'], job['need']) == (rule['split_percent'], rule['need'])
+
+    if run_id and (job is None or job['run_id'] != run_id):
+        logger.info(f"Re-split run {run_id} for {userid}/{category} was superseded")
+        return None
+    if same_rule and job['status'] == 'done':
+        logger.info(f"Transactions in {userid}/{category} already match the split rule")
+        return None
+    if not same_rule:
+        # A new rule starts over, pages done under the old rule have to be redone
+        job = {'userid': userid, 'category': category, 'split_percent': rule['split_percent'],
+               'need': rule['need'], 'processed': 0, 'updated': 0}
+
+    # Taking over a running job changes its run_id, which stops the older invocation at its next checkpoint
+    job.update(run_id=run_id or str(uuid.uuid4()), status='running')
+    jobs_table.put_item(Item=job)
+    return job
+
+def save_checkpoint(job):
+    # Fails once another invocation has taken the job over
+    try:
+        jobs_table.put_item(Item=job, ConditionExpression='run_id = :run_id',
+                            ExpressionAttributeValues={':run_id': job['run_id']})
+        return True
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+            return False
+        raise
+
+def continue_job(context, job):
+    lambda_client.invoke(
+        FunctionName=context.function_name,
+        InvocationType='Event',
+        Payload=json.dumps({'userid': job['userid'], 'category': job['category'], 'run_id': job['run_id']})
+    )
+
+def lambda_handler(event, context):
+    log_payload(logger, "Received event", event)
+    userid = event['userid']
+    category = event['category']
+
+    rule = load_rule(userid, category)
+    if rule is None:
+        # Ingest leaves transactions of unknown categories alone, so does the re-split
+        logger.info(f"No split rule for {userid}/{category}, nothing to re-split")
+        return {'status': 'skipped'}
+
+    job = start_job(userid, category, rule, event.get('run_id'))
+    if job is None:
+        return {'status': 'skipped'}
+
+    limiter = RateLimiter(WRITES_PER_SECOND)
+    query_kwargs = {
+        'IndexName': CATEGORY_INDEX,
+        'KeyConditionExpression': Key('userid').eq(userid) & Key('category').eq(category),
+        'Limit': PAGE_SIZE
+    }
+    while True:
+        if job.get('last_key'):
+            query_kwargs['ExclusiveStartKey'] = job['last_key']
+        response = table.query(**query_kwargs)
+        updated, deltas = resplit_page(response['Items'], rule, category, limiter)
+
+        try:
+            apply_deltas(table.meta.client, deltas)
+        except ClientError as e:
+            # The transactions are saved; scripts/rebuild_rollups.py brings the rollups back in line
+            logger.error(f"Failed to update rollups: {str(e)}")
+
+        job['processed'] += len(response['Items'])
+        job['updated'] += updated
+        job['last_key'] = response.get('LastEvaluatedKey')
+        if not job['last_key']:
+            job['status'] = 'done'
+        if not save_checkpoint(job):
+            logger.info(f"Re-split run {job['run_id']} for {userid}/{category} was superseded")
+            return {'status': 'superseded'}
+
+        if job['status'] == 'done':
+            logger.info(f"Re-split {userid}/{category}: {job['updated']} of {job['processed']} transactions updated")
+            return {'status': 'done', 'processed': job['processed'], 'updated': job['updated']}
+        if context.get_remaining_time_in_millis() < MIN_REMAINING_MS:
+            continue_job(context, job)
+            logger.info(f"Re-split {userid}/{category} continues after {job['processed']} transactions")
+            return {'status': 'continued', 'processed': job['processed'], 'updated': job['updated']}
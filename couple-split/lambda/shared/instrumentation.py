@@ -0,0 +1,168 @@
+"""
+Per-invocation stage timings and DynamoDB consumed capacity, emitted as CloudWatch Embedded Metric Format.
+
+    from instrumentation import METRICS, instrument
+
+    instrument(dynamodb.meta.client)
+    with METRICS.stage('query'):
+        ...
+    METRICS.flush()
+
+or decorate the handler with @emits_metrics to flush after every invocation.
+
+Stages are exclusive: while a nested stage runs the enclosing one is paused, so a write stage
+that pulls rows through parse and normalize is only charged for its own time.
+"""
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+NAMESPACE = os.environ.get('METRICS_NAMESPACE', 'CoupleSplit')
+
+# Set by Lambda from the function's ApplicationLogLevel, a hard-coded level would override it
+LOG_LEVEL = os.environ.get('AWS_LAMBDA_LOG_LEVEL', 'INFO').upper()
+
+# DynamoDB calls that accept ReturnConsumedCapacity
+CAPACITY_OPERATIONS = {'GetItem', 'PutItem', 'UpdateItem', 'DeleteItem', 'Query', 'Scan',
+                       'BatchGetItem', 'BatchWriteItem', 'TransactGetItems', 'TransactWriteItems'}
+
+
+class Metrics:
+    """Thread-safe totals for one invocation, taken and cleared by every document or flush."""
+
+    def __init__(self, function_name=None):
+        self.function_name = function_name or os.environ.get('AWS_LAMBDA_FUNCTION_NAME', 'local')
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.stages = {}
+            self.capacity = {}
+            self.calls = 0
+
+    def add_time(self, name, seconds):
+        with self.lock:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def add_capacity(self, consumed):
+        # A dict for single-table calls, a list with one entry per table for batch and transact calls
+        if isinstance(consumed, dict):
+            consumed = [consumed]
+        with self.lock:
+            self.calls += 1
+            for entry in consumed or []:
+                table = entry.get('TableName', 'unknown')
+                self.capacity[table] = self.capacity.get(table, 0.0) + entry.get('CapacityUnits', 0.0)
+
+    @contextmanager
+    def stage(self, name):
+        stack = getattr(self.local, 'stack', None)
+        if stack is None:
+            stack = self.local.stack = []
+        now = time.perf_counter()
+        if stack:
+            parent = stack[-1]
+            self.add_time(parent[0], now - parent[1])
+        stack.append([name, now])
+        try:
+            yield
+        finally:
+            now = time.perf_counter()
+            _, started = stack.pop()
+            self.add_time(name, now - started)
+            if stack:
+                stack[-1][1] = now
+
+    def timed_iter(self, name, iterable):
+        """Yield from iterable, charging the time spent producing each element to the stage."""
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name):
+                try:
+                    value = next(iterator)
+                except StopIteration:
+                    return
+            yield value
+
+    def document(self, **properties):
+        """The EMF document for everything recorded since the last flush, or None if nothing was."""
+        with self.lock:
+            stages, capacity, calls = self.stages, self.capacity, self.calls
+            self.stages, self.capacity, self.calls = {}, {}, 0
+        if not stages and not calls:
+            return None
+
+        values = {f'{name}_ms': round(seconds * 1000, 1) for name, seconds in stages.items()}
+        units = {name: 'Milliseconds' for name in values}
+        if calls:
+            values['dynamodb_calls'] = calls
+            values['consumed_capacity_units'] = round(sum(capacity.values()), 1)
+            units.update(dynamodb_calls='Count', consumed_capacity_units='Count')
+
+        return {
+            '_aws': {
+                'Timestamp': int(time.time() * 1000),
+                'CloudWatchMetrics': [{
+                    'Namespace': NAMESPACE,
+                    'Dimensions': [['function']],
+                    'Metrics': [{'Name': name, 'Unit': unit} for name, unit in units.items()],
+                }],
+            },
+            'function': self.function_name,
+            **values,
+            # Per-table capacity stays a plain property, searchable in Logs Insights without extra metrics
+            'capacity_by_table': {table: round(consumed, 1) for table, consumed in capacity.items()},
+            **properties,
+        }
+
+    def flush(self, **properties):
+        # Printed rather than logged: the JSON log format would nest a logged document under
+        # "message", while a line that already is JSON reaches CloudWatch as is
+        document = self.document(**properties)
+        if document is not None:
+            print(json.dumps(document))
+        return document
+
+
+METRICS = Metrics()
+
+
+def _request_capacity(params, model, **kwargs):
+    if model.name in CAPACITY_OPERATIONS:
+        params.setdefault('ReturnConsumedCapacity', 'TOTAL')
+
+
+def instrument(client, metrics=METRICS):
+    """Ask a DynamoDB client to report consumed capacity on every data call and collect it."""
+    def collect(parsed, model, **kwargs):
+        if model.name in CAPACITY_OPERATIONS:
+            metrics.add_capacity(parsed.get('ConsumedCapacity'))
+
+    events = client.meta.events
+    # Resource clients copy the caller's params at provide-client-params, so edits go in after that
+    events.register('before-parameter-build.dynamodb', _request_capacity, unique_id='capacity-request')
+    events.register('after-call.dynamodb', collect, unique_id=f'capacity-collect-{id(metrics)}')
+    return client
+
+
+def emits_metrics(handler):
+    """Flush METRICS after every invocation of a Lambda handler, whether it returned or raised."""
+    @functools.wraps(handler)
+    def wrapper(event, context):
+        try:
+            return handler(event, context)
+        finally:
+            METRICS.flush()
+    return wrapper
+
+
+def log_payload(logger, label, payload):
+    # Whole events and bodies cost CPU to serialize and money to ingest, so only at DEBUG
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("%s: %s", label, json.dumps(payload, default=str))
@@ -0,0 +1,82 @@
+"""Per-user settlement ledger: running totals by transaction date, stored as a Fenwick tree.
+
+Each day since LEDGER_EPOCH is a position in a binary indexed tree whose nodes are rows of
+SettlementLedgerTable. A transaction adds its totals to the O(log days) nodes covering its day,
+and the totals as of any date are the sum of at most LEDGER_BITS nodes, fetched with one
+BatchGetItem. A range is two such prefixes, so balances never need a pass over transactions.
+"""
+from collections import defaultdict
+from datetime import date, datetime
+import time
+
+LEDGER_TABLE = 'SettlementLedgerTable'
+
+LEDGER_EPOCH = date(2000, 1, 1)
+# 2^15 days covers the epoch through 2089
+LEDGER_BITS = 15
+LEDGER_DAYS = 1 << LEDGER_BITS
+
+# BatchGetItem accepts at most 100 keys, a range needs at most 2 * LEDGER_BITS
+BATCH_GET_SIZE = 100
+
+
+def day_index(transaction_date):
+    """Position of a YYYY-MM-DD date in the ledger, or None when it cannot be placed."""
+    try:
+        day = (datetime.strptime(transaction_date, '%Y-%m-%d').date() - LEDGER_EPOCH).days
+    except (TypeError, ValueError):
+        return None
+    return day if 0 <= day < LEDGER_DAYS else None
+
+def node_key(node):
+    return f"{node:05d}"
+
+def update_nodes(day):
+    # Nodes whose span includes the day, from the day's own node up to the root
+    node = day + 1
+    while node <= LEDGER_DAYS:
+        yield node_key(node)
+        node += node & -node
+
+def prefix_nodes(day):
+    # Nodes that together cover every day up to and including this one
+    node = min(day, LEDGER_DAYS - 1) + 1
+    while node > 0:
+        yield node_key(node)
+        node -= node & -node
+
+def prefix_day(value):
+    """Ledger position of the last day included in a balance as of this date; -1 before the epoch."""
+    day = (datetime.strptime(value, '%Y-%m-%d').date() - LEDGER_EPOCH).days
+    return min(day, LEDGER_DAYS - 1) if day >= 0 else -1
+
+def range_coefficients(start_date=None, end_date=None):
+    """{node key: +1/-1} whose weighted sum is the totals for start_date..end_date, both inclusive."""
+    coefficients = defaultdict(int)
+    end = prefix_day(end_date) if end_date else LEDGER_DAYS - 1
+    for node in (prefix_nodes(end) if end >= 0 else ()):
+        coefficients[node] += 1
+    if start_date:
+        before = prefix_day(start_date) - 1
+        for node in (prefix_nodes(before) if before >= 0 else ()):
+            coefficients[node] -= 1
+    return {node: sign for node, sign in coefficients.items() if sign}
+
+def ledger_totals(dynamodb, userid, fields, start_date=None, end_date=None, table_name=LEDGER_TABLE):
+    """Sum the ledger fields for a user over a date range with a single BatchGetItem round."""
+    coefficients = range_coefficients(start_date, end_date)
+    totals = dict.fromkeys(fields, 0)
+    keys = [{'userid': userid, 'node': node} for node in coefficients]
+    for start in range(0, len(keys), BATCH_GET_SIZE):
+        request = {table_name: {'Keys': keys[start:start + BATCH_GET_SIZE]}}
+        attempt = 0
+        while request:
+            if attempt:
+                time.sleep(min(1.0, 0.05 * (2 ** attempt)))
+            response = dynamodb.batch_get_item(RequestItems=request)
+            for row in response['Responses'].get(table_name, []):
+                for field in fields:
+                    totals[field] += row.get(field, 0) * coefficients[row['node']]
+            request = response.get('UnprocessedKeys')
+            attempt += 1
+    return totals
@@ -0,0 +1,94 @@
+import base64
+import hashlib
+import hmac
+import json
+import os
+from decimal import Decimal
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+class InvalidCursor(ValueError):
+    """Raised when a cursor was tampered with, is malformed or belongs to a different query."""
+
+def _signing_key():
+    secret = os.environ.get('CURSOR_SECRET')
+    if not secret:
+        raise RuntimeError("CURSOR_SECRET is not configured")
+    return secret.encode()
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode()
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+def _encode_value(obj):
+    # DynamoDB number keys come back as Decimal, keep them exact through the round trip
+    if isinstance(obj, Decimal):
+        return {'__decimal__': str(obj)}
+    raise TypeError(f"Cannot encode {type(obj).__name__} in a cursor")
+
+def _decode_value(obj):
+    if set(obj) == {'__decimal__'}:
+        return Decimal(obj['__decimal__'])
+    return obj
+
+def _signature(payload, scope):
+    return hmac.new(_signing_key(), payload + b'|' + scope.encode(), hashlib.sha256).digest()
+
+def encode_cursor(last_evaluated_key, scope):
+    """Turn a LastEvaluatedKey into an opaque, signed cursor valid only for the same query scope."""
+    if not last_evaluated_key:
+        return None
+    payload = json.dumps(last_evaluated_key, default=_encode_value, sort_keys=True, separators=(',', ':')).encode()
+    return f"{_b64encode(payload)}.{_b64encode(_signature(payload, scope))}"
+
+def decode_cursor(cursor, scope):
+    """Verify a cursor from encode_cursor and return the ExclusiveStartKey it carries."""
+    try:
+        payload_text, signature_text = cursor.split('.', 1)
+        payload = _b64decode(payload_text)
+        signature = _b64decode(signature_text)
+    except (ValueError, TypeError):
+        raise InvalidCursor("Malformed cursor")
+
+    if not hmac.compare_digest(signature, _signature(payload, scope)):
+        raise InvalidCursor("Cursor does not match this query")
+
+    return json.loads(payload, object_hook=_decode_value)
+
+def parse_limit(value, default=DEFAULT_PAGE_SIZE):
+    if value in (None, ''):
+        return default
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        raise ValueError("limit must be a whole number")
+    if limit < 1:
+        raise ValueError("limit must be at least 1")
+    return min(limit, MAX_PAGE_SIZE)
+
+def query_page(table, query_params, limit, cursor, scope):
+    """Run a Query for up to `limit` items starting at `cursor`; returns (items, next_cursor).
+
+    Limit counts evaluated items, so with a FilterExpression the query is repeated with the
+    remaining budget until the page is full or the partition is exhausted. The returned cursor
+    therefore always points just past the last item evaluated.
+    """
+    query_params = dict(query_params)
+    if cursor:
+        query_params['ExclusiveStartKey'] = decode_cursor(cursor, scope)
+
+    items = []
+    last_evaluated_key = None
+    while len(items) < limit:
+        query_params['Limit'] = limit - len(items)
+        response = table.query(**query_params)
+        items.extend(response['Items'])
+        last_evaluated_key = response.get('LastEvaluatedKey')
+        if not last_evaluated_key:
+            break
+        query_params['ExclusiveStartKey'] = last_evaluated_key
+
+    return items, encode_cursor(last_evaluated_key, scope)
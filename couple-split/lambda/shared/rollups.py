@@ -0,0 +1,152 @@
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from ledger import LEDGER_TABLE, day_index, update_nodes
+from vendors import vendor_key
+
+ROLLUP_TABLE = 'TransactionRollupTable'
+# Same totals per (userid, category, month, vendor), for category drill-downs
+VENDOR_ROLLUP_TABLE = 'VendorRollupTable'
+
+# Attributes joined with '#' into each table's sort key; only the first may itself contain '#'.
+# Ledger rows are Fenwick tree nodes keyed by node number alone, see ledger.py
+SORT_KEY_ATTRIBUTES = {
+    ROLLUP_TABLE: ('month', 'category'),
+    VENDOR_ROLLUP_TABLE: ('category', 'month', 'vendor'),
+    LEDGER_TABLE: (),
+}
+SORT_KEYS = {ROLLUP_TABLE: 'month_category', VENDOR_ROLLUP_TABLE: 'category_month_vendor', LEDGER_TABLE: 'node'}
+
+# Totals kept per (userid, month, category); amounts keep the sign they have on the transactions
+TOTAL_FIELDS = ['amount', 'after_split_amount', 'partner_split_amount', 'need_amount', 'want_amount', 'count']
+
+# Transactions without a category are charted as Misc on the dashboard
+DEFAULT_CATEGORY = 'Misc'
+
+ZERO = Decimal(0)
+
+# Concurrent update_item calls when applying deltas; a change touches up to ~17 rows with the ledger
+APPLY_WORKERS = 8
+
+
+def _decimal(value):
+    if value is None:
+        return ZERO
+    return value if isinstance(value, Decimal) else Decimal(str(value))
+
+def rollup_key(month, category):
+    # Sort key of the rollup table, months sort first so a month range is one key range
+    return f"{month}#{category}"
+
+def vendor_rollup_key(category, month, vendor):
+    # Sort key of the vendor rollup table, one category's months form one key range
+    return f"{category}#{month}#{vendor}"
+
+def key_attributes(table_name, key):
+    # Split a sort key back into its attributes; vendor keys never contain '#'
+    names = SORT_KEY_ATTRIBUTES[table_name]
+    if not names:
+        return {}
+    if names[0] == 'category':
+        return dict(zip(names, key.rsplit('#', len(names) - 1)))
+    return dict(zip(names, key.split('#', len(names) - 1)))
+
+def contributions(item):
+    """Return the (table, userid, sort key, totals) rows a transaction adds to, empty if it is not counted.
+
+    Only reviewed purchases are counted, the same transactions the dashboard reports on.
+    """
+    if not item or item.get('status') != 'reviewed' or not item.get('transaction_date') or not item.get('userid'):
+        return []
+    amount = item.get('amount')
+    if amount is None or amount > 0:
+        return []
+
+    amount = _decimal(amount)
+    need = item.get('need') is True
+    totals = {
+        'amount': amount,
+        'after_split_amount': _decimal(item.get('after_split_amount')),
+        # The partner only owes their share of transactions marked to be split
+        'partner_split_amount': _decimal(item.get('partner_split_amount')) if item.get('split') is True else ZERO,
+        'need_amount': amount if need else ZERO,
+        'want_amount': ZERO if need else amount,
+        'count': 1,
+    }
+    month = item['transaction_date'][:7]
+    category = item.get('category') or DEFAULT_CATEGORY
+    # Items written before vendors were stored get theirs from the description
+    vendor = item.get('vendor') or vendor_key(item.get('description'))
+    rows = [
+        (ROLLUP_TABLE, item['userid'], rollup_key(month, category), totals),
+        (VENDOR_ROLLUP_TABLE, item['userid'], vendor_rollup_key(category, month, vendor), totals),
+    ]
+    day = day_index(item['transaction_date'])
+    if day is not None:
+        rows.extend((LEDGER_TABLE, item['userid'], node, totals) for node in update_nodes(day))
+    return rows
+
+
+class RollupDeltas:
+    """Changes to rollup rows gathered while transactions are written, applied in one pass at the end."""
+
+    def __init__(self):
+        self.deltas = defaultdict(lambda: dict.fromkeys(TOTAL_FIELDS, ZERO))
+
+    def __len__(self):
+        return len(self.deltas)
+
+    def add(self, item, sign=1):
+        for table_name, userid, key, totals in contributions(item):
+            delta = self.deltas[(table_name, userid, key)]
+            for field in TOTAL_FIELDS:
+                delta[field] += totals[field] * sign
+
+    def add_all(self, items):
+        for item in items:
+            self.add(item)
+
+    def change(self, old, new):
+        # A transaction moving between rollups, or leaving or joining them, is a removal plus an addition
+        self.add(old, -1)
+        self.add(new)
+
+    def items(self):
+        # Rows whose deltas cancelled out are left alone
+        for (table_name, userid, key), delta in self.deltas.items():
+            if any(delta.values()):
+                yield table_name, userid, key, delta
+
+
+def rollup_item(table_name, userid, key, totals):
+    """The full rollup row for a sort key, as written by a rebuild."""
+    return {'userid': userid, SORT_KEYS[table_name]: key, **key_attributes(table_name, key), **totals}
+
+def _update_request(table_name, userid, key, delta):
+    attributes = key_attributes(table_name, key)
+    update_expression = 'ADD ' + ', '.join(f'#{field} :{field}' for field in TOTAL_FIELDS)
+    if attributes:
+        update_expression = 'SET ' + ', '.join(f'#{name} = :{name}' for name in attributes) + ' ' + update_expression
+    return {
+        'TableName': table_name,
+        'Key': {'userid': userid, SORT_KEYS[table_name]: key},
+        'UpdateExpression': update_expression,
+        'ExpressionAttributeNames': {f'#{name}': name for name in [*attributes, *TOTAL_FIELDS]},
+        'ExpressionAttributeValues': {**{f':{name}': value for name, value in attributes.items()},
+                                      **{f':{field}': delta[field] for field in TOTAL_FIELDS}}
+    }
+
+def apply_deltas(client, deltas):
+    """ADD each delta to its rollup row with update_item; client may be a resource's meta.client.
+
+    Returns the number of rows updated. ADD is atomic, so concurrent writers never lose updates,
+    and the low-level client is thread-safe, so rows are sent from a small thread pool.
+    """
+    requests = [_update_request(*row) for row in deltas.items()]
+    if not requests:
+        return 0
+    with ThreadPoolExecutor(max_workers=min(APPLY_WORKERS, len(requests))) as pool:
+        # list() surfaces the first failure to the caller
+        list(pool.map(lambda request: client.update_item(**request), requests))
+    return len(requests)
@@ -0,0 +1,72 @@
+import json
+from decimal import Decimal
+from json.encoder import encode_basestring_ascii
+
+# Headers every API response carries so the static site can call the API from another origin
+CORS_HEADERS = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Headers': 'Content-Type',
+}
+
+_CONSTANTS = {True: 'true', False: 'false', None: 'null'}
+
+
+def _encode_value(value, keys):
+    value_type = type(value)
+    if value_type is str:
+        return encode_basestring_ascii(value)
+    if value_type is Decimal:
+        # DynamoDB numbers are written exactly as stored, never through a float
+        return str(value)
+    if value_type is bool or value is None:
+        return _CONSTANTS[value]
+    if isinstance(value, dict):
+        return _encode_object(value, keys)
+    if isinstance(value, (list, tuple)):
+        return '[' + ','.join([_encode_value(element, keys) for element in value]) + ']'
+    if isinstance(value, (set, frozenset)):
+        # String and number sets come back from DynamoDB as Python sets
+        return '[' + ','.join(sorted(_encode_value(element, keys) for element in value)) + ']'
+    if isinstance(value, str):
+        return encode_basestring_ascii(value)
+    if isinstance(value, Decimal):
+        return str(value)
+    # int and float, plus anything json itself knows how to write
+    return json.dumps(value)
+
+
+def _encode_object(item, keys):
+    parts = []
+    for key, value in item.items():
+        # Items share attribute names, so each encoded key is built once per response
+        encoded_key = keys.get(key)
+        if encoded_key is None:
+            encoded_key = keys[key] = encode_basestring_ascii(str(key)) + ':'
+        value_type = type(value)
+        if value_type is str:
+            parts.append(encoded_key + encode_basestring_ascii(value))
+        elif value_type is Decimal:
+            parts.append(encoded_key + str(value))
+        else:
+            parts.append(encoded_key + _encode_value(value, keys))
+    return '{' + ','.join(parts) + '}'
+
+
+def to_json(body):
+    """Serialize a response body, including DynamoDB items holding Decimals, in a single pass.
+
+    Numbers keep the exact digits DynamoDB returned (so -12.30 stays -12.30 rather than going
+    through a float), which JSON.parse reads as an ordinary number.
+    """
+    return _encode_value(body, {})
+
+
+def json_response(status_code, body, methods='GET, POST, OPTIONS'):
+    """Build the API Gateway proxy response with CORS headers and a JSON body."""
+    headers = {'Content-Type': 'application/json', 'Access-Control-Allow-Methods': methods}
+    headers.update(CORS_HEADERS)
+    return {
+        'statusCode': status_code,
+        'headers': headers,
+        'body': to_json(body)
+    }
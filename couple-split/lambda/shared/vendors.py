@@ -0,0 +1,54 @@
+"""Vendor names normalized from transaction descriptions.
+
+Every mapping config ends up with the merchant text in 'description', so one set of rules
+covers all bank formats. csv_converter stores the result on each item as 'vendor'.
+"""
+import re
+from functools import lru_cache
+
+UNKNOWN_VENDOR = 'Unknown'
+
+# Well-known merchants whose descriptions vary by store, order number or sales channel
+VENDOR_RULES = [
+    (re.compile(r'AMAZON|AMZN'), 'Amazon'),
+    (re.compile(r'TARGET'), 'Target'),
+    (re.compile(r'WAL-?MART|WM SUPERCENTER'), 'Walmart'),
+    (re.compile(r'STARBUCKS'), 'Starbucks'),
+    (re.compile(r'COSTCO'), 'Costco'),
+    (re.compile(r"SAM'?S ?CLUB"), "Sam's Club"),
+    (re.compile(r'UBER\s?\*?\s?EATS'), 'Uber Eats'),
+    (re.compile(r'UBER'), 'Uber'),
+    (re.compile(r'LYFT'), 'Lyft'),
+    (re.compile(r'DOORDASH'), 'DoorDash'),
+    (re.compile(r'NETFLIX'), 'Netflix'),
+    (re.compile(r'SPOTIFY'), 'Spotify'),
+    (re.compile(r'APPLE\.COM|APPLE STORE'), 'Apple'),
+]
+
+# Card processors and wallets prefix the merchant name, e.g. 'SQ *BLUE BOTTLE' or 'PAYPAL *ETSY'
+PROCESSOR_PREFIX = re.compile(r'^(?:SQ|TST|SP|PP|PY|DD|IC|PAYPAL|GOOGLE|APL|BT|CKE|LS)\s?\*\s*')
+
+# Store numbers, order references and phone numbers follow the merchant name
+TRAILING_REFERENCE = re.compile(r'\s*(?:[#*]|\d{3,}|\s-\s|\bSTORE\b|\bORDER\b).*$')
+
+PUNCTUATION = re.compile(r"[^\w&' ]+")
+WHITESPACE = re.compile(r'\s+')
+
+
+@lru_cache(maxsize=8192)
+def vendor_key(description):
+    """Return the vendor a description belongs to, e.g. 'AMZN Mktp US*2K3' -> 'Amazon'."""
+    if not description or description == 'nan':
+        return UNKNOWN_VENDOR
+
+    text = WHITESPACE.sub(' ', description.upper()).strip()
+    for pattern, name in VENDOR_RULES:
+        if pattern.search(text):
+            return name
+
+    text = PROCESSOR_PREFIX.sub('', text)
+    text = TRAILING_REFERENCE.sub('', text)
+    text = WHITESPACE.sub(' ', PUNCTUATION.sub(' ', text)).strip()
+    if not text:
+        return UNKNOWN_VENDOR
+    return ' '.join(word.capitalize() for word in text.split(' '))
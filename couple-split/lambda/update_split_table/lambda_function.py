@@ -1,10 +1,23 @@
 import json
+import os
+import time
 import boto3
-from boto3.dynamodb.conditions import Key
+from concurrent.futures import ThreadPoolExecutor
+from botocore.exceptions import ClientError
 
 # Initialize DynamoDB resource
 dynamodb = boto3.resource('dynamodb')
 table = dynamodb.Table('SplitTable')  # Replace with your actual table name
+lambda_client = boto3.client('lambda')
+
+# Job that recomputes split amounts of existing transactions when a category's rule changes
+RESPLIT_FUNCTION = os.environ.get('RESPLIT_FUNCTION')
+
+# BatchWriteItem accepts at most 25 requests per call
+BATCH_WRITE_SIZE = 25
+BATCH_WRITE_MAX_ATTEMPTS = 5
+# Upper bound on concurrent conditional put_item calls for adds
+MAX_WRITE_WORKERS = 8
 
 def lambda_handler(event, context):
     # Handle preflight CORS (OPTIONS request)
@@ -14,7 +27,8 @@ def lambda_handler(event, context):
     try:
         # Parse the request body
         body = json.loads(event['body'])
-        
+        results = []
+
         if body.get('action') == 'delete':
             user_id = body.get('userid')
             category = body.get('category')
@@ -25,61 +39,123 @@ def lambda_handler(event, context):
                     'category': category
                 }
             )
-            
+            results.append({'category': category, 'action': 'delete', 'result': 'deleted'})
+
         changes = body.get('changes', [])
 
-        if not changes:
+        if not changes and not results:
             return generate_response(400, 'No changes provided', cors=True)
 
-        # Loop through all the changes and apply the appropriate action
+        adds = []
+        updates = []
         for change in changes:
-            print(f"SplitTable: {change}")
             user_id = change.get('userid')
             category = change.get('category')
             need = change.get('need')
             split_percent = change.get('split_percent')
             action = change.get('action', 'update')  # Default to update
 
-            if not all([user_id, category, need is not None, split_percent]):
-                return generate_response(400, f'Missing required fields for {category}', cors=True)
+            # split_percent of 0 is a valid "not split" rule, only reject it when missing
+            if not all([user_id, category, need is not None, split_percent is not None]):
+                results.append({'category': category, 'action': action, 'result': 'failed',
+                                'error': f'Missing required fields for {category}'})
+                continue
 
+            item = {
+                'userid': user_id,
+                'category': category,
+                'need': need,
+                'split_percent': split_percent
+            }
             if action == 'add':
-                # Check if the item already exists
-                response = table.get_item(
-                    Key={
-                        'userid': user_id,
-                        'category': category
-                    }
-                )
-                if 'Item' not in response:
-                    # If the item does not exist, add it
-                    table.put_item(
-                        Item={
-                            'userid': user_id,
-                            'category': category,
-                            'need': need,
-                            'split_percent': split_percent
-                        }
-                    )
-                else:
-                    return generate_response(200, 'Item already exists: user_id={user_id}, category={category}', cors=True)
+                adds.append(item)
             elif action == 'update':
-                # Update the existing item or add a new one
-                table.put_item(
-                    Item={
-                        'userid': user_id,
-                        'category': category,
-                        'need': need,
-                        'split_percent': split_percent
-                    }
-                )
-
-        return generate_response(200, 'All actions performed successfully', cors=True)
-    
+                updates.append(item)
+            else:
+                results.append({'category': category, 'action': action, 'result': 'failed',
+                                'error': f'Unknown action {action}'})
+
+        results.extend(add_items(adds))
+        results.extend(put_items(updates))
+        queue_resplits(adds + updates, results)
+
+        failed = [result for result in results if result['result'] not in ('added', 'updated', 'deleted')]
+        return generate_response(207 if failed else 200, {'results': results}, cors=True)
+
     except Exception as e:
         print(f"Error updating SplitTable: {e}")
         return generate_response(500, f"Error: {str(e)}", cors=True)
 
+def add_item(item):
+    # The condition replaces the old get_item check, so there is no window between read and write
+    try:
+        table.meta.client.put_item(
+            TableName=table.name,
+            Item=item,
+            ConditionExpression='attribute_not_exists(category)'
+        )
+        return {'category': item['category'], 'action': 'add', 'result': 'added'}
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+            return {'category': item['category'], 'action': 'add', 'result': 'exists'}
+        print(f"Error adding {item['category']}: {e}")
+        return {'category': item['category'], 'action': 'add', 'result': 'failed', 'error': str(e)}
+
+def add_items(items):
+    """Conditionally put every new category; BatchWriteItem cannot carry conditions."""
+    if not items:
+        return []
+    # Low-level clients are thread-safe, resources are not
+    with ThreadPoolExecutor(max_workers=min(MAX_WRITE_WORKERS, len(items))) as pool:
+        return list(pool.map(add_item, items))
+
+def put_items(items):
+    """Write updates in BatchWriteItem groups of 25, retrying unprocessed items."""
+    # A batch cannot hold the same key twice; the last change for a category wins as before
+    latest = {(item['userid'], item['category']): item for item in items}
+    items = list(latest.values())
+
+    results = []
+    for start in range(0, len(items), BATCH_WRITE_SIZE):
+        group = items[start:start + BATCH_WRITE_SIZE]
+        request = {table.name: [{'PutRequest': {'Item': item}} for item in group]}
+        try:
+            for attempt in range(BATCH_WRITE_MAX_ATTEMPTS):
+                response = dynamodb.batch_write_item(RequestItems=request)
+                request = response.get('UnprocessedItems')
+                if not request:
+                    break
+                time.sleep(0.05 * 2 ** attempt)  # Back off before resending throttled items
+        except ClientError as e:
+            print(f"Error writing SplitTable batch: {e}")
+            results.extend({'category': item['category'], 'action': 'update', 'result': 'failed',
+                            'error': str(e)} for item in group)
+            continue
+
+        unprocessed = {request_item['PutRequest']['Item']['category']
+                       for request_item in (request or {}).get(table.name, [])}
+        for item in group:
+            if item['category'] in unprocessed:
+                results.append({'category': item['category'], 'action': 'update', 'result': 'failed',
+                                'error': 'Throttled, please retry'})
+            else:
+                results.append({'category': item['category'], 'action': 'update', 'result': 'updated'})
+
+    return results
+
+def queue_resplits(items, results):
+    """Start a re-split job for every category whose rule was written."""
+    if not RESPLIT_FUNCTION:
+        return
+    saved = {result['category'] for result in results if result['result'] in ('added', 'updated')}
+    for userid, category in {(item['userid'], item['category']) for item in items if item['category'] in saved}:
+        try:
+            lambda_client.invoke(FunctionName=RESPLIT_FUNCTION, InvocationType='Event',
+                                 Payload=json.dumps({'userid': userid, 'category': category}))
+        except ClientError as e:
+            # The rule is saved; invoking the job again with this payload brings the transactions in line
+            print(f"Error starting re-split for {category}: {e}")
+
 # Function to generate response with optional CORS headers
 def generate_response(status_code, body, cors=False):
     headers = {
@@ -91,7 +167,7 @@ def generate_response(status_code, body, cors=False):
             'Access-Control-Allow-Headers': 'Content-Type',
             'Access-Control-Allow-Methods': 'GET, POST, OPTIONS'
         })
-    
+
     return {
         'statusCode': status_code,
         'headers': headers,
@@ -1,16 +1,25 @@
 import json
 import boto3
 import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from decimal import Decimal
+from boto3.dynamodb.conditions import Key
+from botocore.exceptions import ClientError
+from instrumentation import LOG_LEVEL, METRICS, emits_metrics, instrument, log_payload
+from rollups import RollupDeltas, apply_deltas
 
 # Set up logging
 logger = logging.getLogger()
-logger.setLevel(logging.INFO)
+logger.setLevel(LOG_LEVEL)
 
 dynamodb = boto3.resource('dynamodb')
+instrument(dynamodb.meta.client)
 table = dynamodb.Table('TransactionSplitTable')
 split_table = dynamodb.Table('SplitTable')
 
+# Upper bound on concurrent update_item calls per invocation
+MAX_WRITE_WORKERS = 16
+
 def decimal_to_float(value):
     """Convert Decimal objects to float, return as-is if already float/int."""
     if isinstance(value, Decimal):
@@ -25,9 +34,117 @@ def float_to_decimal(value):
         return Decimal(str(value))
     return value  # If it's already Decimal, return as-is
 
+def load_split_rules(userid, cache):
+    """Return {category: SplitTable row} for a user, querying SplitTable once per invocation."""
+    if userid not in cache:
+        rules = {}
+        query_params = {'KeyConditionExpression': Key('userid').eq(userid)}
+        while True:
+            response = split_table.query(**query_params)
+            for row in response['Items']:
+                rules[row['category']] = row
+            if 'LastEvaluatedKey' not in response:
+                break
+            query_params['ExclusiveStartKey'] = response['LastEvaluatedKey']
+        cache[userid] = rules
+    return cache[userid]
+
+def set_request(transaction_hash, changes):
+    """update_item arguments that SET each attribute in changes; #name and :name pair up."""
+    return {
+        'TableName': table.name,
+        'Key': {
+            'hash': transaction_hash  # Use 'hash' as the partition key
+        },
+        'UpdateExpression': "SET " + ", ".join(f"#{name} = :{name}" for name in changes),
+        'ExpressionAttributeNames': {f"#{name}": name for name in changes},
+        'ExpressionAttributeValues': {f":{name}": value for name, value in changes.items()},
+        # The previous values tell which rollup rows the transaction leaves and joins
+        'ReturnValues': 'ALL_OLD'
+    }
+
+def updated_item(old, request):
+    # The item as stored after the update: the old attributes with the SET values applied
+    item = dict(old)
+    for placeholder, name in request['ExpressionAttributeNames'].items():
+        item[name] = request['ExpressionAttributeValues'][':' + placeholder[1:]]
+    return item
+
+def build_update_request(update, split_rules):
+    """Build the update_item arguments for one transaction from the frontend payload."""
+    transaction_hash = update['hash']  # Use 'hash' field as the key
+    split_value = update['split']
+    status = update['status']
+    category = update.get('category')
+
+    changes = {
+        'split': split_value == "yes",  # Convert 'yes'/'no' to boolean
+        'status': status,
+        'userid_status': f"{update['userid']}#{status}"  # Keep the GSI partition in sync
+    }
+
+    # Check if category is provided and update accordingly
+    if category:
+        if category not in split_rules:
+            raise ValueError(f"Category '{category}' not found for userid: {update['userid']}")
+
+        # Get category details from the SplitTable record
+        category_details = split_rules[category]
+        need = category_details.get('need', False)
+        split_percent = category_details.get('split_percent', Decimal(1))
+
+        # Ensure 'split_percent' is converted to float for calculations
+        split_percent = float(split_percent)
+
+        # Calculate 'after_split_amount' and the partner's share of the rest
+        amount = decimal_to_float(update['amount'])  # Ensure the amount is also a float
+        after_split_amount = amount * (split_percent/100)
+        partner_split_amount = amount * ((100 - split_percent)/100)
+
+        # Update the transaction with the new category, split, and other fields
+        changes.update({
+            'category': category,
+            # Convert float amounts back to Decimal for DynamoDB update
+            'after_split_amount': float_to_decimal(after_split_amount),
+            'partner_split_amount': float_to_decimal(partner_split_amount),
+            'need': need  # Store boolean value
+        })
+
+    # Without a category only split and status are updated
+    return set_request(transaction_hash, changes)
+
+def apply_updates(prepared):
+    """Send update_item calls through a bounded thread pool.
+
+    Returns (updated hashes, failures, rollup deltas for the transactions that changed).
+    """
+    updated = []
+    failed = []
+    deltas = RollupDeltas()
+    if not prepared:
+        return updated, failed, deltas
+
+    # Low-level clients are thread-safe, resources are not
+    client = table.meta.client
+    with ThreadPoolExecutor(max_workers=min(MAX_WRITE_WORKERS, len(prepared))) as pool:
+        futures = {pool.submit(client.update_item, **request): transaction_hash
+                   for transaction_hash, request in prepared.items()}
+        for future in as_completed(futures):
+            transaction_hash = futures[future]
+            try:
+                old = future.result().get('Attributes', {})
+                updated.append(transaction_hash)
+                deltas.change(old, updated_item(old, prepared[transaction_hash]))
+            except ClientError as e:
+                logger.error(f"Failed to update hash {transaction_hash}: {str(e)}")
+                failed.append({'hash': transaction_hash, 'error': str(e)})
+
+    return updated, failed, deltas
+
+@emits_metrics
 def lambda_handler(event, context):
     try:
-        logger.info("Received event: %s", json.dumps(event))
+        log_payload(logger, "Received event", event)
 
         # Handle preflight CORS (OPTIONS request)
         if event['httpMethod'] == 'OPTIONS':
@@ -47,89 +164,53 @@ def lambda_handler(event, context):
 
         # Parse the incoming updates from the frontend
         updates = json.loads(event['body'])
-        logger.info("Parsed updates: %s", updates)
-
-        # Iterate over the updates and apply them to DynamoDB
-        for update in updates:
-            transaction_hash = update['hash']  # Use 'hash' field as the key
-            split_value = update['split']
-            status = update['status']
-            category = update.get('category')
-
-            logger.info(f"Processing transaction with hash: {transaction_hash}, split: {split_value}, status: {status}, category: {category}")
-
-            # Check if category is provided and update accordingly
-            if category:
-                # Fetch the corresponding category details from SplitTable
-                response = split_table.query(
-                    KeyConditionExpression=boto3.dynamodb.conditions.Key('userid').eq(update['userid']) & boto3.dynamodb.conditions.Key('category').eq(category)
-                )
-                if 'Items' not in response or len(response['Items']) == 0:
-                    raise ValueError(f"Category '{category}' not found for userid: {update['userid']}")
-
-                # Get category details from the fetched record
-                category_details = response['Items'][0]
-                need = category_details.get('need', False)
-                split_percent = category_details.get('split_percent', Decimal(1))
-
-                # Ensure 'split_percent' is converted to float for calculations
-                split_percent = float(split_percent)
-
-                # Calculate 'after_split_amount'
-                amount = decimal_to_float(update['amount'])  # Ensure the amount is also a float
-                after_split_amount = amount * (split_percent/100)
-
-                logger.info(f"Category {category}: need={need}, split_percent={split_percent}, after_split_amount={after_split_amount}")
-
-                # Convert float 'after_split_amount' back to Decimal for DynamoDB update
-                after_split_amount = float_to_decimal(after_split_amount)
-
-                # Update the transaction in DynamoDB with the new category, split, and other fields
-                table.update_item(
-                    Key={
-                        'hash': transaction_hash  # Use 'hash' as the partition key
-                    },
-                    UpdateExpression="SET #split = :split_value, #status = :status, #category = :category, #after_split_amount = :after_split_amount, #need = :need",
-                    ExpressionAttributeNames={
-                        '#split': 'split',
-                        '#status': 'status',
-                        '#category': 'category',
-                        '#after_split_amount': 'after_split_amount',
-                        '#need': 'need'
-                    },
-                    ExpressionAttributeValues={
-                        ':split_value': split_value == "yes",  # Convert 'yes'/'no' to boolean
-                        ':status': status,
-                        ':category': category,
-                        ':after_split_amount': after_split_amount,  # Store as Decimal
-                        ':need': need  # Store boolean value
-                    }
-                )
-            else:
-                # Only update split and status if category is not provided
-                table.update_item(
-                    Key={
-                        'hash': transaction_hash  # Use 'hash' as the partition key
-                    },
-                    UpdateExpression="SET #split = :split_value, #status = :status",
-                    ExpressionAttributeNames={
-                        '#split': 'split',
-                        '#status': 'status'
-                    },
-                    ExpressionAttributeValues={
-                        ':split_value': split_value == "yes",  # Convert 'yes'/'no' to boolean
-                        ':status': status
-                    }
-                )
+        log_payload(logger, "Parsed updates", updates)
+
+        # Every user's SplitTable is read once, then all writes go out in parallel
+        split_rules_cache = {}
+        prepared = {}
+        failed = []
+
+        with METRICS.stage('prepare'):
+            for update in updates:
+                transaction_hash = update.get('hash')
+                try:
+                    split_rules = None
+                    if update.get('category'):
+                        split_rules = load_split_rules(update['userid'], split_rules_cache)
+                    prepared[transaction_hash] = build_update_request(update, split_rules)
+                except KeyError as e:
+                    logger.error(f"Missing field {e} in update for hash {transaction_hash}")
+                    failed.append({'hash': transaction_hash, 'error': f"Missing field {e}"})
+                except (ValueError, TypeError) as e:
+                    logger.error(f"Invalid update for hash {transaction_hash}: {str(e)}")
+                    failed.append({'hash': transaction_hash, 'error': str(e)})
+                except ClientError as e:
+                    # SplitTable could not be read for this user, the other updates still go out
+                    logger.error(f"Failed to load split rules for hash {transaction_hash}: {str(e)}")
+                    failed.append({'hash': transaction_hash, 'error': str(e)})
+
+        with METRICS.stage('write'):
+            updated, write_failures, rollup_deltas = apply_updates(prepared)
+        failed.extend(write_failures)
+
+        try:
+            with METRICS.stage('rollups'):
+                apply_deltas(table.meta.client, rollup_deltas)
+        except ClientError as e:
+            # The transactions are saved; scripts/rebuild_rollups.py brings the rollups back in line
+            logger.error(f"Failed to update rollups: {str(e)}")
+
+        logger.info(f"Updated {len(updated)} transactions, {len(failed)} failed")
 
         return {
-            'statusCode': 200,
+            'statusCode': 207 if failed else 200,
             'headers': {
                 'Access-Control-Allow-Origin': '*',
                 'Access-Control-Allow-Headers': 'Content-Type',
                 'Access-Control-Allow-Methods': 'POST, OPTIONS'
             },
-            'body': json.dumps('Transactions updated successfully')
+            'body': json.dumps({'updated': updated, 'failed': failed})
         }
 
     except ValueError as ve:
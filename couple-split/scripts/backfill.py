@@ -0,0 +1,247 @@
+"""
+Apply a per-item transform to every item of a DynamoDB table with a parallel segmented Scan.
+
+Each of --segments scan segments is read by its own worker thread (or process with --processes).
+The transform gets every item and returns the item to write back, or None to leave it alone.
+Only the attributes the transform changed are written, with UpdateItem and a condition that they
+still hold the values the scan read. An item that uploads or reviews changed in the meantime is
+skipped instead of being overwritten, and a rerun with a fresh checkpoint picks it up. After every
+page each segment saves its position under --checkpoint-dir, so rerunning the same command after
+a failure or Ctrl-C only picks up unfinished segments.
+
+Transforms are either one of the built-in names below or module:function on the Python path:
+
+    python scripts/backfill.py userid_status --dry-run
+    python scripts/backfill.py vendor --dry-run
+    python scripts/backfill.py vendor --segments 8 --checkpoint-dir .backfill
+    python scripts/backfill.py my_migration:transform --endpoint-url http://localhost:8000
+"""
+import argparse
+import importlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+import boto3
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+from botocore.exceptions import ClientError
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'lambda', 'shared'))
+
+from vendors import vendor_key  # noqa: E402
+
+TABLE_NAME = 'TransactionSplitTable'
+
+
+def add_userid_status(item):
+    # fetch_transactions queries the userid_status GSI, items written before it existed are not in it
+    if 'userid' not in item or 'status' not in item:
+        return None
+    userid_status = f"{item['userid']}#{item['status']}"
+    if item.get('userid_status') == userid_status:
+        return None
+    return {**item, 'userid_status': userid_status}
+
+
+def add_vendor(item):
+    # Items ingested before vendors were stored; the rollups already derive the same value
+    if 'vendor' in item:
+        return None
+    return {**item, 'vendor': vendor_key(item.get('description'))}
+
+
+TRANSFORMS = {
+    'userid_status': add_userid_status,
+    'vendor': add_vendor,
+}
+
+
+def resolve_transform(transform):
+    if callable(transform):
+        return transform
+    if transform in TRANSFORMS:
+        return TRANSFORMS[transform]
+    module_name, _, function_name = transform.partition(':')
+    if not function_name:
+        raise ValueError(f"Unknown transform {transform}, use one of {sorted(TRANSFORMS)} or module:function")
+    return getattr(importlib.import_module(module_name), function_name)
+
+
+def checkpoint_path(checkpoint_dir, transform, segment, total_segments):
+    # Segment boundaries depend on TotalSegments, so a checkpoint only resumes the same split
+    name = transform if isinstance(transform, str) else transform.__name__
+    return os.path.join(checkpoint_dir, f"{name.replace(':', '.')}-{segment:03d}-of-{total_segments:03d}.json")
+
+
+def load_checkpoint(path):
+    if not path or not os.path.exists(path):
+        return {'scanned': 0, 'written': 0, 'skipped': 0, 'last_key': None, 'done': False}
+    with open(path) as f:
+        checkpoint = json.load(f)
+    checkpoint.setdefault('skipped', 0)
+    if checkpoint['last_key']:
+        deserializer = TypeDeserializer()
+        checkpoint['last_key'] = {name: deserializer.deserialize(value) for name, value in checkpoint['last_key'].items()}
+    return checkpoint
+
+
+def save_checkpoint(path, checkpoint):
+    # Keys are stored in DynamoDB JSON so number and binary keys come back with their types
+    serializer = TypeSerializer()
+    last_key = checkpoint['last_key']
+    data = dict(checkpoint, last_key={name: serializer.serialize(value) for name, value in last_key.items()}
+                if last_key else None)
+    # Written to a temporary file first so an interrupted run never leaves half a checkpoint
+    with open(path + '.tmp', 'w') as f:
+        json.dump(data, f)
+    os.replace(path + '.tmp', path)
+
+
+def update_request(key_names, old, new):
+    """update_item arguments that SET or REMOVE only what new changes, if the item still matches old."""
+    changed = [name for name in new if name not in key_names and (name not in old or old[name] != new[name])]
+    removed = [name for name in old if name not in new]
+    names, values, actions, conditions = {}, {}, {'SET': [], 'REMOVE': []}, []
+    for i, name in enumerate(changed + removed):
+        names[f'#a{i}'] = name
+        if name in new:
+            values[f':new{i}'] = new[name]
+            actions['SET'].append(f'#a{i} = :new{i}')
+        else:
+            actions['REMOVE'].append(f'#a{i}')
+        # A review saved since the scan changes these attributes, and then the update must not land
+        if name in old:
+            values[f':old{i}'] = old[name]
+            conditions.append(f'#a{i} = :old{i}')
+        else:
+            conditions.append(f'attribute_not_exists(#a{i})')
+
+    request = {
+        'Key': {name: old[name] for name in key_names},
+        'UpdateExpression': ' '.join(f"{action} {', '.join(parts)}" for action, parts in actions.items() if parts),
+        'ConditionExpression': ' AND '.join(conditions),
+        'ExpressionAttributeNames': names,
+    }
+    if values:
+        request['ExpressionAttributeValues'] = values
+    return request
+
+
+def write_changes(table, key_names, old, new):
+    """Apply the transform's changes to one item; False when the item changed since it was scanned."""
+    try:
+        table.update_item(**update_request(key_names, old, new))
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise
+        return False
+    return True
+
+
+def backfill_segment(table_name, transform, segment, total_segments, checkpoint_dir=None,
+                     endpoint_url=None, page_size=None, dry_run=False):
+    """Scan one segment, writing back the items the transform changed. Returns the segment's counts."""
+    # Every worker gets its own resource, boto3 resources are not thread-safe
+    table = boto3.resource('dynamodb', endpoint_url=endpoint_url).Table(table_name)
+    transform_item = resolve_transform(transform)
+    path = None
+    if checkpoint_dir and not dry_run:
+        path = checkpoint_path(checkpoint_dir, transform, segment, total_segments)
+    checkpoint = load_checkpoint(path)
+    resumed = checkpoint['scanned']
+
+    scan_params = {'Segment': segment, 'TotalSegments': total_segments}
+    if page_size:
+        scan_params['Limit'] = page_size
+    key_names = [key['AttributeName'] for key in table.key_schema]
+    started = time.monotonic()
+    while not checkpoint['done']:
+        if checkpoint['last_key']:
+            scan_params['ExclusiveStartKey'] = checkpoint['last_key']
+        response = table.scan(**scan_params)
+
+        changed = [(item, new_item) for item, new_item in zip(response['Items'], map(transform_item, response['Items']))
+                   if new_item is not None and new_item != item]
+        written = len(changed)
+        if not dry_run:
+            written = sum(write_changes(table, key_names, item, new_item) for item, new_item in changed)
+
+        checkpoint['scanned'] += response['ScannedCount']
+        checkpoint['written'] += written
+        checkpoint['skipped'] += len(changed) - written
+        checkpoint['last_key'] = response.get('LastEvaluatedKey')
+        checkpoint['done'] = checkpoint['last_key'] is None
+        if path:
+            save_checkpoint(path, checkpoint)
+
+    return {'segment': segment, 'scanned': checkpoint['scanned'], 'written': checkpoint['written'],
+            'skipped': checkpoint['skipped'],
+            'scanned_now': checkpoint['scanned'] - resumed, 'seconds': time.monotonic() - started}
+
+
+def run_backfill(table_name, transform, segments=4, workers=None, processes=False, checkpoint_dir=None,
+                 endpoint_url=None, page_size=None, dry_run=False):
+    """Run every segment in a thread or process pool and total up the counts and throughput."""
+    if checkpoint_dir:
+        os.makedirs(checkpoint_dir, exist_ok=True)
+    if processes and callable(transform):
+        raise ValueError("Process pools need the transform by name, functions cannot be sent to other processes")
+
+    pool_class = ProcessPoolExecutor if processes else ThreadPoolExecutor
+    started = time.monotonic()
+    results = []
+    failed = []
+    with pool_class(max_workers=workers or segments) as pool:
+        futures = {pool.submit(backfill_segment, table_name, transform, segment, segments, checkpoint_dir,
+                               endpoint_url, page_size, dry_run): segment
+                   for segment in range(segments)}
+        for future in as_completed(futures):
+            segment = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                # The other segments carry on; rerunning resumes this one from its last checkpoint
+                print(f"Segment {segment} failed: {e}")
+                failed.append(segment)
+                continue
+            results.append(result)
+            rate = result['scanned_now'] / result['seconds'] if result['seconds'] else 0
+            print(f"Segment {segment}: {result['scanned']} scanned, {result['written']} written ({rate:.0f} items/s)")
+
+    seconds = time.monotonic() - started
+    scanned_now = sum(result['scanned_now'] for result in results)
+    return {
+        'scanned': sum(result['scanned'] for result in results),
+        'written': sum(result['written'] for result in results),
+        'skipped': sum(result['skipped'] for result in results),
+        'failed_segments': sorted(failed),
+        'seconds': seconds,
+        'items_per_second': scanned_now / seconds if seconds else 0
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('transform', help=f"One of {', '.join(sorted(TRANSFORMS))}, or module:function")
+    parser.add_argument('--table', default=TABLE_NAME)
+    parser.add_argument('--segments', type=int, default=4, help='Parallel scan segments')
+    parser.add_argument('--workers', type=int, help='Pool size, one worker per segment by default')
+    parser.add_argument('--processes', action='store_true', help='Run segments in processes instead of threads')
+    parser.add_argument('--checkpoint-dir', help='Directory for per-segment checkpoints; reruns resume from them')
+    parser.add_argument('--page-size', type=int, help='Items per scan page, smaller pages checkpoint more often')
+    parser.add_argument('--endpoint-url', help='DynamoDB endpoint, e.g. http://localhost:8000 for DynamoDB Local')
+    parser.add_argument('--dry-run', action='store_true', help='Count the items the transform would change without writing')
+    args = parser.parse_args()
+
+    summary = run_backfill(args.table, args.transform, segments=args.segments, workers=args.workers,
+                           processes=args.processes, checkpoint_dir=args.checkpoint_dir,
+                           endpoint_url=args.endpoint_url, page_size=args.page_size, dry_run=args.dry_run)
+    print(f"{'Would write' if args.dry_run else 'Wrote'} {summary['written']} of {summary['scanned']} items "
+          f"in {summary['seconds']:.1f}s ({summary['items_per_second']:.0f} items/s)")
+    if summary['skipped']:
+        print(f"{summary['skipped']} items changed while the backfill ran and were left alone")
+    if summary['failed_segments']:
+        print(f"Segments {summary['failed_segments']} failed, rerun the same command to resume them")
+        sys.exit(1)
@@ -0,0 +1,68 @@
+"""
+Record the archived S3 key of existing CSVs on their HashTable items.
+
+fetch_old_csvs lists a user's files from the user_id-date_added-index on HashTable and reads
+the archive location from s3_key. Files processed before s3_key was stored are found by
+listing old_csv/ once and matching the hash at the end of each file name:
+
+    python scripts/backfill_csv_manifest.py --dry-run
+    python scripts/backfill_csv_manifest.py
+"""
+import argparse
+
+import boto3
+from botocore.exceptions import ClientError
+
+BUCKET_NAME = 'couple-split-app-project'
+TABLE_NAME = 'HashTable'
+PREFIX = 'old_csv/'
+
+
+def iter_archived_csvs(s3, bucket):
+    # list_objects_v2 stops at 1,000 keys per call, the paginator follows the continuation token
+    for page in s3.get_paginator('list_objects_v2').paginate(Bucket=bucket, Prefix=PREFIX):
+        for obj in page.get('Contents', []):
+            if obj['Key'].endswith('.csv'):
+                yield obj['Key']
+
+
+def backfill(s3, table, bucket, dry_run=False):
+    summary = {'listed': 0, 'updated': 0, 'missing': 0}
+
+    for file_key in iter_archived_csvs(s3, bucket):
+        summary['listed'] += 1
+        # Archived names are <mapping_config>-<mm-dd-yyyy>-<hash>.csv
+        hash_value = file_key.split('/')[-1].rsplit('-', 1)[-1].replace('.csv', '')
+
+        if dry_run:
+            summary['updated'] += 1
+            continue
+
+        try:
+            table.update_item(
+                Key={'hash': hash_value},
+                UpdateExpression='SET s3_key = :s3_key',
+                ConditionExpression='attribute_exists(#hash)',
+                ExpressionAttributeNames={'#hash': 'hash'},
+                ExpressionAttributeValues={':s3_key': file_key}
+            )
+            summary['updated'] += 1
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            print(f"No HashTable item for {file_key}")
+            summary['missing'] += 1
+
+    return summary
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bucket', default=BUCKET_NAME)
+    parser.add_argument('--table', default=TABLE_NAME)
+    parser.add_argument('--dry-run', action='store_true', help='List the files that would be recorded without writing')
+    args = parser.parse_args()
+
+    summary = backfill(boto3.client('s3'), boto3.resource('dynamodb').Table(args.table), args.bucket, args.dry_run)
+    print(f"{'Would record' if args.dry_run else 'Recorded'} {summary['updated']} of {summary['listed']} archived CSVs "
+          f"({summary['missing']} without a HashTable item)")
@@ -0,0 +1,104 @@
+"""
+Rebuild TransactionRollupTable, VendorRollupTable and SettlementLedgerTable from the transactions
+in TransactionSplitTable.
+
+csv_converter and update_transactions keep the rollups up to date incrementally. Run this once
+after creating the tables, or to repair it after failed rollup writes. Pause uploads and reviews
+while it runs, since rows it has already rebuilt would miss changes made in the meantime:
+
+    python scripts/rebuild_rollups.py --dry-run
+    python scripts/rebuild_rollups.py
+    python scripts/rebuild_rollups.py --userid user1
+"""
+import argparse
+import os
+import sys
+
+import boto3
+from boto3.dynamodb.conditions import Attr, Key
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'lambda', 'shared'))
+
+from ledger import LEDGER_TABLE  # noqa: E402
+from rollups import ROLLUP_TABLE, SORT_KEYS, VENDOR_ROLLUP_TABLE, RollupDeltas, rollup_item  # noqa: E402
+
+TABLE_NAME = 'TransactionSplitTable'
+
+
+def scan_rollups(table, userid=None):
+    scan_params = {
+        'ProjectionExpression': ('userid, transaction_date, category, amount, after_split_amount, '
+                                 'partner_split_amount, #split, #need, #status, description, vendor'),
+        'ExpressionAttributeNames': {'#split': 'split', '#need': 'need', '#status': 'status'},
+        'FilterExpression': Attr('status').eq('reviewed')
+    }
+    if userid:
+        scan_params['FilterExpression'] = scan_params['FilterExpression'] & Attr('userid').eq(userid)
+
+    rollups = RollupDeltas()
+    scanned = 0
+    while True:
+        response = table.scan(**scan_params)
+        scanned += response['ScannedCount']
+        rollups.add_all(response['Items'])
+        if 'LastEvaluatedKey' not in response:
+            break
+        scan_params['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    return rollups, scanned
+
+
+def existing_rows(rollup_table, userids):
+    for userid in userids:
+        query_params = {'KeyConditionExpression': Key('userid').eq(userid)}
+        while True:
+            response = rollup_table.query(**query_params)
+            yield from response['Items']
+            if 'LastEvaluatedKey' not in response:
+                break
+            query_params['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def existing_keys(rollup_table, userids):
+    sort_key = SORT_KEYS[rollup_table.name]
+    return {(rollup_table.name, row['userid'], row[sort_key]) for row in existing_rows(rollup_table, userids)}
+
+
+def rebuild(table, rollup_tables, userid=None, dry_run=False):
+    """Recompute every rollup row from scratch; rollup_tables are Table objects of the rollup tables."""
+    rollups, scanned = scan_rollups(table, userid)
+    rows = {(table_name, row_userid, key): totals for table_name, row_userid, key, totals in rollups.items()}
+
+    # Rows left from transactions that no longer count are removed; users without any are not visited
+    userids = {userid} if userid else {row_userid for _, row_userid, _ in rows}
+    summary = {'scanned': scanned, 'written': 0, 'deleted': 0}
+    for rollup_table in rollup_tables:
+        written = {row: totals for row, totals in rows.items() if row[0] == rollup_table.name}
+        stale = existing_keys(rollup_table, userids) - set(written)
+        summary['written'] += len(written)
+        summary['deleted'] += len(stale)
+        if dry_run:
+            continue
+
+        with rollup_table.batch_writer() as batch:
+            for row, totals in written.items():
+                batch.put_item(Item=rollup_item(*row, totals))
+            for table_name, row_userid, key in stale:
+                batch.delete_item(Key={'userid': row_userid, SORT_KEYS[table_name]: key})
+
+    return summary
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--table', default=TABLE_NAME)
+    parser.add_argument('--userid', help='Only rebuild this user\'s rollups')
+    parser.add_argument('--endpoint-url', help='DynamoDB endpoint, e.g. http://localhost:8000 for DynamoDB Local')
+    parser.add_argument('--dry-run', action='store_true', help='Compute the rollups without writing')
+    args = parser.parse_args()
+
+    dynamodb = boto3.resource('dynamodb', endpoint_url=args.endpoint_url)
+    rollup_tables = [dynamodb.Table(name) for name in (ROLLUP_TABLE, VENDOR_ROLLUP_TABLE, LEDGER_TABLE)]
+    summary = rebuild(dynamodb.Table(args.table), rollup_tables, userid=args.userid, dry_run=args.dry_run)
+    print(f"{'Would write' if args.dry_run else 'Wrote'} {summary['written']} rollup rows and "
+          f"{'would delete' if args.dry_run else 'deleted'} {summary['deleted']} stale ones "
+          f"from {summary['scanned']} scanned transactions")
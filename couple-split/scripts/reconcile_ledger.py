@@ -0,0 +1,70 @@
+"""
+Check SettlementLedgerTable against the raw transactions in TransactionSplitTable.
+
+The ledger is kept incrementally by csv_converter and update_transactions. This recomputes every
+ledger node from the reviewed transactions and reports nodes that are missing, stale or hold
+different totals. Exits with status 1 when anything is off, so it can run on a schedule:
+
+    python scripts/reconcile_ledger.py
+    python scripts/reconcile_ledger.py --userid user1 --fix
+"""
+import argparse
+import os
+import sys
+
+import boto3
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'lambda', 'shared'))
+
+from ledger import LEDGER_TABLE  # noqa: E402
+from rebuild_rollups import TABLE_NAME, existing_rows, scan_rollups  # noqa: E402
+from rollups import TOTAL_FIELDS, rollup_item  # noqa: E402
+
+
+def reconcile(table, ledger_table, userid=None, fix=False):
+    rollups, scanned = scan_rollups(table, userid)
+    expected = {(row_userid, key): totals for table_name, row_userid, key, totals in rollups.items()
+                if table_name == LEDGER_TABLE}
+
+    userids = {userid} if userid else {row_userid for row_userid, _ in expected}
+    stored = {(row['userid'], row['node']): row for row in existing_rows(ledger_table, userids)}
+
+    mismatches = []
+    for row_key in expected.keys() | stored.keys():
+        want = expected.get(row_key)
+        have = stored.get(row_key)
+        if want is None:
+            # Only worth reporting when the stale node still holds something
+            if any(have.get(field, 0) for field in TOTAL_FIELDS):
+                mismatches.append((row_key, 'stale'))
+        elif have is None:
+            mismatches.append((row_key, 'missing'))
+        elif any(have.get(field, 0) != want[field] for field in TOTAL_FIELDS):
+            mismatches.append((row_key, 'different'))
+
+    if fix and mismatches:
+        with ledger_table.batch_writer() as batch:
+            for (row_userid, node), _ in mismatches:
+                if (row_userid, node) in expected:
+                    batch.put_item(Item=rollup_item(LEDGER_TABLE, row_userid, node, expected[(row_userid, node)]))
+                else:
+                    batch.delete_item(Key={'userid': row_userid, 'node': node})
+
+    return {'scanned': scanned, 'nodes': len(expected), 'mismatches': mismatches}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--table', default=TABLE_NAME)
+    parser.add_argument('--userid', help='Only check this user\'s ledger')
+    parser.add_argument('--endpoint-url', help='DynamoDB endpoint, e.g. http://localhost:8000 for DynamoDB Local')
+    parser.add_argument('--fix', action='store_true', help='Rewrite the nodes that do not match the transactions')
+    args = parser.parse_args()
+
+    dynamodb = boto3.resource('dynamodb', endpoint_url=args.endpoint_url)
+    result = reconcile(dynamodb.Table(args.table), dynamodb.Table(LEDGER_TABLE), userid=args.userid, fix=args.fix)
+    for (row_userid, node), problem in sorted(result['mismatches']):
+        print(f"{row_userid} node {node}: {problem}")
+    print(f"Checked {result['nodes']} ledger nodes from {result['scanned']} scanned transactions, "
+          f"{len(result['mismatches'])} {'fixed' if args.fix else 'mismatched'}")
+    sys.exit(1 if result['mismatches'] and not args.fix else 0)
@@ -0,0 +1,12 @@
+import os
+import sys
+
+# The csv_converter Lambda imports its sibling modules as top-level modules
+CSV_CONVERTER_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'lambda', 'csv_converter')
+sys.path.insert(0, os.path.abspath(CSV_CONVERTER_DIR))
+
+# Modules from the shared Lambda layer are importable at the top level in every function
+SHARED_LAYER_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'lambda', 'shared')
+sys.path.insert(0, os.path.abspath(SHARED_LAYER_DIR))
+
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
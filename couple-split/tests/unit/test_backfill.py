@@ -0,0 +1,94 @@
+import json
+import os
+import sys
+
+import boto3
+from moto import mock_aws
+
+from tests.unit.test_rollups import create_tables, transaction
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'scripts'))
+
+import backfill  # noqa: E402
+
+
+def test_segmented_backfill_resumes_failed_segments(tmp_path):
+    with mock_aws():
+        dynamodb = boto3.resource('dynamodb')
+        create_tables(dynamodb)
+        transactions = dynamodb.Table('TransactionSplitTable')
+        with transactions.batch_writer() as batch:
+            for i in range(60):
+                batch.put_item(Item=transaction(f'h{i:02d}', '-1.00', description='AMZN Mktp US*2K3'))
+            batch.put_item(Item=dict(transaction('done', '-1.00'), vendor='Shop'))
+
+        failing = {'h17'}
+        seen = []
+
+        def flaky_vendor(item):
+            seen.append(item['hash'])
+            if item['hash'] in failing:
+                raise RuntimeError('interrupted')
+            return backfill.add_vendor(item)
+
+        checkpoints = str(tmp_path)
+        summary = backfill.run_backfill('TransactionSplitTable', flaky_vendor, segments=4, page_size=5,
+                                        checkpoint_dir=checkpoints)
+        assert len(summary['failed_segments']) == 1
+        assert summary['written'] < 60
+
+        # The rerun only scans what the failed segment had left
+        failing.clear()
+        seen.clear()
+        rerun = backfill.run_backfill('TransactionSplitTable', flaky_vendor, segments=4, page_size=5,
+                                      checkpoint_dir=checkpoints)
+        assert rerun['failed_segments'] == []
+        assert (rerun['scanned'], rerun['written']) == (61, 60)
+        assert 'h17' in seen and len(seen) < 61
+
+        items = transactions.scan()['Items']
+        assert {item['vendor'] for item in items} == {'Amazon', 'Shop'}
+        segment_files = sorted(os.listdir(checkpoints))
+        assert len(segment_files) == 4
+        assert all(json.load(open(os.path.join(checkpoints, name)))['done'] for name in segment_files)
+
+
+def test_dry_run_counts_without_writing():
+    with mock_aws():
+        dynamodb = boto3.resource('dynamodb')
+        create_tables(dynamodb)
+        transactions = dynamodb.Table('TransactionSplitTable')
+        item = transaction('a', '-1.00')
+        del item['userid_status']
+        transactions.put_item(Item=item)
+
+        summary = backfill.run_backfill('TransactionSplitTable', 'userid_status', segments=2, dry_run=True)
+        assert (summary['scanned'], summary['written']) == (1, 1)
+        assert 'userid_status' not in transactions.get_item(Key={'hash': 'a'})['Item']
+
+
+def test_review_saved_during_the_backfill_is_kept():
+    with mock_aws():
+        dynamodb = boto3.resource('dynamodb')
+        create_tables(dynamodb)
+        transactions = dynamodb.Table('TransactionSplitTable')
+        stale, fresh = transaction('a', '-1.00'), transaction('b', '-1.00')
+        del stale['userid_status'], fresh['userid_status']
+        transactions.put_item(Item=stale)
+        transactions.put_item(Item=fresh)
+
+        def reviewed_after_scan(item):
+            # update_transactions saves the review between the scan and the backfill's write
+            if item['hash'] == 'a':
+                transactions.update_item(
+                    Key={'hash': 'a'}, UpdateExpression='SET #s = :s, userid_status = :us',
+                    ExpressionAttributeNames={'#s': 'status'},
+                    ExpressionAttributeValues={':s': 'reviewed', ':us': 'u1#reviewed'})
+            return backfill.add_userid_status(item)
+
+        summary = backfill.run_backfill('TransactionSplitTable', reviewed_after_scan, segments=1)
+        assert (summary['written'], summary['skipped']) == (1, 1)
+
+        reviewed = transactions.get_item(Key={'hash': 'a'})['Item']
+        assert (reviewed['status'], reviewed['userid_status']) == ('reviewed', 'u1#reviewed')
+        assert transactions.get_item(Key={'hash': 'b'})['Item']['userid_status'] == 'u1#pending'
@@ -0,0 +1,106 @@
+import boto3
+import pytest
+from moto import mock_aws
+
+import dynamodb_utils
+
+
+class FakeDynamoDB:
+    """ Resource stand-in that leaves the first N put requests of every call unprocessed """
+
+    def __init__(self, unprocessed_per_call):
+        self.unprocessed_per_call = list(unprocessed_per_call)
+        self.calls = []
+
+    def batch_write_item(self, RequestItems):
+        (table_name, requests), = RequestItems.items()
+        self.calls.append(len(requests))
+        skip = self.unprocessed_per_call.pop(0) if self.unprocessed_per_call else 0
+        unprocessed = requests[:skip]
+        return {'UnprocessedItems': {table_name: unprocessed} if unprocessed else {}}
+
+    def batch_get_item(self, RequestItems):
+        # Throttled reads: every key comes back unprocessed
+        self.calls.append(len(RequestItems['TransactionSplitTable']['Keys']))
+        return {'Responses': {}, 'UnprocessedKeys': RequestItems}
+
+
+def test_batch_write_items_groups_by_25(monkeypatch):
+    monkeypatch.setattr(dynamodb_utils.time, 'sleep', lambda _: None)
+    fake = FakeDynamoDB([])
+    items = [{'hash': str(i)} for i in range(60)]
+
+    summary = dynamodb_utils.batch_write_items('TransactionSplitTable', items, dynamodb=fake)
+
+    assert fake.calls == [25, 25, 10]
+    assert summary == {'written': 60, 'skipped': 0, 'retried': 0, 'failed': 0, 'batches': 3}
+
+
+def test_batch_write_items_resubmits_unprocessed(monkeypatch):
+    delays = []
+    monkeypatch.setattr(dynamodb_utils.time, 'sleep', delays.append)
+    fake = FakeDynamoDB([5, 2])
+    items = [{'hash': str(i)} for i in range(25)]
+
+    summary = dynamodb_utils.batch_write_items('TransactionSplitTable', items, dynamodb=fake)
+
+    assert fake.calls == [25, 5, 2]
+    assert summary == {'written': 25, 'skipped': 0, 'retried': 7, 'failed': 0, 'batches': 1}
+    assert len(delays) == 2
+
+
+def test_batch_write_items_collapses_duplicate_keys(monkeypatch):
+    fake = FakeDynamoDB([])
+    items = [{'hash': 'a', 'amount': 1}, {'hash': 'a', 'amount': 2}]
+
+    summary = dynamodb_utils.batch_write_items('TransactionSplitTable', items, dynamodb=fake)
+
+    assert fake.calls == [1]
+    assert summary['written'] == 1
+    assert summary['skipped'] == 1
+
+
+def test_batch_write_items_reports_failures(monkeypatch):
+    monkeypatch.setattr(dynamodb_utils.time, 'sleep', lambda _: None)
+    fake = FakeDynamoDB([3] * dynamodb_utils.BATCH_WRITE_MAX_ATTEMPTS)
+    items = [{'hash': str(i)} for i in range(10)]
+
+    summary = dynamodb_utils.batch_write_items('TransactionSplitTable', items, dynamodb=fake)
+
+    assert summary['failed'] == 3
+    assert summary['written'] == 7
+
+
+def test_existing_key_lookups_give_up_after_max_attempts(monkeypatch):
+    delays = []
+    monkeypatch.setattr(dynamodb_utils.time, 'sleep', delays.append)
+    fake = FakeDynamoDB([])
+    items = [{'hash': str(i)} for i in range(3)]
+
+    with pytest.raises(RuntimeError, match='3 keys'):
+        dynamodb_utils.batch_write_items('TransactionSplitTable', items, dynamodb=fake, skip_existing=True)
+
+    # Nothing is written without knowing which rows are already there
+    assert fake.calls == [3] * dynamodb_utils.BATCH_WRITE_MAX_ATTEMPTS
+    assert len(delays) == dynamodb_utils.BATCH_WRITE_MAX_ATTEMPTS - 1
+
+
+def test_batch_write_items_skips_rows_already_in_the_table():
+    with mock_aws():
+        dynamodb = boto3.resource('dynamodb')
+        table = dynamodb.create_table(
+            TableName='TransactionSplitTable',
+            KeySchema=[{'AttributeName': 'hash', 'KeyType': 'HASH'}],
+            AttributeDefinitions=[{'AttributeName': 'hash', 'AttributeType': 'S'}],
+            BillingMode='PAY_PER_REQUEST',
+        )
+        table.put_item(Item={'hash': '3', 'status': 'reviewed', 'split': True})
+        items = [{'hash': str(i), 'status': 'pending'} for i in range(30)]
+
+        summary = dynamodb_utils.batch_write_items('TransactionSplitTable', items, dynamodb=dynamodb,
+                                                   skip_existing=True)
+
+        assert summary['written'] == 29
+        assert summary['skipped'] == 1
+        # The reviewed row from the earlier upload is left as it was
+        assert table.get_item(Key={'hash': '3'})['Item'] == {'hash': '3', 'status': 'reviewed', 'split': True}
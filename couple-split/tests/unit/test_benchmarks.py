@@ -0,0 +1,60 @@
+import io
+import os
+import subprocess
+import sys
+
+import pandas as pd
+import pytest
+
+import csv_rows
+from lambda_function import csv_read_options, find_mapping_config
+from mapping_configurations import mapping_configs
+from normalize import normalize_dataframe
+
+BENCHMARKS_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'benchmarks')
+sys.path.insert(0, BENCHMARKS_DIR)
+
+from bench_suite import compare  # noqa: E402
+from statements import STATEMENT_FORMATS, synthetic_statement  # noqa: E402
+
+
+def test_every_mapping_config_has_a_generator():
+    assert set(STATEMENT_FORMATS) == set(mapping_configs)
+
+
+@pytest.mark.parametrize('config_name', sorted(mapping_configs))
+def test_generated_statements_are_detected_and_parsed(config_name):
+    data = synthetic_statement(config_name, rows=50)
+    assert data == synthetic_statement(config_name, rows=50)
+
+    header, read_options = csv_read_options(csv_rows.read_header(data.split(b'\n', 1)[0]))
+    mapping_config = find_mapping_config(header)
+    assert mapping_config['name'] == config_name
+
+    items = [item for rows in csv_rows.read_row_chunks(io.BytesIO(data), read_options, 20)
+             for item in csv_rows.normalize_rows(rows, mapping_config, 'user1', '2024-10-01')]
+    assert len(items) == 50
+    assert items == normalize_dataframe(pd.read_csv(io.BytesIO(data), **read_options), mapping_config,
+                                        'user1', '2024-10-01')
+
+
+def test_compare_flags_regressions_in_either_direction():
+    baseline = {'meta': {'commit': 'abc'},
+                'ingest': {'chase_credit': {'rows_per_second': 1000.0, 'peak_memory_mb': 10.0, 'rows': 5000}},
+                'fetch_transactions': {'1000': {'median_ms': 10.0, 'p95_ms': 20.0}}}
+    results = {'meta': {'commit': 'def'},
+               'ingest': {'chase_credit': {'rows_per_second': 700.0, 'peak_memory_mb': 9.0, 'rows': 5000}},
+               'fetch_transactions': {'1000': {'median_ms': 11.0, 'p95_ms': 30.0}}}
+
+    assert compare(results, baseline, tolerance=0.2) == ['ingest.chase_credit.rows_per_second',
+                                                         'fetch_transactions.1000.p95_ms']
+
+
+def test_fetch_transactions_benchmark_runs_standalone():
+    # A fresh interpreter without the test path, the way the benchmark is run from the command line
+    env = {name: value for name, value in os.environ.items() if name != 'PYTHONPATH'}
+    result = subprocess.run([sys.executable, os.path.join(BENCHMARKS_DIR, 'bench_fetch_transactions.py'),
+                             '--rows', '300', '--users', '5', '--repeat', '1'],
+                            capture_output=True, text=True, env=env)
+    assert result.returncode == 0, result.stderr
+    assert 'Speedup' in result.stdout
@@ -0,0 +1,35 @@
+import json
+import os
+import subprocess
+import sys
+
+import aws_clients
+
+CSV_CONVERTER_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'lambda', 'csv_converter')
+# Deployed with the shared layer, whose modules are importable at the top level
+SHARED_LAYER_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'lambda', 'shared'))
+
+# Generous ceiling for importing the handler module, which no longer pulls in pandas
+MODULE_IMPORT_BUDGET_MS = 1000
+
+
+def test_handler_import_is_light():
+    # A fresh interpreter sees exactly what a Lambda init would import
+    script = ('import sys, json, lambda_function, aws_clients; '
+              'print(json.dumps({"pandas": "pandas" in sys.modules, "timings": aws_clients.init_timings}))')
+    result = subprocess.run([sys.executable, '-c', script], cwd=CSV_CONVERTER_DIR, capture_output=True,
+                            text=True, check=True, env=dict(os.environ, AWS_DEFAULT_REGION='us-east-1', PYTHONPATH=SHARED_LAYER_DIR))
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+
+    assert report['pandas'] is False
+    assert report['timings']['module_imports_ms'] < MODULE_IMPORT_BUDGET_MS
+
+
+def test_clients_are_created_once_and_timed(monkeypatch):
+    monkeypatch.setattr(aws_clients, '_clients', {})
+    monkeypatch.setattr(aws_clients, 'init_timings', {})
+
+    assert aws_clients.dynamodb() is aws_clients.dynamodb()
+    assert aws_clients.s3() is aws_clients.s3()
+    assert set(aws_clients.init_timings) == {'dynamodb_resource_ms', 's3_client_ms'}
+    assert aws_clients.s3().meta.config.retries['mode'] == 'adaptive'
@@ -0,0 +1,82 @@
+import json
+import threading
+from decimal import Decimal
+
+import boto3
+from moto import mock_aws
+
+import aws_clients
+import lambda_function
+
+BUCKET = 'couple-split-app-project'
+CHASE_CSV = ('Transaction Date,Post Date,Description,Category,Type,Amount,Memo\n'
+             + ''.join(f'09/{i % 28 + 1:02d}/2024,09/02/2024,SHOP {i},Groceries,Sale,-{i}.25,\n' for i in range(200)))
+
+
+def create_tables(dynamodb):
+    for name in ('TransactionSplitTable', 'HashTable'):
+        dynamodb.create_table(TableName=name, KeySchema=[{'AttributeName': 'hash', 'KeyType': 'HASH'}],
+                              AttributeDefinitions=[{'AttributeName': 'hash', 'AttributeType': 'S'}],
+                              BillingMode='PAY_PER_REQUEST')
+    dynamodb.create_table(TableName='SplitTable',
+                          KeySchema=[{'AttributeName': 'userid', 'KeyType': 'HASH'},
+                                     {'AttributeName': 'category', 'KeyType': 'RANGE'}],
+                          AttributeDefinitions=[{'AttributeName': 'userid', 'AttributeType': 'S'},
+                                                {'AttributeName': 'category', 'AttributeType': 'S'}],
+                          BillingMode='PAY_PER_REQUEST')
+    dynamodb.Table('SplitTable').put_item(Item={'userid': 'u1', 'category': 'Groceries', 'need': True,
+                                                'split_percent': Decimal(50)})
+
+
+def record(key, size=100):
+    return {'s3': {'bucket': {'name': BUCKET}, 'object': {'key': key, 'size': size}}}
+
+
+def test_records_are_processed_concurrently_and_deduplicated(monkeypatch):
+    monkeypatch.setattr(aws_clients, '_clients', {})
+    monkeypatch.setattr(lambda_function, 'RECORD_WORKERS', 4)
+    with mock_aws():
+        dynamodb = boto3.resource('dynamodb')
+        create_tables(dynamodb)
+        s3 = boto3.client('s3')
+        s3.create_bucket(Bucket=BUCKET)
+        # The same statement uploaded twice under different names, plus a second statement
+        s3.put_object(Bucket=BUCKET, Key='input_csv/u1_a.csv', Body=CHASE_CSV.encode())
+        s3.put_object(Bucket=BUCKET, Key='input_csv/u1_b.csv', Body=CHASE_CSV.encode())
+        other = CHASE_CSV.replace('SHOP', 'STORE')
+        s3.put_object(Bucket=BUCKET, Key='input_csv/u1_c.csv', Body=other.encode())
+        keys = ['input_csv/u1_a.csv', 'input_csv/u1_b.csv', 'input_csv/u1_c.csv', 'input_csv/u1_missing.csv']
+
+        response = lambda_function.lambda_handler({'Records': [record(key) for key in keys]}, None)
+
+        results = {result['key']: result for result in json.loads(response['body'])['results']}
+        assert response['statusCode'] == 207
+        assert sorted([results['input_csv/u1_a.csv']['status'], results['input_csv/u1_b.csv']['status']]) == \
+            ['duplicate', 'processed']
+        assert results['input_csv/u1_c.csv']['status'] == 'processed'
+        # A failing record is reported without stopping the others
+        assert results['input_csv/u1_missing.csv']['status'] == 'error'
+
+        assert dynamodb.Table('TransactionSplitTable').scan(Select='COUNT')['Count'] == 400
+        assert dynamodb.Table('HashTable').scan(Select='COUNT')['Count'] == 2
+        remaining = [obj['Key'] for obj in s3.list_objects_v2(Bucket=BUCKET)['Contents']]
+        assert not any(key.startswith('input_csv/') for key in remaining)
+
+
+def test_hash_claims_make_the_second_record_wait_for_the_first(monkeypatch):
+    stored = set()
+    monkeypatch.setattr(lambda_function, 'check_duplicate_hash', lambda table, hash: hash in stored)
+    claims = lambda_function.HashClaims()
+    assert claims.is_duplicate('abc') is False
+
+    answers = []
+    waiter = threading.Thread(target=lambda: answers.append(claims.is_duplicate('abc')))
+    waiter.start()
+    waiter.join(0.2)
+    # Still waiting on the owner of 'abc'
+    assert waiter.is_alive() and answers == []
+
+    stored.add('abc')
+    claims.release_owned()
+    waiter.join(5)
+    assert answers == [True]
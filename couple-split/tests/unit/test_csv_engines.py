@@ -0,0 +1,116 @@
+import io
+
+import pandas as pd
+import pytest
+
+import csv_rows
+from lambda_function import csv_read_options, read_buffered
+from mapping_configurations import mapping_configs
+from normalize import normalize_dataframe
+
+DATE_CSV_ADDED = '2024-10-01'
+
+# One statement per mapping config, with the awkward cells real exports contain
+STATEMENTS = {
+    'chase_credit': (
+        'Transaction Date,Post Date,Description,Category,Type,Amount,Memo\n'
+        '09/03/2024,09/04/2024,"STORE, INC",Groceries,Sale,-45.10,\n'
+        '08/30/2024,08/31/2024,OLD PURCHASE,Shopping,Sale,-12.5,gift\n'
+        '09/05/2024,09/05/2024,PAYMENT,,Payment,500.00,NA\n'
+        '13/45/2024,09/06/2024,BAD DATE,Travel,Sale,-3,\n'
+        '\n'
+    ),
+    'amex_credit': (
+        '﻿Date,Description,Amount\n'
+        '09/03/2024,RESTAURANT,12.30\n'
+        '09/04/2024,REFUND,-4.50\n'
+        '09/05/2024,NO AMOUNT,\n'
+    ),
+    'sams_credit': (
+        'Date,Reference,Description,Amount\n'
+        '09/03/2024,A123,WAREHOUSE,"1,234.56"\n'
+        '09/04/2024,B456,RETURN,-20.00\n'
+    ),
+    # A numeric column with a blank cell would be inferred as float unless every path reads text
+    'sams_credit_numeric_reference': (
+        'Date,Reference,Description,Amount\n'
+        '09/03/2024,12345678,WAREHOUSE,"1,234.56"\n'
+        '09/04/2024,,RETURN,-20.00\n'
+    ),
+    'discover_credit': (
+        'Trans. Date,Post Date,Description,Amount,Category\n'
+        '09/03/2024,09/04/2024,GAS STATION,40.00,Gasoline\n'
+        '09/06/2024,09/07/2024,INTERNET PAYMENT - THANK YOU,-300.00,Payments and Credits\n'
+    ),
+    'discover_checking': (
+        'Transaction Date,Transaction Description,Transaction Type,Debit,Credit,Balance\n'
+        '09/03/2024,GROCERY,Debit,"$1,020.10",0,"$2,000.00"\n'
+        '09/04/2024,PAYROLL,Credit,0,$500.00,"$2,500.00"\n'
+        '09/05/2024,FEE,Debit,$2.00,$0.00,\n'
+    ),
+    'bofa_checking': (
+        'Description,,Summary Amt.\n'
+        'Beginning balance as of 09/01/2024,,"1,000.00"\n'
+        'Total credits,,"500.00"\n'
+        'Total debits,,"-200.00"\n'
+        'Ending balance as of 09/30/2024,,"1,300.00"\n'
+        '\n'
+        'Date,Description,Amount,Running Bal.\n'
+        '09/01/2024,Beginning balance as of 09/01/2024,,"1,000.00"\n'
+        '09/03/2024,"GROCERY STORE",-45.10,"954.90"\n'
+        '09/15/2024,PAYROLL,"500.00","1,454.90"\n'
+    ),
+    'bofa_credit': (
+        'Posted Date,Reference Number,Payee,Address,Amount\n'
+        '09/03/2024,24431,COFFEE SHOP,SEATTLE WA,-5.75\n'
+        '09/04/2024,24432,ONLINE PAYMENT,,120.00\n'
+        '09/05/2024,,INTEREST CHARGE,,-1.10\n'
+    ),
+}
+
+
+def header_of(data):
+    return pd.read_csv(io.BytesIO(data), nrows=1).columns.tolist()
+
+
+def pandas_streaming_items(data, mapping_config):
+    _, read_options = csv_read_options(header_of(data))
+    items = []
+    for df in pd.read_csv(io.BytesIO(data), dtype=str, chunksize=2, **read_options):
+        items.extend(normalize_dataframe(df, mapping_config, 'user1', DATE_CSV_ADDED))
+    return items
+
+
+def pandas_buffered_items(data, mapping_config):
+    _, read_options = csv_read_options(header_of(data))
+    return normalize_dataframe(read_buffered(io.BytesIO(data), read_options), mapping_config, 'user1', DATE_CSV_ADDED)
+
+
+def stdlib_items(data, mapping_config):
+    header, read_options = csv_read_options(csv_rows.read_header(data.split(b'\n', 1)[0]))
+    assert header == csv_read_options(header_of(data))[0]
+    items = []
+    for rows in csv_rows.read_row_chunks(io.BytesIO(data), read_options, 2):
+        items.extend(csv_rows.normalize_rows(rows, mapping_config, 'user1', DATE_CSV_ADDED))
+    return items
+
+
+@pytest.mark.parametrize('statement', sorted(STATEMENTS))
+def test_stdlib_engine_matches_pandas(statement):
+    data = STATEMENTS[statement].encode()
+    mapping_config = mapping_configs[statement.replace('_numeric_reference', '')]
+
+    items = stdlib_items(data, mapping_config)
+
+    assert items
+    assert items == pandas_streaming_items(data, mapping_config)
+    assert items == pandas_buffered_items(data, mapping_config)
+
+
+def test_every_mapping_config_has_a_parity_statement():
+    assert set(mapping_configs) <= set(STATEMENTS)
+
+
+def test_header_names_follow_pandas():
+    assert csv_rows.read_header(b'Description,,Summary Amt.\r') == ['Description', 'Unnamed: 1', 'Summary Amt.']
+    assert csv_rows.header_names(['A', 'A', '', 'B']) == ['A', 'A.1', 'Unnamed: 2', 'B']
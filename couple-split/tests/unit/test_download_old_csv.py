@@ -0,0 +1,42 @@
+from moto import mock_aws
+
+from tests.unit.test_rollups import load_lambda
+
+
+def test_url_cache_drops_expired_entries_and_stays_bounded(monkeypatch):
+    with mock_aws():
+        download = load_lambda('download_old_csv')
+    monkeypatch.setattr(download, 'URL_CACHE_MAX_ENTRIES', 2)
+
+    download.cache_url(('u1', 'a'), ('url-a', 'a.csv', 1000))
+    download.cache_url(('u1', 'b'), ('url-b', 'b.csv', 5000))
+    # Using a keeps it, so adding c drops b as the least recently used
+    assert download.cached_url(('u1', 'a'), 0) == ('url-a', 'a.csv', 1000)
+    download.cache_url(('u1', 'c'), ('url-c', 'c.csv', 5000))
+    assert list(download.url_cache) == [('u1', 'a'), ('u1', 'c')]
+
+    # Within the refresh margin of expiring an entry is removed rather than handed out
+    assert download.cached_url(('u1', 'a'), 1000 - download.URL_REFRESH_MARGIN) is None
+    assert list(download.url_cache) == [('u1', 'c')]
+
+
+def test_throttled_lookups_give_up_with_a_503(monkeypatch):
+    with mock_aws():
+        download = load_lambda('download_old_csv')
+
+    class Throttled:
+        calls = 0
+
+        def batch_get_item(self, RequestItems):
+            self.calls += 1
+            return {'Responses': {}, 'UnprocessedKeys': RequestItems}
+
+    throttled = Throttled()
+    monkeypatch.setattr(download, 'dynamodb', throttled)
+    monkeypatch.setattr(download.time, 'sleep', lambda _: None)
+
+    response = download.lambda_handler(
+        {'httpMethod': 'GET', 'queryStringParameters': {'user_id': 'u1', 'hash': 'a,b'}}, None)
+
+    assert response['statusCode'] == 503
+    assert throttled.calls == download.BATCH_GET_MAX_ATTEMPTS
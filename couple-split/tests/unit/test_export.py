@@ -0,0 +1,156 @@
+import csv
+import io
+import json
+from decimal import Decimal
+
+import boto3
+import moto.s3.models
+import pytest
+from moto import mock_aws
+
+from tests.unit.test_rollups import load_lambda, transaction
+
+BUCKET = 'couple-split-app-project'
+
+
+class FakeContext:
+    function_name = 'export-transactions'
+
+    def __init__(self, remaining_ms):
+        self.remaining_ms = remaining_ms
+
+    def get_remaining_time_in_millis(self):
+        return self.remaining_ms
+
+
+def create_transactions(dynamodb):
+    dynamodb.create_table(
+        TableName='TransactionSplitTable', KeySchema=[{'AttributeName': 'hash', 'KeyType': 'HASH'}],
+        AttributeDefinitions=[{'AttributeName': name, 'AttributeType': 'S'}
+                              for name in ('hash', 'userid_status', 'transaction_date')],
+        GlobalSecondaryIndexes=[{
+            'IndexName': 'userid_status-transaction_date-index',
+            'KeySchema': [{'AttributeName': 'userid_status', 'KeyType': 'HASH'},
+                          {'AttributeName': 'transaction_date', 'KeyType': 'RANGE'}],
+            'Projection': {'ProjectionType': 'ALL'},
+        }],
+        BillingMode='PAY_PER_REQUEST')
+    transactions = dynamodb.Table('TransactionSplitTable')
+    with transactions.batch_writer() as batch:
+        for day in range(1, 29):
+            batch.put_item(Item=dict(transaction(f'r{day:02d}', '-10.25', status='reviewed', date=f'2024-09-{day:02d}'),
+                                     description=f'Shop, "{day}"', split=day % 2 == 0,
+                                     after_split_amount=Decimal('-5.125'), partner_split_amount=Decimal('-5.125')))
+        batch.put_item(Item=transaction('pending', '-3.00', date='2024-09-10'))
+
+
+def test_csv_export_resumes_across_invocations_and_signs_a_link(monkeypatch):
+    with mock_aws():
+        create_transactions(boto3.resource('dynamodb'))
+        s3 = boto3.client('s3')
+        s3.create_bucket(Bucket=BUCKET)
+
+        export = load_lambda('export_transactions')
+        # Small pages and parts so the export spans several parts and invocations
+        monkeypatch.setattr(export, 'QUERY_PAGE_SIZE', 4)
+        monkeypatch.setattr(export, 'PART_SIZE', 300)
+        monkeypatch.setattr(moto.s3.models, 'S3_UPLOAD_PART_MIN_SIZE', 300)
+        invocations = []
+        monkeypatch.setattr(export.lambda_client, 'invoke', lambda **kwargs: invocations.append(json.loads(kwargs['Payload'])))
+        upload_part = export.upload_part
+        killed = []
+
+        def killable_upload_part(state, data):
+            if killed:
+                raise TimeoutError('Task timed out')
+            upload_part(state, data)
+        monkeypatch.setattr(export, 'upload_part', killable_upload_part)
+
+        body = {'userid': 'u1', 'format': 'csv', 'startDate': '2024-09-03', 'endDate': '2024-09-26'}
+        response = export.lambda_handler({'httpMethod': 'POST', 'body': json.dumps(body)}, FakeContext(10 ** 6))
+        assert response['statusCode'] == 202
+        export_id = json.loads(response['body'])['export_id']
+        assert invocations == [{'userid': 'u1', 'export_id': export_id}]
+
+        # Out of time after the first part: the run checkpoints and hands over
+        assert export.lambda_handler(invocations[-1], FakeContext(1000))['status'] == 'running'
+        assert len(invocations) == 2
+        state = export.load_state('u1', export_id)
+        assert len(state['parts']) == 1 and state['last_key']
+
+        # A run that is killed before its checkpoint leaves the state where the last part ended
+        killed.append(True)
+        with pytest.raises(TimeoutError):
+            export.lambda_handler(invocations[-1], FakeContext(10 ** 6))
+        killed.clear()
+        assert export.load_state('u1', export_id) == state
+
+        assert export.lambda_handler(invocations[-1], FakeContext(10 ** 6)) == {'status': 'done', 'rows': 24}
+
+        response = export.lambda_handler({'httpMethod': 'GET', 'queryStringParameters': {
+            'userid': 'u1', 'exportId': export_id}}, None)
+        status = json.loads(response['body'])
+        assert (status['status'], status['rows']) == ('done', 24)
+        assert export_id in status['download_url']
+
+        data = s3.get_object(Bucket=BUCKET, Key=f'exports/u1/{export_id}.csv')['Body'].read().decode('utf-8')
+        rows = list(csv.DictReader(io.StringIO(data)))
+        assert [row['hash'] for row in rows] == [f'r{day:02d}' for day in range(3, 27)]
+        assert (rows[0]['description'], rows[0]['amount'], rows[0]['split']) == ('Shop, "3"', '-10.25', 'False')
+
+        # Another user cannot look the export up
+        response = export.lambda_handler({'httpMethod': 'GET', 'queryStringParameters': {
+            'userid': 'u2', 'exportId': export_id}}, None)
+        assert response['statusCode'] == 404
+
+
+def test_parquet_export_writes_a_file_per_row_group_and_resumes(monkeypatch):
+    pq = pytest.importorskip('pyarrow.parquet')
+    with mock_aws():
+        create_transactions(boto3.resource('dynamodb'))
+        s3 = boto3.client('s3')
+        s3.create_bucket(Bucket=BUCKET)
+
+        export = load_lambda('export_transactions')
+        monkeypatch.setattr(export, 'QUERY_PAGE_SIZE', 4)
+        monkeypatch.setattr(export, 'PARQUET_ROW_GROUP_ROWS', 6)
+        invocations = []
+        monkeypatch.setattr(export.lambda_client, 'invoke', lambda **kwargs: invocations.append(json.loads(kwargs['Payload'])))
+
+        body = {'userid': 'u1', 'format': 'parquet', 'startDate': '2024-09-03', 'endDate': '2024-09-26'}
+        response = export.lambda_handler({'httpMethod': 'POST', 'body': json.dumps(body)}, FakeContext(10 ** 6))
+        export_id = json.loads(response['body'])['export_id']
+
+        # Low on time after the first file: the checkpoint records it and the next run carries on
+        assert export.lambda_handler(invocations[-1], FakeContext(1000))['status'] == 'running'
+        assert len(export.load_state('u1', export_id)['parts']) == 1
+        assert export.lambda_handler(invocations[-1], FakeContext(10 ** 6)) == {'status': 'done', 'rows': 24}
+
+        response = export.lambda_handler({'httpMethod': 'GET', 'queryStringParameters': {
+            'userid': 'u1', 'exportId': export_id}}, None)
+        assert len(json.loads(response['body'])['download_urls']) == 3
+
+        hashes = []
+        for part in export.load_state('u1', export_id)['parts']:
+            data = s3.get_object(Bucket=BUCKET, Key=part['Key'])['Body'].read()
+            table = pq.read_table(io.BytesIO(data))
+            hashes.extend(table.column('hash').to_pylist())
+        assert hashes == [f'r{day:02d}' for day in range(3, 27)]
+        assert table.column('amount').to_pylist()[0] == Decimal('-10.25')
+
+
+def test_unknown_export_is_not_found():
+    with mock_aws():
+        boto3.client('s3').create_bucket(Bucket=BUCKET)
+        export = load_lambda('export_transactions')
+        response = export.lambda_handler({'httpMethod': 'GET', 'queryStringParameters': {
+            'userid': 'u1', 'exportId': 'no-such-export'}}, None)
+        assert response['statusCode'] == 404
+
+
+def test_export_request_is_validated():
+    with mock_aws():
+        export = load_lambda('export_transactions')
+        for body in ({'format': 'csv'}, {'userid': 'u1', 'format': 'xlsx'}, {'userid': 'u1', 'startDate': '09/01/2024'}):
+            response = export.lambda_handler({'httpMethod': 'POST', 'body': json.dumps(body)}, FakeContext(10 ** 6))
+            assert response['statusCode'] == 400
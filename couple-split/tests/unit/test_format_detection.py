@@ -0,0 +1,105 @@
+import hashlib
+import io
+import itertools
+import random
+
+import lambda_function
+from format_index import FormatIndex
+from mapping_configurations import mapping_configs
+from utils import etag_md5, read_first_line
+
+
+def legacy_find_mapping_config(header):
+    # The loop over every config that FormatIndex replaced
+    best_match = None
+    max_matched_columns = 0
+    for config in mapping_configs.values():
+        required_cols = set(col for key, col in config.items() if key not in ['name', 'date_format'])
+        if required_cols.issubset(header) and len(required_cols) > max_matched_columns:
+            best_match = config
+            max_matched_columns = len(required_cols)
+    return best_match
+
+
+class RangedS3:
+    """Minimal S3 client double serving one object and recording the ranges requested."""
+
+    def __init__(self, body, etag=None):
+        self.body = body
+        self.etag = etag
+        self.ranges = []
+        self.deleted = []
+
+    def get_object(self, Bucket, Key, Range=None):
+        self.ranges.append(Range)
+        body = self.body
+        if Range:
+            start, end = Range[len('bytes='):].split('-')
+            body = body[int(start):int(end) + 1]
+        response = {'Body': io.BytesIO(body)}
+        if self.etag:
+            response['ETag'] = f'"{self.etag}"'
+        return response
+
+    def delete_object(self, Bucket, Key):
+        self.deleted.append(Key)
+
+
+def test_index_matches_the_config_loop():
+    columns = sorted({col for config in mapping_configs.values()
+                      for key, col in config.items() if key not in ['name', 'date_format']} | {'Extra'})
+    headers = [[col for key, col in config.items() if key not in ['name', 'date_format']]
+               for config in mapping_configs.values()]
+    headers += [header + ['Extra'] for header in headers]
+    rng = random.Random(5)
+    headers += [rng.sample(columns, rng.randint(0, len(columns))) for _ in range(2000)]
+    headers += [list(pair) for pair in itertools.combinations(columns, 2)]
+
+    index = FormatIndex(mapping_configs)
+    for header in headers:
+        assert index.match(header) is legacy_find_mapping_config(header), header
+
+
+def test_first_line_comes_from_small_ranged_reads():
+    s3 = RangedS3(b'Date,Description,Amount\n' + b'09/03/2024,SHOP,1.00\n' * 10000)
+    assert read_first_line(s3, 'bucket', 'key') == (b'Date,Description,Amount', None)
+    assert s3.ranges == ['bytes=0-4095']
+
+    long_header = b','.join(b'Column %d' % i for i in range(700))
+    s3 = RangedS3(long_header + b'\n1,2\n')
+    assert read_first_line(s3, 'bucket', 'key') == (long_header, None)
+    assert s3.ranges == ['bytes=0-4095', 'bytes=0-8191']
+
+
+def test_unmatched_file_is_rejected_before_download(monkeypatch):
+    s3 = RangedS3(b'Foo,Bar\n' + b'1,2\n' * 10000)
+    monkeypatch.setattr(lambda_function.aws_clients, 's3', lambda: s3)
+    event = {'Records': [{'s3': {'bucket': {'name': 'bucket'}, 'object': {'key': 'input_csv/u1_x.csv', 'size': 40008}}}]}
+
+    assert lambda_function.lambda_handler(event, None)['statusCode'] == 200
+    assert s3.ranges == ['bytes=0-4095']
+    assert s3.deleted == []
+
+
+def test_etag_is_used_as_the_hash_only_when_it_is_the_md5():
+    md5 = hashlib.md5(b'data').hexdigest()
+    assert etag_md5({'ETag': f'"{md5}"'}) == md5
+    assert etag_md5({'ETag': f'"{md5}-3"'}) is None
+    assert etag_md5({'ETag': f'"{md5}"', 'ServerSideEncryption': 'aws:kms'}) is None
+    assert etag_md5({'ETag': f'"{md5}"', 'SSECustomerAlgorithm': 'AES256'}) is None
+    assert etag_md5({}) is None
+
+
+def test_duplicate_with_md5_etag_is_rejected_before_download(monkeypatch):
+    body = b'Transaction Date,Post Date,Description,Category,Type,Amount,Memo\n' + b'09/03/2024,09/04/2024,SHOP,Food,Sale,-1.00,\n' * 1000
+    s3 = RangedS3(body, etag=hashlib.md5(body).hexdigest())
+    checked = []
+    monkeypatch.setattr(lambda_function.aws_clients, 's3', lambda: s3)
+    monkeypatch.setattr(lambda_function, 'check_duplicate_hash', lambda table, hash: checked.append(hash) or True)
+    event = {'Records': [{'s3': {'bucket': {'name': 'bucket'}, 'object': {'key': 'input_csv/u1_x.csv', 'size': len(body)}}}]}
+
+    assert lambda_function.lambda_handler(event, None)['statusCode'] == 200
+    assert checked == [hashlib.md5(body).hexdigest()]
+    # Only the header was read, and the duplicate was removed from the input folder
+    assert s3.ranges == ['bytes=0-4095']
+    assert s3.deleted == ['input_csv/u1_x.csv']
@@ -0,0 +1,91 @@
+import json
+import logging
+
+import boto3
+from moto import mock_aws
+
+import aws_clients
+import instrumentation
+import lambda_function
+from instrumentation import Metrics, instrument, log_payload
+from tests.unit.test_concurrent_records import BUCKET, CHASE_CSV, create_tables, record
+
+
+def emf_lines(output):
+    return [json.loads(line) for line in output.splitlines() if line.startswith('{"_aws"')]
+
+
+def test_nested_stages_are_exclusive(monkeypatch):
+    clock = iter([0.0, 1.0, 3.0, 4.0, 10.0, 11.0, 12.0, 13.0])
+    monkeypatch.setattr(instrumentation.time, 'perf_counter', lambda: next(clock))
+    metrics = Metrics('test')
+
+    # write runs 0-4 around a 1-3 parse, then a generator charges its next() calls to parse
+    with metrics.stage('write'):
+        with metrics.stage('parse'):
+            pass
+    assert list(metrics.timed_iter('parse', ['row'])) == ['row']
+
+    assert metrics.stages == {'write': 2.0, 'parse': 4.0}
+
+
+def test_dynamodb_capacity_is_reported_as_embedded_metrics(capsys):
+    metrics = Metrics('fetch-transactions')
+    with mock_aws():
+        dynamodb = boto3.resource('dynamodb')
+        create_tables(dynamodb)
+        instrument(dynamodb.meta.client, metrics)
+        table = dynamodb.Table('HashTable')
+        with metrics.stage('write'):
+            table.put_item(Item={'hash': 'a'})
+            with table.batch_writer() as batch:
+                batch.put_item(Item={'hash': 'b'})
+        table.get_item(Key={'hash': 'a'})
+        # Calls that do not read or write items are left alone
+        dynamodb.meta.client.describe_table(TableName='HashTable')
+
+    document = metrics.flush(files=1)
+    assert emf_lines(capsys.readouterr().out) == [document]
+    assert document['dynamodb_calls'] == 3
+    assert document['consumed_capacity_units'] == document['capacity_by_table']['HashTable'] > 0
+    assert document['function'] == 'fetch-transactions' and document['files'] == 1
+    directive, = document['_aws']['CloudWatchMetrics']
+    assert directive['Dimensions'] == [['function']]
+    assert {metric['Name']: metric['Unit'] for metric in directive['Metrics']} == {
+        'write_ms': 'Milliseconds', 'dynamodb_calls': 'Count', 'consumed_capacity_units': 'Count'}
+
+    # Flushing clears the invocation, an idle one prints nothing
+    assert metrics.flush() is None
+    assert capsys.readouterr().out == ''
+
+
+def test_ingest_emits_stage_timings(monkeypatch, capsys):
+    monkeypatch.setattr(aws_clients, '_clients', {})
+    with mock_aws():
+        create_tables(boto3.resource('dynamodb'))
+        s3 = boto3.client('s3')
+        s3.create_bucket(Bucket=BUCKET)
+        s3.put_object(Bucket=BUCKET, Key='input_csv/u1_a.csv', Body=CHASE_CSV.encode())
+
+        response = lambda_function.lambda_handler({'Records': [record('input_csv/u1_a.csv')]}, None)
+
+    assert response['statusCode'] == 200
+    document, = emf_lines(capsys.readouterr().out)
+    assert {'download_ms', 'parse_ms', 'normalize_ms', 'split_ms', 'write_ms'} <= set(document)
+    assert {'TransactionSplitTable', 'HashTable', 'SplitTable'} <= set(document['capacity_by_table'])
+
+
+def test_payloads_are_only_serialized_at_debug(caplog):
+    logger = logging.getLogger('payloads')
+
+    class Unserializable:
+        def __str__(self):
+            raise AssertionError('serialized below DEBUG')
+
+    with caplog.at_level(logging.INFO, logger='payloads'):
+        log_payload(logger, 'Received event', {'body': Unserializable()})
+    assert caplog.records == []
+
+    with caplog.at_level(logging.DEBUG, logger='payloads'):
+        log_payload(logger, 'Received event', {'body': 'x'})
+    assert caplog.messages == ['Received event: {"body": "x"}']
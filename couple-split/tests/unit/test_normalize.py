@@ -0,0 +1,57 @@
+import io
+from decimal import Decimal
+
+import pandas as pd
+
+from mapping_configurations import mapping_configs
+from normalize import normalize_dataframe
+
+
+def normalize(config_name, csv_text):
+    df = pd.read_csv(io.StringIO(csv_text))
+    return normalize_dataframe(df, mapping_configs[config_name], 'user1', date_csv_added='2024-10-01')
+
+
+def test_negated_amounts_and_threshold_rule():
+    items = normalize('amex_credit', 'Date,Description,Amount\n08/03/2024,OLD PURCHASE,12.30\n09/05/2024,PURCHASE,"1,234.5"\n09/06/2024,REFUND,-4.50\n')
+
+    assert [item['amount'] for item in items] == [Decimal('-12.30'), Decimal('-1234.50'), Decimal('4.50')]
+    assert [item['transaction_date'] for item in items] == ['2024-08-03', '2024-09-05', '2024-09-06']
+    # Before the split start date, and refunds, are reviewed straight away
+    assert [item['status'] for item in items] == ['reviewed', 'pending', 'reviewed']
+    assert [item['split'] for item in items] == [False, None, False]
+
+
+def test_debit_and_credit_columns_are_merged():
+    items = normalize(
+        'discover_checking',
+        'Transaction Date,Transaction Description,Transaction Type,Debit,Credit,Balance\n'
+        '09/03/2024,GROCERY,Debit,"$1,020.10",0,"$2,000.00"\n'
+        '09/04/2024,PAYROLL,Credit,0,$500.00,"$2,500.00"\n'
+    )
+
+    assert [item['amount'] for item in items] == [Decimal('-1020.10'), Decimal('500.00')]
+    assert [item['balance'] for item in items] == [Decimal('2000.00'), Decimal('2500.00')]
+    assert all(item['userid'] == 'user1' and item['mapping_config_name'] == 'discover_checking' for item in items)
+
+
+def test_unparseable_dates_are_kept_and_hash_is_stable():
+    csv_text = 'Posted Date,Reference Number,Payee,Address,Amount\nnot a date,1,SHOP,TOWN,-3.00\n'
+
+    first = normalize('bofa_credit', csv_text)
+    second = normalize('bofa_credit', csv_text)
+
+    assert first[0]['transaction_date'] == 'not a date'
+    assert first[0]['description'] == 'SHOP'
+    assert 'reference_number' not in first[0]
+    assert first[0]['hash'] == second[0]['hash']
+
+
+def test_fingerprint_ignores_the_upload_date():
+    df = pd.read_csv(io.StringIO('Date,Description,Amount\n09/05/2024,PURCHASE,12.30\n'))
+
+    first = normalize_dataframe(df, mapping_configs['amex_credit'], 'user1', date_csv_added='2024-10-01')
+    again = normalize_dataframe(df, mapping_configs['amex_credit'], 'user1', date_csv_added='2024-11-01')
+
+    assert first[0]['date_csv_added'] != again[0]['date_csv_added']
+    assert first[0]['hash'] == again[0]['hash']
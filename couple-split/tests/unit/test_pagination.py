@@ -0,0 +1,69 @@
+from decimal import Decimal
+
+import boto3
+import pytest
+from boto3.dynamodb.conditions import Attr, Key
+from moto import mock_aws
+
+from pagination import InvalidCursor, decode_cursor, encode_cursor, parse_limit, query_page
+
+
+@pytest.fixture(autouse=True)
+def cursor_secret(monkeypatch):
+    monkeypatch.setenv('CURSOR_SECRET', 'test-secret-value')
+
+
+@pytest.fixture()
+def split_table():
+    with mock_aws():
+        dynamodb = boto3.resource('dynamodb')
+        table = dynamodb.create_table(
+            TableName='SplitTable',
+            KeySchema=[{'AttributeName': 'userid', 'KeyType': 'HASH'}, {'AttributeName': 'category', 'KeyType': 'RANGE'}],
+            AttributeDefinitions=[{'AttributeName': 'userid', 'AttributeType': 'S'}, {'AttributeName': 'category', 'AttributeType': 'S'}],
+            BillingMode='PAY_PER_REQUEST',
+        )
+        for i in range(25):
+            table.put_item(Item={'userid': 'user1', 'category': f'cat{i:02d}', 'need': i % 2 == 0, 'split_percent': Decimal(i)})
+        yield table
+
+
+def test_cursor_round_trip_and_tampering():
+    key = {'userid': 'user1', 'category': 'cat03', 'amount': Decimal('-1.50')}
+    cursor = encode_cursor(key, 'scope-a')
+
+    assert decode_cursor(cursor, 'scope-a') == key
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor, 'scope-b')
+    with pytest.raises(InvalidCursor):
+        decode_cursor('x' + cursor, 'scope-a')
+    assert encode_cursor(None, 'scope-a') is None
+
+
+def test_parse_limit_bounds():
+    assert parse_limit(None) == 100
+    assert parse_limit('5000') == 1000
+    with pytest.raises(ValueError):
+        parse_limit('0')
+
+
+def test_query_page_walks_every_item_once(split_table):
+    query = {'KeyConditionExpression': Key('userid').eq('user1')}
+    seen, cursor = [], None
+    while True:
+        items, cursor = query_page(split_table, query, 10, cursor, 'user1')
+        seen.extend(item['category'] for item in items)
+        if not cursor:
+            break
+
+    assert seen == [f'cat{i:02d}' for i in range(25)]
+
+
+def test_query_page_fills_pages_through_filters(split_table):
+    query = {'KeyConditionExpression': Key('userid').eq('user1'), 'FilterExpression': Attr('need').eq(True)}
+
+    items, cursor = query_page(split_table, query, 5, None, 'user1')
+    rest, last_cursor = query_page(split_table, query, 100, cursor, 'user1')
+
+    assert [item['category'] for item in items] == ['cat00', 'cat02', 'cat04', 'cat06', 'cat08']
+    assert len(rest) == 8 and last_cursor is None
@@ -0,0 +1,112 @@
+import json
+from decimal import Decimal
+
+import boto3
+from moto import mock_aws
+
+from rollups import ROLLUP_TABLE, RollupDeltas, apply_deltas
+from tests.unit.test_rollups import create_tables, load_lambda, rollup_rows, transaction
+
+
+class FakeContext:
+    function_name = 'resplit-transactions'
+
+    def __init__(self, remaining_ms):
+        self.remaining_ms = remaining_ms
+
+    def get_remaining_time_in_millis(self):
+        return self.remaining_ms
+
+
+def create_resplit_tables(dynamodb):
+    create_tables(dynamodb)
+    # The test tables have no category index, replace the transactions table with one that does
+    dynamodb.Table('TransactionSplitTable').delete()
+    dynamodb.create_table(
+        TableName='TransactionSplitTable', KeySchema=[{'AttributeName': 'hash', 'KeyType': 'HASH'}],
+        AttributeDefinitions=[{'AttributeName': name, 'AttributeType': 'S'} for name in ('hash', 'userid', 'category')],
+        GlobalSecondaryIndexes=[{
+            'IndexName': 'userid-category-index',
+            'KeySchema': [{'AttributeName': 'userid', 'KeyType': 'HASH'}, {'AttributeName': 'category', 'KeyType': 'RANGE'}],
+            'Projection': {'ProjectionType': 'INCLUDE', 'NonKeyAttributes': [
+                'amount', 'need', 'split_percent', 'after_split_amount', 'partner_split_amount']},
+        }],
+        BillingMode='PAY_PER_REQUEST')
+    dynamodb.create_table(TableName='ResplitJobTable',
+                          KeySchema=[{'AttributeName': 'userid', 'KeyType': 'HASH'},
+                                     {'AttributeName': 'category', 'KeyType': 'RANGE'}],
+                          AttributeDefinitions=[{'AttributeName': 'userid', 'AttributeType': 'S'},
+                                                {'AttributeName': 'category', 'AttributeType': 'S'}],
+                          BillingMode='PAY_PER_REQUEST')
+
+
+def test_rule_change_resplits_transactions_across_invocations(monkeypatch):
+    with mock_aws():
+        dynamodb = boto3.resource('dynamodb')
+        create_resplit_tables(dynamodb)
+        transactions = dynamodb.Table('TransactionSplitTable')
+        # Ingested under the 50% Groceries rule, with the rollups ingest would have written
+        ingested = RollupDeltas()
+        for i in range(30):
+            amount = Decimal('-10.00') if i else Decimal('12.00')
+            item = dict(transaction(f'h{i:02d}', amount, status='reviewed' if i < 5 else 'pending'),
+                        need=True, split=True)
+            if amount < 0:
+                item.update(split_percent=Decimal(50), after_split_amount=amount / 2, partner_split_amount=amount / 2)
+            transactions.put_item(Item=item)
+            ingested.add(item, 1)
+        apply_deltas(dynamodb.meta.client, ingested)
+        transactions.put_item(Item=dict(transaction('other', '-8.00', category='Hobbies'), need=False))
+
+        resplit = load_lambda('resplit_transactions')
+        monkeypatch.setattr(resplit, 'WRITES_PER_SECOND', 0)
+        invoked = []
+        monkeypatch.setattr(resplit, 'continue_job', lambda context, job: invoked.append(job['run_id']))
+
+        dynamodb.Table('SplitTable').put_item(
+            Item={'userid': 'u1', 'category': 'Groceries', 'need': False, 'split_percent': Decimal(100)})
+        event = {'userid': 'u1', 'category': 'Groceries'}
+
+        # Short on time after the first page, so the job checkpoints and hands over
+        result = resplit.lambda_handler(event, FakeContext(remaining_ms=1000))
+        assert (result['status'], result['processed']) == ('continued', resplit.PAGE_SIZE)
+        # A stale run cannot pick the job up again
+        assert resplit.lambda_handler(dict(event, run_id='stale'), FakeContext(10 ** 6))['status'] == 'skipped'
+
+        result = resplit.lambda_handler(dict(event, run_id=invoked[0]), FakeContext(10 ** 6))
+        assert result == {'status': 'done', 'processed': 30, 'updated': 30}
+        # Nothing left to do until the rule changes again
+        assert resplit.lambda_handler(event, FakeContext(10 ** 6))['status'] == 'skipped'
+
+        items = {item['hash']: item for item in transactions.scan()['Items']}
+        assert (items['h01']['after_split_amount'], items['h01']['partner_split_amount']) == (0, Decimal('-10.00'))
+        assert items['h00']['need'] is False and items['h00']['amount'] == Decimal('12.00')
+        assert items['other']['need'] is False and 'after_split_amount' not in items['other']
+
+        # Only reviewed purchases are in the rollups, and they moved from need to want
+        rows = rollup_rows(dynamodb, ROLLUP_TABLE)
+        totals = rows['2024-09#Groceries']
+        assert (totals['partner_split_amount'], totals['after_split_amount']) == (Decimal('-40'), 0)
+        assert (totals['need_amount'], totals['want_amount'], totals['count']) == (0, Decimal('-40'), 4)
+
+
+def test_update_split_table_queues_a_resplit_per_saved_category(monkeypatch):
+    with mock_aws():
+        create_tables(boto3.resource('dynamodb'))
+        update_split_table = load_lambda('update_split_table')
+        invocations = []
+        monkeypatch.setattr(update_split_table, 'RESPLIT_FUNCTION', 'resplit-transactions')
+        monkeypatch.setattr(update_split_table.lambda_client, 'invoke', lambda **kwargs: invocations.append(kwargs))
+
+        body = {'changes': [
+            {'userid': 'u1', 'category': 'Groceries', 'need': True, 'split_percent': 60},
+            {'userid': 'u1', 'category': 'Hobbies', 'need': False, 'split_percent': 0, 'action': 'add'},
+            {'userid': 'u1', 'category': 'Travel', 'need': False, 'split_percent': 50, 'action': 'add'},
+        ]}
+        response = update_split_table.lambda_handler({'httpMethod': 'POST', 'body': json.dumps(body)}, None)
+        # Adding Hobbies fails because it already exists
+        assert response['statusCode'] == 207
+
+        # Only the written rules are re-split
+        assert sorted(json.loads(call['Payload'])['category'] for call in invocations) == ['Groceries', 'Travel']
+        assert all(call['InvocationType'] == 'Event' for call in invocations)
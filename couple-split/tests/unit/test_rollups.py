@@ -0,0 +1,245 @@
+import importlib.util
+import json
+import os
+import random
+import sys
+from datetime import timedelta
+from decimal import Decimal
+
+import boto3
+from botocore.exceptions import ClientError
+from moto import mock_aws
+
+import dynamodb_utils
+from ledger import LEDGER_EPOCH, LEDGER_TABLE, day_index, ledger_totals, range_coefficients
+from rollups import ROLLUP_TABLE, TOTAL_FIELDS, VENDOR_ROLLUP_TABLE, RollupDeltas, apply_deltas, contributions
+
+LAMBDA_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'lambda')
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'scripts'))
+
+import rebuild_rollups  # noqa: E402
+import reconcile_ledger  # noqa: E402
+
+
+def load_lambda(name):
+    # Every Lambda is a lambda_function.py module, so load each one under its own name
+    spec = importlib.util.spec_from_file_location(name, os.path.join(LAMBDA_DIR, name, 'lambda_function.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def create_tables(dynamodb):
+    dynamodb.create_table(TableName='TransactionSplitTable', KeySchema=[{'AttributeName': 'hash', 'KeyType': 'HASH'}],
+                          AttributeDefinitions=[{'AttributeName': 'hash', 'AttributeType': 'S'}],
+                          BillingMode='PAY_PER_REQUEST')
+    for name, sort_key in (('SplitTable', 'category'), (ROLLUP_TABLE, 'month_category'),
+                           (VENDOR_ROLLUP_TABLE, 'category_month_vendor'), (LEDGER_TABLE, 'node')):
+        dynamodb.create_table(TableName=name,
+                              KeySchema=[{'AttributeName': 'userid', 'KeyType': 'HASH'},
+                                         {'AttributeName': sort_key, 'KeyType': 'RANGE'}],
+                              AttributeDefinitions=[{'AttributeName': 'userid', 'AttributeType': 'S'},
+                                                    {'AttributeName': sort_key, 'AttributeType': 'S'}],
+                              BillingMode='PAY_PER_REQUEST')
+    split_table = dynamodb.Table('SplitTable')
+    split_table.put_item(Item={'userid': 'u1', 'category': 'Groceries', 'need': True, 'split_percent': Decimal(50)})
+    split_table.put_item(Item={'userid': 'u1', 'category': 'Hobbies', 'need': False, 'split_percent': Decimal(100)})
+
+
+def transaction(hash, amount, status='pending', category='Groceries', date='2024-09-10', description='SHOP'):
+    return {'hash': hash, 'userid': 'u1', 'transaction_date': date, 'category': category,
+            'amount': Decimal(amount), 'status': status, 'userid_status': f'u1#{status}',
+            'description': description}
+
+
+def rollup_rows(dynamodb, table_name=ROLLUP_TABLE, sort_key='month_category'):
+    return {item[sort_key]: item for item in dynamodb.Table(table_name).scan()['Items']}
+
+
+def test_only_reviewed_purchases_are_counted():
+    assert contributions(transaction('a', '-10.00')) == []
+    assert contributions(transaction('a', '5.00', status='reviewed')) == []
+
+    item = dict(transaction('a', '-10.00', status='reviewed', category=None, description='SQ *BLUE BOTTLE 0042'),
+                after_split_amount=Decimal('-5.00'), partner_split_amount=Decimal('-5.00'), need=False)
+    (_, userid, key, totals), (_, _, vendor_key, _), *ledger_rows = contributions(item)
+    assert (userid, key) == ('u1', '2024-09#Misc')
+    # Items stored before vendors existed get one from their description
+    assert vendor_key == 'Misc#2024-09#Blue Bottle'
+    # Only transactions marked to be split count towards what the partner owes
+    assert totals['partner_split_amount'] == 0
+    assert (totals['want_amount'], totals['need_amount'], totals['count']) == (Decimal('-10.00'), 0, 1)
+    # The day's ledger nodes carry the same totals
+    assert {row[0] for row in ledger_rows} == {LEDGER_TABLE} and all(row[3] == totals for row in ledger_rows)
+
+    deltas = RollupDeltas()
+    deltas.change(item, item)
+    assert list(deltas.items()) == []
+
+
+def test_batch_write_reports_only_accepted_items(monkeypatch):
+    class PartialDynamoDB:
+        def __init__(self):
+            self.calls = 0
+
+        def batch_write_item(self, RequestItems):
+            (table_name, requests), = RequestItems.items()
+            self.calls += 1
+            return {'UnprocessedItems': {table_name: requests[:2]} if self.calls == 1 else {}}
+
+    monkeypatch.setattr(dynamodb_utils.time, 'sleep', lambda _: None)
+    written = []
+    items = [{'hash': str(i)} for i in range(5)]
+    dynamodb_utils.batch_write_items('TransactionSplitTable', items, dynamodb=PartialDynamoDB(), on_written=written.append)
+
+    assert written == [items[2:], items[:2]]
+
+
+def test_bad_updates_fail_alone(monkeypatch):
+    with mock_aws():
+        dynamodb = boto3.resource('dynamodb')
+        create_tables(dynamodb)
+        transactions = dynamodb.Table('TransactionSplitTable')
+        for hash in ('a', 'b', 'c'):
+            transactions.put_item(Item=transaction(hash, '-10.00'))
+        update_transactions = load_lambda('update_transactions')
+
+        query = update_transactions.split_table.query
+
+        def flaky_query(**kwargs):
+            if kwargs['KeyConditionExpression'].get_expression()['values'][1] == 'u2':
+                raise ClientError({'Error': {'Code': 'ProvisionedThroughputExceededException', 'Message': 'slow down'}},
+                                  'Query')
+            return query(**kwargs)
+        monkeypatch.setattr(update_transactions.split_table, 'query', flaky_query)
+
+        body = [{'hash': 'a', 'userid': 'u1', 'status': 'reviewed', 'split': 'yes', 'category': 'Groceries', 'amount': -10.0},
+                # A string amount from the client and a user whose split rules cannot be read
+                {'hash': 'b', 'userid': 'u1', 'status': 'reviewed', 'split': 'yes', 'category': 'Groceries', 'amount': '-10'},
+                {'hash': 'c', 'userid': 'u2', 'status': 'reviewed', 'split': 'yes', 'category': 'Groceries', 'amount': -10.0}]
+        response = update_transactions.lambda_handler({'httpMethod': 'POST', 'body': json.dumps(body)}, None)
+
+        assert response['statusCode'] == 207
+        result = json.loads(response['body'])
+        assert result['updated'] == ['a']
+        assert sorted(failure['hash'] for failure in result['failed']) == ['b', 'c']
+        assert transactions.get_item(Key={'hash': 'b'})['Item']['status'] == 'pending'
+
+
+def test_rollups_follow_reviews_and_match_a_rebuild():
+    with mock_aws():
+        dynamodb = boto3.resource('dynamodb')
+        create_tables(dynamodb)
+        transactions = dynamodb.Table('TransactionSplitTable')
+        for item in [transaction('a', '-10.00', description='AMZN Mktp US*2K3'), transaction('b', '-30.00'),
+                     transaction('c', '-4.00', date='2024-10-02'),
+                     dict(transaction('d', '-6.00', description='Amazon.com'), vendor='Amazon')]:
+            transactions.put_item(Item=item)
+        update_transactions = load_lambda('update_transactions')
+        fetch_summary = load_lambda('fetch_summary')
+        fetch_category_details = load_lambda('fetch_category_details')
+
+        def review(updates):
+            body = [dict(update, userid='u1', status='reviewed') for update in updates]
+            response = update_transactions.lambda_handler({'httpMethod': 'POST', 'body': json.dumps(body)}, None)
+            assert response['statusCode'] == 200
+
+        review([{'hash': 'a', 'split': 'yes', 'category': 'Groceries', 'amount': -10.0},
+                {'hash': 'b', 'split': 'no', 'category': 'Hobbies', 'amount': -30.0},
+                {'hash': 'c', 'split': 'yes', 'category': 'Groceries', 'amount': -4.0},
+                {'hash': 'd', 'split': 'no', 'category': 'Groceries', 'amount': -6.0}])
+        # Sending the same review again leaves the totals alone, a new category moves the transaction
+        review([{'hash': 'a', 'split': 'yes', 'category': 'Groceries', 'amount': -10.0}])
+        review([{'hash': 'c', 'split': 'yes', 'category': 'Hobbies', 'amount': -4.0}])
+
+        rows = rollup_rows(dynamodb)
+        assert rows['2024-09#Groceries']['amount'] == Decimal('-16')
+        assert rows['2024-09#Groceries']['partner_split_amount'] == Decimal('-5')
+        assert rows['2024-09#Hobbies']['need_amount'] == 0
+        assert rows['2024-10#Groceries']['count'] == 0
+        assert rows['2024-10#Hobbies']['after_split_amount'] == Decimal('-4')
+
+        response = fetch_summary.lambda_handler({'httpMethod': 'GET', 'queryStringParameters': {
+            'userid': 'u1', 'startMonth': '2024-09', 'endMonth': '2024-09'}}, None)
+        summary = json.loads(response['body'])
+        assert summary['totals']['amount'] == -46
+        assert set(summary['categories']) == {'Groceries', 'Hobbies'}
+
+        # Both Amazon descriptions land on one vendor, largest spend first
+        response = fetch_category_details.lambda_handler({'httpMethod': 'GET', 'queryStringParameters': {
+            'userid': 'u1', 'category': 'Groceries', 'startMonth': '2024-09', 'endMonth': '2024-10'}}, None)
+        vendors = json.loads(response['body'])['vendors']
+        assert [(vendor['vendor'], vendor['amount'], vendor['count']) for vendor in vendors] == [('Amazon', -16, 2)]
+
+        # A rebuild from the transactions gives the same totals and drops the emptied rows
+        vendor_rows = rollup_rows(dynamodb, VENDOR_ROLLUP_TABLE, 'category_month_vendor')
+        rollup_tables = [dynamodb.Table(ROLLUP_TABLE), dynamodb.Table(VENDOR_ROLLUP_TABLE)]
+        assert rebuild_rollups.rebuild(transactions, rollup_tables) == {'scanned': 4, 'written': 6, 'deleted': 2}
+        fields = ['amount', 'after_split_amount', 'partner_split_amount', 'need_amount', 'want_amount', 'count']
+        for table_name, sort_key, before in ((ROLLUP_TABLE, 'month_category', rows),
+                                             (VENDOR_ROLLUP_TABLE, 'category_month_vendor', vendor_rows)):
+            rebuilt = rollup_rows(dynamodb, table_name, sort_key)
+            assert {key: [row[field] for field in fields] for key, row in rebuilt.items()} == \
+                {key: [row[field] for field in fields] for key, row in before.items() if row['count']}
+
+
+def test_range_nodes_sum_to_the_days_in_range():
+    rng = random.Random(7)
+    amounts = {rng.randrange(8000, 9500): rng.randrange(-500, 0) for _ in range(200)}
+    # Build the tree in memory the same way the ledger rows are written
+    nodes = {}
+    for day, amount in amounts.items():
+        deltas = RollupDeltas()
+        deltas.add(dict(transaction('x', amount, status='reviewed', date=str(LEDGER_EPOCH + timedelta(days=day))),
+                        after_split_amount=Decimal(amount), need=True), 1)
+        for table_name, _, node, delta in deltas.items():
+            if table_name == LEDGER_TABLE:
+                nodes[node] = nodes.get(node, 0) + delta['amount']
+
+    for start, end in [(None, '2024-01-01'), ('2022-03-04', '2025-06-30'), ('2030-01-01', None), (None, None)]:
+        expected = sum(amount for day, amount in amounts.items()
+                       if (start is None or day >= day_index(start)) and (end is None or day <= day_index(end)))
+        coefficients = range_coefficients(start, end)
+        assert len(coefficients) <= 30
+        assert sum(nodes.get(node, 0) * sign for node, sign in coefficients.items()) == expected
+
+
+def test_settlement_follows_reviews_and_reconciles():
+    with mock_aws():
+        dynamodb = boto3.resource('dynamodb')
+        create_tables(dynamodb)
+        transactions = dynamodb.Table('TransactionSplitTable')
+        for item in [transaction('a', '-10.00'), transaction('b', '-30.00', date='2024-09-20'),
+                     transaction('c', '-4.00', date='2024-10-02')]:
+            transactions.put_item(Item=item)
+        update_transactions = load_lambda('update_transactions')
+        fetch_settlement = load_lambda('fetch_settlement')
+
+        body = [{'hash': 'a', 'userid': 'u1', 'status': 'reviewed', 'split': 'yes', 'category': 'Groceries', 'amount': -10.0},
+                {'hash': 'b', 'userid': 'u1', 'status': 'reviewed', 'split': 'yes', 'category': 'Groceries', 'amount': -30.0},
+                {'hash': 'c', 'userid': 'u1', 'status': 'reviewed', 'split': 'no', 'category': 'Groceries', 'amount': -4.0}]
+        response = update_transactions.lambda_handler({'httpMethod': 'POST', 'body': json.dumps(body)}, None)
+        assert response['statusCode'] == 200
+
+        def settlement(**params):
+            response = fetch_settlement.lambda_handler(
+                {'httpMethod': 'GET', 'queryStringParameters': dict(params, userid='u1')}, None)
+            return response['statusCode'], json.loads(response['body'])
+
+        assert settlement()[1]['partner_owes'] == 20
+        assert settlement(asOf='2024-09-15')[1]['partner_owes'] == 5
+        status, body = settlement(startDate='2024-09-15', endDate='2024-10-31')
+        assert (body['partner_owes'], body['totals']['amount'], body['totals']['count']) == (15, -34, 2)
+        assert settlement(startDate='2024-10-01', endDate='2024-09-01')[0] == 400
+
+        ledger_table = dynamodb.Table(LEDGER_TABLE)
+        assert reconcile_ledger.reconcile(transactions, ledger_table)['mismatches'] == []
+
+        # A lost update leaves the ledger off until --fix rewrites the nodes from the transactions
+        lost = RollupDeltas()
+        lost.add(transactions.get_item(Key={'hash': 'a'})['Item'], -1)
+        apply_deltas(dynamodb.meta.client, lost)
+        result = reconcile_ledger.reconcile(transactions, ledger_table, fix=True)
+        assert result['mismatches'] and {problem for _, problem in result['mismatches']} == {'different'}
+        assert reconcile_ledger.reconcile(transactions, ledger_table)['mismatches'] == []
+        assert ledger_totals(dynamodb, 'u1', TOTAL_FIELDS)['partner_split_amount'] == -20
@@ -0,0 +1,33 @@
+import json
+from decimal import Decimal
+
+from serialization import json_response, to_json
+
+
+def test_decimals_keep_their_exact_digits():
+    item = {'amount': Decimal('-12.30'), 'split_percent': Decimal('50'), 'big': Decimal('12345678901234567.89')}
+    body = to_json(item)
+
+    assert body == '{"amount":-12.30,"split_percent":50,"big":12345678901234567.89}'
+    assert json.loads(body, parse_float=Decimal) == item
+
+
+def test_matches_json_for_plain_values():
+    body = {'items': [{'description': 'Café "Bar"\n', 'split': None, 'need': True, 'tags': ('a', 1, 2.5)}],
+            'next_cursor': None, 'count': 3}
+
+    assert json.loads(to_json(body)) == json.loads(json.dumps(body))
+    assert to_json('Error: userid is required') == json.dumps('Error: userid is required')
+
+
+def test_sets_become_lists():
+    assert to_json({'values': {Decimal('2'), Decimal('1')}}) == '{"values":[1,2]}'
+
+
+def test_json_response_envelope():
+    response = json_response(400, {'error': 'bad'}, methods='GET, OPTIONS')
+
+    assert response['statusCode'] == 400
+    assert response['headers']['Access-Control-Allow-Origin'] == '*'
+    assert response['headers']['Access-Control-Allow-Methods'] == 'GET, OPTIONS'
+    assert json.loads(response['body']) == {'error': 'bad'}
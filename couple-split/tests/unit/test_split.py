@@ -0,0 +1,47 @@
+from decimal import Decimal
+
+from split import SplitIndex, split_percent
+
+ROWS = [
+    {'userid': 'user1', 'category': 'Groceries', 'need': True, 'split_percent': Decimal('60')},
+    {'userid': 'user1', 'category': 'Hobbies', 'need': False, 'split_percent': Decimal('0')},
+    {'userid': 'user1', 'category': 'Rent', 'need': True, 'split_percent': Decimal('100')},
+]
+
+
+def transaction(category, amount):
+    return {'userid': 'user1', 'category': category, 'amount': Decimal(amount)}
+
+
+def test_resolve_fills_split_amounts_for_a_batch():
+    index = SplitIndex(ROWS)
+
+    groceries, hobbies, rent = index.resolve([
+        transaction('Groceries', '-10.00'),
+        transaction('Hobbies', '-4.00'),
+        transaction('Rent', '-1000.00'),
+    ])
+
+    assert (groceries['after_split_amount'], groceries['partner_split_amount']) == (Decimal('-6.0000'), Decimal('-4.0000'))
+    assert (hobbies['after_split_amount'], hobbies['partner_split_amount']) == (Decimal('-4.00'), 0)
+    assert (rent['after_split_amount'], rent['partner_split_amount']) == (0, Decimal('-1000.00'))
+    assert [item['need'] for item in (groceries, hobbies, rent)] == [True, False, True]
+
+
+def test_refunds_unknown_and_missing_categories():
+    index = SplitIndex(ROWS)
+
+    refund = index.apply(transaction('Groceries', '5.00'))
+    unknown = index.apply(transaction('Travel', '-5.00'))
+    uncategorized = index.apply({'userid': 'user1', 'amount': Decimal('-5.00')})
+
+    assert refund['need'] is True and 'split_percent' not in refund
+    assert 'need' not in unknown and 'split_percent' not in unknown
+    assert uncategorized['split_percent'] == 0
+
+
+def test_split_percent_accepts_raw_rows():
+    item = split_percent(transaction('Groceries', '-10.00'), ROWS)
+
+    assert item['split_percent'] == Decimal('60')
+    assert item['after_split_amount'] == Decimal('-10.00') * (Decimal('60') / 100)
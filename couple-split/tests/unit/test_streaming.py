@@ -0,0 +1,166 @@
+import hashlib
+import io
+import json
+from decimal import Decimal
+import tracemalloc
+
+import boto3
+from moto import mock_aws
+
+import aws_clients
+import dynamodb_utils
+import lambda_function
+from split import SplitIndex
+from lambda_function import csv_read_options, read_csv_frames
+from mapping_configurations import mapping_configs
+from utils import iter_s3_chunks, open_csv_stream
+
+import pandas as pd
+
+from tests.unit.test_concurrent_records import BUCKET, create_tables, record
+
+CHASE_HEADER = b'Transaction Date,Post Date,Description,Category,Type,Amount,Memo\n'
+
+# Peak traced memory allowed for the whole parse -> normalize -> split -> write pipeline
+MEMORY_BUDGET_BYTES = 16 * 1024 * 1024
+
+
+class GeneratedBody:
+    """ S3 StreamingBody stand-in that produces rows on demand instead of holding the file """
+
+    def __init__(self, rows):
+        self._lines = self._generate(rows)
+        self._pending = b''
+
+    @staticmethod
+    def _generate(rows):
+        yield CHASE_HEADER
+        for i in range(rows):
+            yield f'09/{i % 28 + 1:02d}/2024,09/{i % 28 + 1:02d}/2024,VENDOR {i},Groceries,Sale,-{i % 9000 + 1}.25,\n'.encode()
+
+    def read(self, amt):
+        while len(self._pending) < amt:
+            line = next(self._lines, None)
+            if line is None:
+                break
+            self._pending += line
+        chunk, self._pending = self._pending[:amt], self._pending[amt:]
+        return chunk
+
+
+class GeneratedS3:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def get_object(self, Bucket, Key):
+        return {'Body': GeneratedBody(self.rows)}
+
+
+class DiscardingDynamoDB:
+    def __init__(self):
+        self.written = 0
+
+    def batch_write_item(self, RequestItems):
+        (requests,) = RequestItems.values()
+        self.written += len(requests)
+        return {'UnprocessedItems': {}}
+
+
+def run_pipeline(rows):
+    s3 = GeneratedS3(rows)
+    dynamodb = DiscardingDynamoDB()
+    split_index = SplitIndex([{'userid': 'user1', 'category': 'Groceries', 'need': True, 'split_percent': Decimal('50')}])
+
+    first_line, stream = open_csv_stream(s3, 'bucket', 'input_csv/user1_statement.csv')
+    header, read_options = csv_read_options(pd.read_csv(io.BytesIO(first_line), nrows=0).columns.tolist())
+    frames = read_csv_frames(stream, read_options, chunk_rows=2000)
+    items = dynamodb_utils.iter_items(frames, mapping_configs['chase_credit'], 'user1', split_index)
+    summary = dynamodb_utils.batch_write_items('TransactionSplitTable', items, dynamodb=dynamodb)
+    return summary, dynamodb.written
+
+
+def peak_memory(rows):
+    tracemalloc.start()
+    try:
+        summary, written = run_pipeline(rows)
+        return tracemalloc.get_traced_memory()[1], summary, written
+    finally:
+        tracemalloc.stop()
+
+
+def test_streaming_hash_matches_buffered_hash():
+    s3 = GeneratedS3(500)
+    md5 = hashlib.md5()
+    content = b''.join(iter_s3_chunks(s3, 'bucket', 'key', chunk_bytes=1000, hasher=md5))
+
+    assert md5.hexdigest() == hashlib.md5(content).hexdigest()
+
+
+def test_streaming_ingest_stays_within_memory_budget():
+    small_peak, _, _ = peak_memory(5000)
+    large_peak, summary, written = peak_memory(50000)
+
+    assert written == 50000
+    assert summary['failed'] == 0
+    assert large_peak < MEMORY_BUDGET_BYTES
+    # Ten times the rows must not mean meaningfully more memory
+    assert large_peak < small_peak * 1.5
+
+
+def test_buffered_and_streamed_uploads_share_row_keys(monkeypatch):
+    # Blank cells in the numeric Reference column must not change how the other rows fingerprint
+    rows = ''.join(f'09/{i % 28 + 1:02d}/2024,{"" if i % 10 == 0 else 24000000 + i},SHOP {i},-{i}.25\n'
+                   for i in range(1, 60))
+    statement = 'Date,Reference,Description,Amount\n' + rows
+    # The overlapping export repeats every row and adds one, so its file hash differs
+    overlapping = statement + '09/30/2024,24999999,LATE SHOP,-1.00\n'
+
+    monkeypatch.setattr(aws_clients, '_clients', {})
+    with mock_aws():
+        dynamodb = boto3.resource('dynamodb')
+        create_tables(dynamodb)
+        s3 = boto3.client('s3')
+        s3.create_bucket(Bucket=BUCKET)
+        table = dynamodb.Table('TransactionSplitTable')
+
+        monkeypatch.setattr(lambda_function, 'STREAMING_THRESHOLD_BYTES', 10 ** 9)
+        s3.put_object(Bucket=BUCKET, Key='input_csv/u1_buffered.csv', Body=statement.encode())
+        lambda_function.lambda_handler({'Records': [record('input_csv/u1_buffered.csv')]}, None)
+        buffered_keys = {item['hash'] for item in table.scan()['Items']}
+
+        monkeypatch.setattr(lambda_function, 'STREAMING_THRESHOLD_BYTES', 0)
+        s3.put_object(Bucket=BUCKET, Key='input_csv/u1_streamed.csv', Body=overlapping.encode())
+        lambda_function.lambda_handler({'Records': [record('input_csv/u1_streamed.csv')]}, None)
+        all_keys = {item['hash'] for item in table.scan()['Items']}
+
+    assert len(buffered_keys) == 59
+    # Only the added row is new, every repeated row was skipped as existing
+    assert len(all_keys) == 60 and buffered_keys < all_keys
+
+
+def test_streamed_duplicate_without_etag_md5_is_rejected_before_parsing(monkeypatch):
+    statement = CHASE_HEADER.decode() + ''.join(
+        f'09/{i % 28 + 1:02d}/2024,09/02/2024,SHOP {i},Groceries,Sale,-{i}.25,\n' for i in range(100))
+    # As for multipart or KMS-encrypted uploads, whose ETag is not the content MD5
+    read_first_line = lambda_function.read_first_line
+    monkeypatch.setattr(lambda_function, 'read_first_line', lambda *args: (read_first_line(*args)[0], None))
+    monkeypatch.setattr(lambda_function, 'STREAMING_THRESHOLD_BYTES', 0)
+    monkeypatch.setattr(aws_clients, '_clients', {})
+    with mock_aws():
+        create_tables(boto3.resource('dynamodb'))
+        s3 = boto3.client('s3')
+        s3.create_bucket(Bucket=BUCKET)
+        s3.put_object(Bucket=BUCKET, Key='input_csv/u1_first.csv', Body=statement.encode())
+        s3.put_object(Bucket=BUCKET, Key='input_csv/u1_again.csv', Body=statement.encode())
+
+        response = lambda_function.lambda_handler({'Records': [record('input_csv/u1_first.csv')]}, None)
+        assert json.loads(response['body'])['results'][0]['status'] == 'processed'
+
+        parsed = []
+        monkeypatch.setattr(lambda_function, 'read_frames', lambda *args: parsed.append(args))
+        response = lambda_function.lambda_handler({'Records': [record('input_csv/u1_again.csv')]}, None)
+
+    result, = json.loads(response['body'])['results']
+    assert result['status'] == 'duplicate'
+    assert result['hash'] == hashlib.md5(statement.encode()).hexdigest()
+    assert parsed == []
@@ -0,0 +1,24 @@
+import pytest
+
+from vendors import UNKNOWN_VENDOR, vendor_key
+
+
+@pytest.mark.parametrize('description, vendor', [
+    ('AMZN Mktp US*2K3LL1', 'Amazon'),
+    ('Amazon.com', 'Amazon'),
+    ('TARGET 00012345 SEATTLE WA', 'Target'),
+    ('WM SUPERCENTER #1234', 'Walmart'),
+    ('UBER *EATS PENDING', 'Uber Eats'),
+    ('SQ *BLUE BOTTLE COFFEE', 'Blue Bottle Coffee'),
+    ('TST* SUSHI BAR - SF', 'Sushi Bar'),
+    ("TRADER JOE'S #552 SEATTLE WA", "Trader Joe's"),
+    ('SHELL OIL 57444 HOUSTON TX', 'Shell Oil'),
+    ('  chipotle   1234 ', 'Chipotle'),
+])
+def test_descriptions_group_under_one_vendor(description, vendor):
+    assert vendor_key(description) == vendor
+
+
+def test_missing_descriptions_are_unknown():
+    # pandas and the stdlib engine both write missing cells as the text 'nan'
+    assert vendor_key('nan') == vendor_key('') == vendor_key(None) == vendor_key('#123') == UNKNOWN_VENDOR
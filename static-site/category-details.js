@@ -15,14 +15,50 @@ function getCategoryTransactions() {
     const categoryData = localStorage.getItem('categoryData');
     if (categoryData) {
         data = JSON.parse(categoryData);
-        updateVendorChart(data);
         populateTransactionsTable(data);
+        if (getQueryParameter('rollup')) {
+            // Per-vendor totals are computed at ingest time, fall back to the local rows if the API fails
+            fetchVendorTotals()
+                .then(vendors => updateVendorChart(vendors.map(vendor => [vendor.vendor, Math.abs(vendor.amount)])))
+                .catch(error => {
+                    console.error("Error fetching vendor totals:", error);
+                    updateVendorChart(sortedVendorTotals(data));
+                });
+        } else {
+            updateVendorChart(sortedVendorTotals(data));
+        }
     } else {
         console.error("No category data found in localStorage.");
         alert("No data available for the selected category.");
     }
 }
 
+// Vendor totals for the category and months from the server, already sorted by amount
+async function fetchVendorTotals() {
+    const userId = localStorage.getItem('userId');
+    let apiUrl = `https://ID.execute-api.us-east-1.amazonaws.com/Prod/fetch-category-details?userid=${encodeURIComponent(userId)}&category=${encodeURIComponent(category)}`;
+    const startMonth = getQueryParameter('startMonth');
+    const endMonth = getQueryParameter('endMonth');
+    if (startMonth) {
+        apiUrl += `&startMonth=${encodeURIComponent(startMonth)}`;
+    }
+    if (endMonth) {
+        apiUrl += `&endMonth=${encodeURIComponent(endMonth)}`;
+    }
+
+    const response = await fetch(apiUrl, {
+        method: 'GET',
+        headers: {
+            'Content-Type': 'application/json'
+        }
+    });
+    if (!response.ok) {
+        throw new Error(`HTTP error! status: ${response.status}`);
+    }
+    const result = await response.json();
+    return result.vendors;
+}
+
 // Consolidate similar vendor names
 function consolidateVendors(transactions) {
     const vendorMapping = {};
@@ -63,13 +99,13 @@ function consolidateVendors(transactions) {
     return vendorMapping;
 }
 
-// Update the vendor bar chart
-function updateVendorChart(data) {
-    const vendorData = consolidateVendors(data);
-
-    // Sort vendors by amount from most to least
-    const sortedVendors = Object.entries(vendorData).sort((a, b) => b[1] - a[1]);
+// Sort vendors by amount from most to least
+function sortedVendorTotals(transactions) {
+    return Object.entries(consolidateVendors(transactions)).sort((a, b) => b[1] - a[1]);
+}
 
+// Update the vendor bar chart from [vendor, amount] pairs
+function updateVendorChart(sortedVendors) {
     // Truncate vendor labels if they are too long
     const maxLabelLength = 15; // Adjust this value as needed
     const vendorLabels = sortedVendors.map(entry => {
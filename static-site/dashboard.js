@@ -1,6 +1,11 @@
 // Global variable to store fetched data
 let dashboardData = []; // Make sure this is accessible in your script
 
+// When the rollups cover the charts the table is read a page at a time instead of all at once
+const TABLE_PAGE_SIZE = 100;
+let tableUrl = null;
+let tableCursor = null;
+
 // Initialize date selector and report fetch function
 async function fetchReport() {
     const userId = localStorage.getItem('userId');  // Get User ID from localStorage
@@ -26,7 +31,25 @@ async function fetchReport() {
         apiUrl += `&csvEndDate=${encodeURIComponent(csvEndDate)}`;
     }
 
+    // Charts and totals come from the monthly rollups when the range allows it
+    const months = rollupMonths(transactionStartDate, transactionEndDate, csvStartDate, csvEndDate);
+    const summaryRequest = months ? fetchSummary(userId, months) : null;
+
     try {
+        if (summaryRequest) {
+            // Totals come from the rollups, so only the first page of the table is loaded now
+            tableUrl = apiUrl;
+            tableCursor = null;
+            dashboardData = [];
+            await loadTablePage();
+            applySummary(await summaryRequest);
+            return;
+        }
+
+        // Without rollups the charts need every transaction in the range
+        tableUrl = null;
+        tableCursor = null;
+        document.getElementById('loadMoreTransactions').style.display = 'none';
         const response = await fetch(apiUrl, {
             method: 'GET',
             headers: {
@@ -49,6 +72,94 @@ async function fetchReport() {
     }
 }
 
+// Append the next page of transactions from the paged fetch-transactions API to the table
+async function loadTablePage() {
+    let pageUrl = `${tableUrl}&limit=${TABLE_PAGE_SIZE}`;
+    if (tableCursor) {
+        pageUrl += `&cursor=${encodeURIComponent(tableCursor)}`;
+    }
+
+    const response = await fetch(pageUrl, {
+        method: 'GET',
+        headers: {
+            'Content-Type': 'application/json'
+        }
+    });
+    if (!response.ok) {
+        throw new Error(`HTTP error! status: ${response.status}`);
+    }
+
+    const data = await response.json();
+    dashboardData = dashboardData.concat(data.items);
+    tableCursor = data.next_cursor;
+    populateTransactionsTable(dashboardData);
+    document.getElementById('loadMoreTransactions').style.display = tableCursor ? 'inline-block' : 'none';
+}
+
+async function loadMoreTransactions() {
+    try {
+        await loadTablePage();
+    } catch (error) {
+        console.error("Error loading more transactions:", error);
+        alert("Failed to load more transactions. Please try again.");
+    }
+}
+
+// Rollups are kept per month and ignore the CSV upload date, so only whole-month ranges use them
+function rollupMonths(startDate, endDate, csvStartDate, csvEndDate) {
+    if (csvStartDate || csvEndDate) {
+        return null;
+    }
+    if (startDate && !startDate.endsWith('-01')) {
+        return null;
+    }
+    if (endDate) {
+        const [year, month, day] = endDate.split('-').map(Number);
+        if (day !== new Date(year, month, 0).getDate()) {
+            return null;
+        }
+    }
+    return {
+        startMonth: startDate ? startDate.slice(0, 7) : null,
+        endMonth: endDate ? endDate.slice(0, 7) : null
+    };
+}
+
+async function fetchSummary(userId, months) {
+    let apiUrl = `https://ID.execute-api.us-east-1.amazonaws.com/Prod/fetch-summary?userid=${encodeURIComponent(userId)}`;
+    if (months.startMonth) {
+        apiUrl += `&startMonth=${encodeURIComponent(months.startMonth)}`;
+    }
+    if (months.endMonth) {
+        apiUrl += `&endMonth=${encodeURIComponent(months.endMonth)}`;
+    }
+
+    const response = await fetch(apiUrl, {
+        method: 'GET',
+        headers: {
+            'Content-Type': 'application/json'
+        }
+    });
+    if (!response.ok) {
+        throw new Error(`HTTP error! status: ${response.status}`);
+    }
+    return response.json();
+}
+
+// Same charts and totals as updateCharts and updateSummary, from the summary API
+function applySummary(summary) {
+    const categoryLabels = Object.keys(summary.categories);
+    expensePieChart.data.labels = categoryLabels;
+    expensePieChart.data.datasets[0].data = categoryLabels.map(category => Math.abs(summary.categories[category].amount));
+    expensePieChart.update();
+
+    needsWantsBarChart.data.datasets[0].data = [Math.abs(summary.totals.need_amount), Math.abs(summary.totals.want_amount)];
+    needsWantsBarChart.update();
+
+    document.getElementById('partnerOwes').textContent = Math.abs(summary.totals.partner_split_amount).toFixed(2);
+    document.getElementById('youOwe').textContent = Math.abs(summary.totals.after_split_amount).toFixed(2);
+}
+
 function updateCharts(data) {
     // Extract categories and amounts for the pie chart
     const categories = {};
@@ -213,8 +324,24 @@ const expensePieChart = new Chart(expensePieChartCtx, {
                 // Store the category data in localStorage
                 localStorage.setItem('categoryData', JSON.stringify(categoryData));
 
-                // Open the new page with the selected category
-                window.open(`category-details.html?category=${encodeURIComponent(category)}`, '_blank');
+                // Open the new page with the selected category, vendor totals come from the rollups when possible
+                let detailsUrl = `category-details.html?category=${encodeURIComponent(category)}`;
+                const months = rollupMonths(
+                    document.getElementById('transactionStartDate').value,
+                    document.getElementById('transactionEndDate').value,
+                    document.getElementById('csvStartDate').value,
+                    document.getElementById('csvEndDate').value
+                );
+                if (months) {
+                    detailsUrl += '&rollup=1';
+                    if (months.startMonth) {
+                        detailsUrl += `&startMonth=${encodeURIComponent(months.startMonth)}`;
+                    }
+                    if (months.endMonth) {
+                        detailsUrl += `&endMonth=${encodeURIComponent(months.endMonth)}`;
+                    }
+                }
+                window.open(detailsUrl, '_blank');
             }
         }
     }
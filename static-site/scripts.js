@@ -3,12 +3,17 @@ const apiUrlFetch = 'https://ID.execute-api.us-east-1.amazonaws.com/Prod/fetch-t
 const apiUrlUpdate = 'https://ID.execute-api.us-east-1.amazonaws.com/Prod/update-transactions';
 
 let transactionsPerPage = 10; // Default items per page
+let showAllTransactions = false; // 'All' fetches every page at once instead of one page per request
 let currentPage = 1;
 let totalItems = 0;
 let totalPages = 0;
 
+let pageCursors = [null]; // Cursor that starts each page, the first page has no cursor
+let nextCursor = null; // Cursor for the page after the current one, null on the last page
+
 let groupedTransactions = {}; // Store transactions grouped by mapping_config_name
-let allTransactions = []; // Store all fetched transactions locally
+let allTransactions = []; // Store the transactions on the current page
+let knownTransactions = {}; // Every transaction loaded so far, keyed by hash
 
 let splitCategories = []; // Store fetched split categories locally
 let changedItems = {}; // Object to store changed transactions
@@ -25,8 +30,16 @@ function toggleFetchButton() {
     fetchButton.disabled = !statusSelect;  // Enable the button if a valid status is selected
 }
 
-// Fetch pending or reviewed transactions with optional date range
+// Fetch pending or reviewed transactions with optional date range, starting from the first page
 async function fetchTransactions() {
+    pageCursors = [null];
+    nextCursor = null;
+    knownTransactions = {};
+    await loadPage(1);
+}
+
+// Load a single page of transactions from the API using the cursor that starts it
+async function loadPage(page) {
     const statusSelect = document.getElementById('statusSelect');
     const userId = localStorage.getItem('userId');  // Get User ID from localStorage
 
@@ -43,8 +56,13 @@ async function fetchTransactions() {
 
     let apiUrlFetchWithParams = `${apiUrlFetch}?status=${encodeURIComponent(status)}&userid=${encodeURIComponent(userId)}`;
     
-    if (startDate) apiUrlFetchWithParams += `&startDate=${encodeURIComponent(startDate)}`;
-    if (endDate) apiUrlFetchWithParams += `&endDate=${encodeURIComponent(endDate)}`;
+    if (startDate) apiUrlFetchWithParams += `&transactionStartDate=${encodeURIComponent(startDate)}`;
+    if (endDate) apiUrlFetchWithParams += `&transactionEndDate=${encodeURIComponent(endDate)}`;
+
+    if (!showAllTransactions) {
+        apiUrlFetchWithParams += `&limit=${transactionsPerPage}`;
+        if (pageCursors[page - 1]) apiUrlFetchWithParams += `&cursor=${encodeURIComponent(pageCursors[page - 1])}`;
+    }
 
     try {
         const response = await fetch(apiUrlFetchWithParams, {
@@ -58,15 +76,24 @@ async function fetchTransactions() {
             throw new Error(`HTTP error! status: ${response.status}`);
         }
 
-        const transactions = await response.json();
+        const data = await response.json();
+
+        // Paged responses are {items, next_cursor}, 'All' returns a plain array
+        const transactions = Array.isArray(data) ? data : data.items;
+        nextCursor = Array.isArray(data) ? null : data.next_cursor;
 
-        if (transactions.length === 0) {
+        if (transactions.length === 0 && page === 1) {
             document.getElementById('tablesContainer').innerHTML = "<p>No transactions available.</p>";
             return;
         }
 
+        currentPage = page;
+        pageCursors[page] = nextCursor;
         allTransactions = transactions;
-        totalItems = allTransactions.length;
+        allTransactions.forEach(transaction => knownTransactions[transaction.hash] = transaction);
+
+        totalItems = (page - 1) * transactionsPerPage + allTransactions.length;
+        totalPages = nextCursor ? pageCursors.length : page;
 
         groupedTransactions = groupByMappingConfig(allTransactions);
         await renderTables(groupedTransactions); // Await since renderTables is async
@@ -74,6 +101,7 @@ async function fetchTransactions() {
 
     } catch (error) {
         console.error('Error fetching transactions:', error);
+        nextCursor = null; // Stop walking forward on a failed page
         document.getElementById('tablesContainer').innerHTML = `<p>Error fetching transactions: ${error.message}</p>`;
     }
 }
@@ -83,41 +111,49 @@ function changeItemsPerPage() {
     const select = document.getElementById('itemsPerPageSelect');
     const customInput = document.getElementById('customItemsPerPage');
 
+    showAllTransactions = select.value === 'all';
     if (select.value === 'custom') {
         customInput.style.display = 'inline-block'; // Show custom input
         const customValue = parseInt(customInput.value, 10);
         if (customValue > 0) {
             transactionsPerPage = customValue;
         }
-    } else if (select.value === 'all') {
-        transactionsPerPage = totalItems; // Show all transactions
+    } else if (select.value !== 'all') {
+        transactionsPerPage = parseInt(select.value, 10);
         customInput.style.display = 'none'; // Hide custom input
     } else {
-        transactionsPerPage = parseInt(select.value, 10);
         customInput.style.display = 'none'; // Hide custom input
     }
 
-    currentPage = 1; // Reset to the first page
-    renderTables(groupedTransactions); // Reuse the existing groupedTransactions data
-    renderPaginationControls();
+    // Page boundaries depend on the page size, so start again from the first page
+    fetchTransactions();
 }
 
-// Fetch categories before rendering tables
+// Fetch categories before rendering tables, following the cursor until every page is loaded
 async function fetchCategories() {
     const apiUrlCategories = 'https://ID.execute-api.us-east-1.amazonaws.com/Prod/fetch-categories'; 
 
     try {
-        const response = await fetch(`${apiUrlCategories}?userid=123456789`, {
-            method: 'GET',
-            headers: {
-                'Content-Type': 'application/json'
+        const categories = [];
+        let cursor = null;
+        do {
+            let url = `${apiUrlCategories}?userid=123456789&limit=500`;
+            if (cursor) url += `&cursor=${encodeURIComponent(cursor)}`;
+
+            const response = await fetch(url, {
+                method: 'GET',
+                headers: {
+                    'Content-Type': 'application/json'
+                }
+            });
+            if (!response.ok) {
+                throw new Error(`Failed to fetch categories: ${response.status}`);
             }
-        });
-        if (!response.ok) {
-            throw new Error(`Failed to fetch categories: ${response.status}`);
-        }
-        const data = await response.json();
-        return data;  // Assume the data returned is an array of categories
+            const data = await response.json();
+            categories.push(...data.items);
+            cursor = data.next_cursor;
+        } while (cursor);
+        return categories;
     } catch (error) {
         console.error('Error fetching categories:', error);
         return [];
@@ -126,7 +162,10 @@ async function fetchCategories() {
 
 // Render tables with category selection dropdown for missing categories
 async function renderTables(groupedTransactions) {
-    splitCategories = await fetchCategories();
+    // Categories only need to be loaded once, not on every page change
+    if (splitCategories.length === 0) {
+        splitCategories = await fetchCategories();
+    }
     if (!Array.isArray(splitCategories)) {
         console.error('splitCategories is not an array:', splitCategories);
         splitCategories = [];  // Default to an empty array if fetch fails
@@ -165,9 +204,9 @@ async function renderTables(groupedTransactions) {
         `;
         const tableBody = table.querySelector('tbody');
 
-        const startIndex = (currentPage - 1) * transactionsPerPage;
-        const endIndex = startIndex + transactionsPerPage;
-        const pagedTransactions = groupedTransactions[mappingConfigName].slice(startIndex, endIndex);
+        // The API already returned just this page
+        const startIndex = showAllTransactions ? 0 : (currentPage - 1) * transactionsPerPage;
+        const pagedTransactions = groupedTransactions[mappingConfigName];
 
         pagedTransactions.forEach((transaction, index) => {
             const afterSplitAmount = transaction.after_split_amount !== null && transaction.after_split_amount !== undefined
@@ -263,53 +302,48 @@ function groupByMappingConfig(transactions) {
 
 // Update pagination controls
 function renderPaginationControls() {
-    totalPages = Math.ceil(totalItems / transactionsPerPage);
+    const firstItem = allTransactions.length ? totalItems - allTransactions.length + 1 : 0;
+    const morePages = nextCursor !== null;
 
-    document.getElementById('itemRange').textContent = `${(currentPage - 1) * transactionsPerPage + 1}-${Math.min(currentPage * transactionsPerPage, totalItems)} of ${totalItems} items`;
-    document.getElementById('totalPages').textContent = `of ${totalPages}`;
+    document.getElementById('itemRange').textContent = `${firstItem}-${totalItems}${morePages ? '' : ` of ${totalItems}`} items`;
+    document.getElementById('totalPages').textContent = `of ${totalPages}${morePages ? '+' : ''}`;
     document.getElementById('currentPageInput').value = currentPage;
 
     document.getElementById('prevPageButton').disabled = currentPage === 1;
     document.getElementById('firstPageButton').disabled = currentPage === 1;
-    document.getElementById('nextPageButton').disabled = currentPage === totalPages;
-    document.getElementById('lastPageButton').disabled = currentPage === totalPages;
+    document.getElementById('nextPageButton').disabled = !morePages;
+    document.getElementById('lastPageButton').disabled = !morePages;
 }
 
-// Pagination functions
+// Pagination functions, each page is requested from the API when it is shown
 function goToFirstPage() {
-    currentPage = 1;
-    renderTables(groupedTransactions);
-    renderPaginationControls();
+    loadPage(1);
 }
 
 function goToPreviousPage() {
     if (currentPage > 1) {
-        currentPage--;
-        renderTables(groupedTransactions);
-        renderPaginationControls();
+        loadPage(currentPage - 1);
     }
 }
 
 function goToNextPage() {
-    if (currentPage < totalPages) {
-        currentPage++;
-        renderTables(groupedTransactions);
-        renderPaginationControls();
+    if (nextCursor) {
+        loadPage(currentPage + 1);
     }
 }
 
-function goToLastPage() {
-    currentPage = totalPages;
-    renderTables(groupedTransactions);
-    renderPaginationControls();
+// The number of pages is unknown until the last cursor is reached, so walk forward to it
+async function goToLastPage() {
+    while (nextCursor) {
+        await loadPage(currentPage + 1);
+    }
 }
 
 function goToPage(page) {
     const pageNumber = parseInt(page, 10);
-    if (pageNumber >= 1 && pageNumber <= totalPages) {
-        currentPage = pageNumber;
-        renderTables(groupedTransactions);
-        renderPaginationControls();
+    // Only pages whose starting cursor has already been seen can be jumped to
+    if (pageNumber >= 1 && pageNumber < pageCursors.length && (pageNumber === 1 || pageCursors[pageNumber - 1])) {
+        loadPage(pageNumber);
     }
 }
 
@@ -321,7 +355,7 @@ async function submitChanges() {
 
     for (const transactionId in changedItems) {
         const changes = changedItems[transactionId];
-        const transaction = allTransactions.find(t => t.hash === transactionId);
+        const transaction = knownTransactions[transactionId];
         if (!transaction) continue; // Should not happen
 
         const update = {
@@ -358,10 +392,21 @@ async function submitChanges() {
         });
 
         if (response.ok) {
-            alert('Transactions updated successfully!');
-            changedItems = {}; // Clear changed items after successful update
+            // The API reports every hash as updated or failed, a partial failure is status 207
+            const result = await response.json();
+            const remaining = {};
+            result.failed.forEach(failure => {
+                if (changedItems[failure.hash]) remaining[failure.hash] = changedItems[failure.hash];
+            });
+            changedItems = remaining; // Keep only the changes that still need to be submitted
+
+            if (result.failed.length === 0) {
+                alert('Transactions updated successfully!');
+            } else {
+                const details = result.failed.map(failure => `${failure.hash.substring(0, 16)}...: ${failure.error}`).join('\n');
+                alert(`${result.updated.length} transactions updated, ${result.failed.length} failed:\n${details}`);
+            }
             await fetchTransactions(); // Re-fetch transactions to get the latest data from the backend
-            renderTables(groupedTransactions); // Re-render the tables
         } else {
             const errorText = await response.text();
             alert(`Error updating transactions: ${errorText}`);